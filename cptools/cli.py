@@ -3,6 +3,9 @@ import click
 from cptools.commands.screenshot import screenshot
 from cptools.commands.url404 import url404
 from cptools.commands.downloadmips import downloadmips
+from cptools.commands.bench import bench
+from cptools.commands.report import report
+from cptools.commands.archive import archive
 
 
 @click.group()
@@ -21,6 +24,9 @@ def cli():
 cli.add_command(screenshot)
 cli.add_command(url404)
 cli.add_command(downloadmips)
+cli.add_command(bench)
+cli.add_command(report)
+cli.add_command(archive)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+"""归档查看命令实现"""
+import click
+import mimetypes
+import webbrowser
+from html import escape
+from pathlib import Path
+import sys
+
+from aiohttp import web
+
+from cptools.utils.archive import ArchiveReader, archive_member
+from cptools.utils.logger import setup_logger
+
+
+@click.group()
+def archive():
+    """归档查看工具
+
+    查看、解出 --archive 写出的 .tar / .zip 归档，或启动本地查看服务，
+    让HTML报告直接显示归档中的截图和主图。
+    """
+
+
+@archive.command('list')
+@click.argument('archive_file', type=click.Path(exists=True, dir_okay=False))
+def list_entries(archive_file):
+    """列出归档中的条目（名称和大小）"""
+    with ArchiveReader(archive_file) as reader:
+        for name, entry in reader.entries.items():
+            link = f"  -> {entry['link']}" if entry.get('link') else ''
+            click.echo(f"{entry['size']:>12}  {name}{link}")
+        click.echo(f"共 {len(reader.entries)} 个条目")
+
+
+@archive.command()
+@click.argument('archive_file', type=click.Path(exists=True, dir_okay=False))
+@click.argument('names', nargs=-1)
+@click.option(
+    '--output', '-o', default='.',
+    help='解出到该目录（默认：当前目录）')
+def extract(archive_file, names, output):
+    """解出归档中的条目（不指定条目名时解出全部）
+
+    示例：
+
+    \b
+    cptools archive extract mips.tar 629442244/629442244_01.jpg -o ./tmp
+    """
+    logger = setup_logger()
+    with ArchiveReader(archive_file) as reader:
+        try:
+            paths = list(reader.extract(list(names) or None, Path(output)))
+        except KeyError as e:
+            logger.error(f"归档中没有该条目: {e.args[0]}")
+            sys.exit(1)
+        except ValueError as e:
+            logger.error(str(e))
+            sys.exit(1)
+    logger.info(f"已解出 {len(paths)} 个文件到 {output}")
+
+
+@archive.command()
+@click.argument('archive_file', type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    '--report', default=None, type=click.Path(exists=True, dir_okay=False),
+    help='同时提供的HTML报告（报告中的图片从归档读取）')
+@click.option(
+    '--port', default=8765, type=int,
+    help='本机监听端口（默认：8765）')
+@click.option(
+    '--open', 'open_browser', is_flag=True, default=False,
+    help='启动后在浏览器中打开')
+def serve(archive_file, report, port, open_browser):
+    """启动本地查看服务，按需从归档读取报告引用的图片
+
+    报告中归档条目的地址为 <归档相对报告的路径>/<条目名>，服务以报告所在
+    目录为根目录，这类地址直接从归档中读取，其他地址按普通文件提供。
+
+    示例：
+
+    \b
+    cptools archive serve mips.tar --report downloadmips_result.html --open
+    """
+    logger = setup_logger()
+    reader = ArchiveReader(archive_file)
+    root = Path(report).parent if report else Path(archive_file).parent
+    app = create_viewer_app(reader, root, report)
+    url = f"http://127.0.0.1:{port}/"
+    logger.info(f"归档查看服务: {url}（{len(reader.entries)} 个条目，Ctrl+C 停止）")
+    if open_browser:
+        webbrowser.open(url)
+    try:
+        web.run_app(app, host='127.0.0.1', port=port, print=None)
+    finally:
+        reader.close()
+
+
+def create_viewer_app(reader: ArchiveReader, root: Path, report=None) -> web.Application:
+    """创建查看服务：/ 为报告（或条目列表），其余路径按文件或归档条目提供"""
+    root = root.resolve()
+    archive_path = reader.path.resolve()
+
+    async def index(request):
+        if report:
+            return web.FileResponse(report)
+        rel = archive_path.relative_to(root).as_posix()
+        links = ''.join(
+            f'<li><a href="{escape(rel)}/{escape(name)}">{escape(name)}</a></li>'
+            for name in reader.names())
+        return web.Response(
+            text=f'<!DOCTYPE html><meta charset="UTF-8"><title>{escape(reader.path.name)}'
+                 f'</title><h1>{escape(reader.path.name)}</h1><ul>{links}</ul>',
+            content_type='text/html')
+
+    async def resource(request):
+        path = (root / request.match_info['tail']).resolve()
+        # 只提供根目录下的文件
+        if root not in path.parents:
+            raise web.HTTPNotFound()
+        if path.is_file():
+            return web.FileResponse(path)
+        member = archive_member(path)
+        if member is None or member[0].resolve() != archive_path:
+            raise web.HTTPNotFound()
+        try:
+            data = reader.read(member[1])
+        except KeyError:
+            raise web.HTTPNotFound()
+        content_type = mimetypes.guess_type(member[1])[0]
+        return web.Response(
+            body=data, content_type=content_type or 'application/octet-stream')
+
+    app = web.Application()
+    app.router.add_get('/', index)
+    app.router.add_get('/{tail:.+}', resource)
+    return app
@@ -0,0 +1,374 @@
+"""基准测试命令实现"""
+import click
+import asyncio
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+import sys
+
+from cptools import __version__
+from cptools.commands import downloadmips, screenshot
+from cptools.commands.common import build_notifier
+from cptools.commands.downloadmips import EXTRACT_MODES, run_download_tasks
+from cptools.commands.screenshot import CAPTURE_MODES, run_screenshot_tasks
+from cptools.commands.url404 import run_url404_tasks
+from cptools.engine.bench import run_bench
+from cptools.engine.notifier import Notifier
+from cptools.engine.readiness import READY_STRATEGIES
+from cptools.engine.resources import children_rss, process_rss
+from cptools.utils.logger import setup_logger
+from cptools.utils.notify import (
+    BACKEND_DINGTALK, BACKEND_JSONL, BACKEND_WEBHOOK, NOTIFY_BACKENDS
+)
+from cptools.utils.standin_server import (
+    StandinConfig, StandinServer, parse_status_mix, standin_server
+)
+
+BENCH_COMMANDS = ['url404', 'screenshot', 'downloadmips', 'engine']
+
+# 内存采样间隔（秒）
+SAMPLE_INTERVAL = 0.2
+
+# --notify 的可选值：none 为不发送通知
+BENCH_NOTIFY = ['none'] + NOTIFY_BACKENDS
+
+# 基准测试的进度通知间隔（百分比）
+BENCH_NOTIFY_PROGRESS = 10
+
+
+@click.command()
+@click.option(
+    '--commands', default='url404,screenshot,downloadmips',
+    help='要测试的命令，逗号分隔（url404,screenshot,downloadmips,engine）')
+@click.option(
+    '--items', default=100, type=int,
+    help='每个命令处理的URL/产品数量（默认：100）')
+@click.option(
+    '--concurrency', '-c', default=5, type=int,
+    help='并发数量（默认：5）')
+@click.option(
+    '--latency', default=0.05, type=float,
+    help='替身服务每个页面的平均延迟（秒，默认：0.05）')
+@click.option(
+    '--status-mix', default='200:90,404:5,500:5',
+    help='替身服务的状态码分布（默认：200:90,404:5,500:5）')
+@click.option(
+    '--page-kb', default=50, type=int,
+    help='页面大小（KB，默认：50）')
+@click.option(
+    '--images', default=3, type=int,
+    help='每个产品页面的主图数量（默认：3）')
+@click.option(
+    '--image-kb', default=30, type=int,
+    help='每张图片的大小（KB，默认：30）')
+@click.option(
+    '--no-container', is_flag=True, default=False,
+    help='产品页面不输出 .stackable-image-container 标记（测试找不到主图的情况）')
+@click.option(
+    '--page-height', default=0, type=int,
+    help='普通页面的最小高度（CSS像素，默认：0自然高度；如 60000 测试超高页面截图）')
+@click.option(
+    '--capture', default='full', type=click.Choice(CAPTURE_MODES),
+    help='screenshot 的截图方式（默认：full）')
+@click.option(
+    '--ready', default=None, type=click.Choice(READY_STRATEGIES),
+    help='screenshot 和 downloadmips 的页面就绪检测策略（默认：各命令的默认策略）')
+@click.option(
+    '--extract', default='browser', type=click.Choice(EXTRACT_MODES),
+    help='downloadmips 的主图地址提取方式（默认：browser）')
+@click.option(
+    '--delay-scale', default=0.0, type=float,
+    help='命令内随机延迟的缩放系数（默认：0，即不延迟；1为与正式运行相同）')
+@click.option(
+    '--notify', default='none', type=click.Choice(BENCH_NOTIFY),
+    help='运行期间向替身服务（jsonl 为临时文件）发送进度和结束通知，'
+         '统计通知延迟（默认：none）')
+@click.option(
+    '--webhook-latency', default=0.0, type=float,
+    help='替身服务通知 Webhook 的延迟（秒，默认：0）')
+@click.option(
+    '--timeout', default=30000, type=int,
+    help='页面加载超时时间（毫秒，默认：30000）')
+@click.option(
+    '--output', '-o', default=None,
+    help='JSON结果输出路径（默认只输出到终端）')
+@click.option(
+    '--log', '-l', default='',
+    help='日志文件路径（默认：./logs/bench_YYYYMMDD_HHMMSS.log）')
+def bench(commands, items, concurrency, latency, status_mix, page_kb, images,
+          image_kb, no_container, page_height, capture, ready, extract,
+          delay_scale, notify, webhook_latency, timeout, output, log):
+    """基准测试工具
+
+    在本机启动替身HTTP服务（可配置延迟、状态码分布、页面大小和主图数量），
+    用它驱动 url404、screenshot、downloadmips 三个命令，输出每个命令的
+    URLs/秒、p99延迟、内存峰值和CPU时间（JSON），便于对比不同版本的性能。
+
+    示例：
+
+    \b
+    cptools bench --items 200 -c 10 -o bench.json
+    cptools bench --commands downloadmips --images 6 --latency 0.2
+    cptools bench --commands screenshot --page-height 60000 --capture tiles
+    cptools bench --commands downloadmips --ready networkidle -o idle.json
+    cptools bench --commands downloadmips --extract html
+    cptools bench --commands url404 --notify dingtalk --webhook-latency 0.5
+    """
+    selected = [c.strip() for c in commands.split(',') if c.strip()]
+    unknown = [c for c in selected if c not in BENCH_COMMANDS]
+    if unknown:
+        raise click.UsageError(
+            f"未知的命令: {', '.join(unknown)}（可选：{', '.join(BENCH_COMMANDS)}）")
+    try:
+        mix = parse_status_mix(status_mix)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    if not log:
+        log = f"./logs/bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    logger = setup_logger(log)
+
+    config = StandinConfig(
+        latency=latency,
+        status_mix=mix,
+        page_kb=page_kb,
+        images=images,
+        image_kb=image_kb,
+        container=not no_container,
+        page_height=page_height,
+        webhook_latency=webhook_latency
+    )
+    report = {
+        'version': __version__,
+        'started_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'items': items,
+        'concurrency': concurrency,
+        'delay_scale': delay_scale,
+        'capture': capture,
+        'ready': ready,
+        'extract': extract,
+        'notify': notify,
+        'server': config.to_dict(),
+        'commands': {},
+    }
+
+    logger.info("=" * 80)
+    logger.info("开始基准测试")
+    logger.info(f"命令: {', '.join(selected)}  条数: {items}  并发: {concurrency}")
+    logger.info("=" * 80)
+
+    work_dir = Path(tempfile.mkdtemp(prefix='cptools_bench_'))
+    try:
+        with standin_server(config) as server:
+            logger.info(f"替身服务: {server.url}")
+            for name in selected:
+                logger.info(f"测试 {name} ...")
+                try:
+                    result = run_command_bench(
+                        name, server, items, concurrency, timeout,
+                        delay_scale, work_dir, logger, capture=capture,
+                        ready=ready, extract=extract, notify=notify)
+                except Exception as e:
+                    logger.error(f"{name} 基准测试失败: {str(e)}")
+                    result = {'error': str(e)}
+                report['commands'][name] = result
+                if 'error' not in result:
+                    logger.info(
+                        f"{name}: {result['urls_per_second']} URLs/秒，"
+                        f"p99 {result['p99_seconds']:.3f} 秒，"
+                        f"内存峰值 {result['peak_rss_bytes'] / 1048576:.1f} MB，"
+                        f"CPU {result['cpu_seconds']:.2f} 秒")
+                    notifications = result.get('notifications')
+                    if notifications:
+                        logger.info(
+                            f"{name} 通知: 发送 {notifications['sent']} 条，"
+                            f"延迟 p50 {notifications['p50_send_ms']} 毫秒 / "
+                            f"最大 {notifications['max_send_ms']} 毫秒，"
+                            f"结束时等待 {notifications['shutdown_wait_ms']} 毫秒")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        output_path = Path(output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(text + '\n', encoding='utf-8')
+        logger.info(f"基准测试结果已保存: {output}")
+    click.echo(text)
+
+    if any('error' in r for r in report['commands'].values()):
+        sys.exit(1)
+
+
+def run_command_bench(
+    name: str,
+    server: StandinServer,
+    items: int,
+    concurrency: int,
+    timeout: int,
+    delay_scale: float,
+    work_dir: Path,
+    logger,
+    capture: str = 'full',
+    ready: Optional[str] = None,
+    extract: str = 'browser',
+    notify: str = 'none'
+) -> Dict:
+    """对单个命令运行一次基准测试"""
+    base_url = server.url
+    # 浏览器内存只统计子进程，排除替身服务进程
+    exclude = [server.pid]
+    # 基准测试关闭重试和熔断，保证每条URL只访问一次、结果可对比
+    engine_settings = {
+        'retries': 0,
+        'breaker_threshold': 0,
+        'delay_scale': delay_scale,
+    }
+
+    if name == 'engine':
+        return asyncio.run(measure(
+            lambda: _engine_bench(items, concurrency), items, exclude))
+
+    notifier = _bench_notifier(name, notify, server, work_dir, logger)
+
+    if name == 'downloadmips':
+        products = [
+            {'index': n, 'product_no': f'BENCH{n:06d}'}
+            for n in range(1, items + 1)
+        ]
+        output_dir = work_dir / name
+        output_dir.mkdir(parents=True, exist_ok=True)
+        return asyncio.run(measure(lambda: run_download_tasks(
+            products, base_url, output_dir, concurrency, timeout, logger,
+            extract=extract,
+            ready_settings=_ready_settings(downloadmips.DEFAULT_READY, ready),
+            engine_settings=engine_settings, notifier=notifier), items, exclude))
+
+    urls = [
+        {'index': n, 'url': f'/page/{n}', 'name': f'page-{n}'}
+        for n in range(1, items + 1)
+    ]
+    if name == 'url404':
+        return asyncio.run(measure(lambda: run_url404_tasks(
+            urls, base_url, concurrency, timeout, logger,
+            engine_settings=engine_settings, notifier=notifier), items, exclude))
+
+    output_dir = work_dir / name
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return asyncio.run(measure(lambda: run_screenshot_tasks(
+        urls, base_url, output_dir, concurrency, timeout, 1920, 1080, logger,
+        capture=capture,
+        ready_settings=_ready_settings(screenshot.DEFAULT_READY, ready),
+        engine_settings=engine_settings, notifier=notifier), items, exclude))
+
+
+def _bench_notifier(
+    name: str,
+    backend: str,
+    server: StandinServer,
+    work_dir: Path,
+    logger
+) -> Optional[Notifier]:
+    """基准测试的通知服务：通知发往替身服务（jsonl 写入临时目录），不访问网络"""
+    if backend == 'none':
+        return None
+    targets = {
+        BACKEND_DINGTALK: server.webhook_url,
+        BACKEND_WEBHOOK: f'{server.url}/hooks/bench',
+        BACKEND_JSONL: str(work_dir / f'{name}_notifications.jsonl'),
+    }
+    return build_notifier(
+        targets[backend], None, logger, f'Bench {name}',
+        final=lambda results: (
+            f'Bench {name} Completed',
+            f'### Bench {name} Completed\n\n**Results**: {len(results)}\n'),
+        engine_settings={
+            'notify_backend': backend,
+            'notify_target': targets[backend],
+            'notify_progress': BENCH_NOTIFY_PROGRESS,
+        })
+
+
+def _ready_settings(defaults: Dict, strategy: Optional[str]) -> Dict:
+    """命令默认的就绪检测设置，指定 strategy 时替换策略"""
+    settings = dict(defaults)
+    if strategy:
+        settings['strategy'] = strategy
+        # 替身服务的普通页面没有主图容器，selector 策略等待标题
+        settings['selector'] = settings['selector'] or 'h1'
+    return settings
+
+
+async def _engine_bench(items: int, concurrency: int):
+    """不访问网络的引擎调度开销基准（与 python -m cptools.engine.bench 相同）"""
+    return await run_bench(items, concurrency, latency=0.001)
+
+
+async def measure(
+    run: Callable,
+    items: int,
+    exclude: Iterable[int] = ()
+) -> Dict:
+    """运行并采样内存和CPU，返回可序列化的指标"""
+    peaks = {'python': process_rss() or 0, 'browser': 0}
+
+    async def sample():
+        while True:
+            peaks['python'] = max(peaks['python'], process_rss() or 0)
+            peaks['browser'] = max(peaks['browser'], children_rss(exclude=exclude))
+            await asyncio.sleep(SAMPLE_INTERVAL)
+
+    sampler = asyncio.ensure_future(sample())
+    cpu_start = time.process_time()
+    children_start = _children_cpu()
+    started = time.monotonic()
+    try:
+        results = await run()
+    finally:
+        sampler.cancel()
+    elapsed = time.monotonic() - started
+    cpu_seconds = time.process_time() - cpu_start
+
+    summary = _run_summary(results)
+    total = (summary.get('timings', {}).get('phases', {}).get('total') or {})
+    return {
+        'items': items,
+        'completed': summary.get('completed', items),
+        'succeeded': summary.get('succeeded'),
+        'failed': summary.get('failed'),
+        'elapsed_seconds': round(elapsed, 3),
+        'urls_per_second': round(items / elapsed, 2) if elapsed > 0 else 0.0,
+        'p50_seconds': total.get('p50', 0.0),
+        'p90_seconds': total.get('p90', 0.0),
+        'p99_seconds': total.get('p99', 0.0),
+        'peak_rss_bytes': peaks['python'],
+        'peak_browser_rss_bytes': peaks['browser'],
+        'cpu_seconds': round(cpu_seconds, 3),
+        'child_cpu_seconds': round(_children_cpu() - children_start, 3),
+        'bytes_downloaded': summary.get('bytes_downloaded', 0),
+        'max_in_flight': summary.get('max_in_flight'),
+        'loop_lag_p99_ms': (summary.get('loop_lag') or {}).get('p99_ms'),
+        'notifications': summary.get('notifications'),
+        'http': summary.get('http'),
+    }
+
+
+def _run_summary(results) -> Dict:
+    """命令返回的结果列表带有引擎汇总；引擎基准直接返回汇总字典"""
+    if isinstance(results, dict):
+        return results
+    return getattr(results, 'summary', {}) or {}
+
+
+def _children_cpu() -> float:
+    """已退出子进程（浏览器）的累计CPU时间"""
+    times = os.times()
+    return times.children_user + times.children_system
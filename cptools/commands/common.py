@@ -0,0 +1,302 @@
+"""三个命令共用的任务引擎选项"""
+import functools
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import click
+
+from cptools.engine import Engine, JsonlSink, TaskHandler
+from cptools.engine.breaker import HostBreakers, MODE_DEFER, MODE_FAIL
+from cptools.engine.exporter import MetricsExporter
+from cptools.engine.http import (
+    DEFAULT_DNS_TTL, DEFAULT_KEEPALIVE, DEFAULT_POOL_LIMIT, HttpPool
+)
+from cptools.engine.live_report import LiveReport
+from cptools.engine.notifier import Notifier
+from cptools.engine.profiling import profile_session
+from cptools.engine.readiness import READY_STRATEGIES
+from cptools.engine.retry import RetryPolicy
+from cptools.engine.watchdog import ACTION_RECYCLE, MEMORY_ACTIONS, MemoryWatchdog
+from cptools.utils.notify import (
+    BACKEND_DINGTALK, BACKEND_JSONL, NOTIFY_BACKENDS, build_sender
+)
+from cptools.utils.logger import LOG_FORMATS
+
+
+# (参数名, click选项) 列表，新增引擎选项只需要在这里登记
+ENGINE_OPTIONS = [
+    ('retries', click.option(
+        '--retries', default=0, type=int,
+        help='超时、连接错误和429/502/503/504时的最大重试次数（默认：0，不重试）')),
+    ('retry_backoff', click.option(
+        '--retry-backoff', default=1.0, type=float,
+        help='第一次重试前的等待秒数，之后每次翻倍并加随机抖动（默认：1.0）')),
+    ('breaker_threshold', click.option(
+        '--breaker-threshold', default=0, type=int,
+        help='同一主机连续失败多少次后熔断，熔断期间的任务不访问网络、'
+             '报告中没有状态码（默认：0，不熔断）')),
+    ('breaker_cooldown', click.option(
+        '--breaker-cooldown', default=60.0, type=float,
+        help='熔断后多少秒放行一个探测任务（默认：60）')),
+    ('breaker_mode', click.option(
+        '--breaker-mode', default=MODE_DEFER,
+        type=click.Choice([MODE_DEFER, MODE_FAIL]),
+        help='熔断期间的任务处理方式：defer延后、fail直接失败（默认：defer）')),
+    ('host_concurrency', click.option(
+        '--host-concurrency', default=0, type=int,
+        help='同一主机同时执行的最大任务数，多个主机共用 --concurrency（默认：0，不单独限制）')),
+    ('pool_limit', click.option(
+        '--pool-limit', default=DEFAULT_POOL_LIMIT, type=click.IntRange(min=0),
+        help=f'HTTP连接池的总连接数上限（默认：{DEFAULT_POOL_LIMIT}，0为不限制）')),
+    ('pool_per_host', click.option(
+        '--pool-per-host', default=0, type=click.IntRange(min=0),
+        help='HTTP连接池中单个主机的连接数上限（默认：0，不单独限制）')),
+    ('dns_ttl', click.option(
+        '--dns-ttl', default=DEFAULT_DNS_TTL, type=click.IntRange(min=0),
+        help=f'DNS缓存有效期秒数（默认：{DEFAULT_DNS_TTL}，0为不缓存）')),
+    ('keepalive', click.option(
+        '--keepalive', default=DEFAULT_KEEPALIVE, type=click.FloatRange(min=0),
+        help=f'空闲HTTP连接保持秒数（默认：{DEFAULT_KEEPALIVE:.0f}，0为每个请求后关闭连接）')),
+    ('metrics_port', click.option(
+        '--metrics-port', default=None, type=int,
+        help='运行期间在本机该端口提供 OpenMetrics 指标（/metrics），默认不启用')),
+    ('profile', click.option(
+        '--profile', default=None,
+        help='用 cProfile 剖析整个运行（含报告生成），结果写入该文件，摘要写入同名 .txt')),
+    ('log_format', click.option(
+        '--log-format', default='text', type=click.Choice(LOG_FORMATS),
+        help='日志文件格式：text普通文本，json每行一条JSON（默认：text）')),
+    ('results_jsonl', click.option(
+        '--results-jsonl', default=None,
+        help='每完成一条就把结果追加写入该 JSONL 文件（可用 cptools report 重建报告）')),
+    ('live_report', click.option(
+        '--live-report', default=0, type=int,
+        help='运行期间每隔N秒用已完成的结果刷新HTML报告（默认：0，只在结束时生成）')),
+    ('max_browser_mb', click.option(
+        '--max-browser-mb', default=0, type=int,
+        help='浏览器（Playwright驱动和Chromium进程，按PSS计）内存上限MB，超过时按 --memory-action 处理（默认：0，不限制）')),
+    ('max_python_mb', click.option(
+        '--max-python-mb', default=0, type=int,
+        help='Python进程内存上限MB，超过时临时降低并发（默认：0，不限制）')),
+    ('notify_progress', click.option(
+        '--notify-progress', default=0, type=click.IntRange(0, 100),
+        help='每完成N%发送一次进度通知（需要已知任务总数，默认：0，不发送）')),
+    ('notify_interval', click.option(
+        '--notify-interval', default=0, type=float,
+        help='每隔N秒发送一次进度通知（默认：0，不发送）')),
+    ('notify_error_rate', click.option(
+        '--notify-error-rate', default=0.0, type=click.FloatRange(0, 1),
+        help='最近20条结果的失败率达到该值（0-1）时发送告警（默认：0，不告警）')),
+    ('notify_backend', click.option(
+        '--notify-backend', default=BACKEND_DINGTALK, type=click.Choice(NOTIFY_BACKENDS),
+        help='通知后端：dingtalk钉钉机器人，webhook通用JSON Webhook，'
+             'jsonl追加写入本地文件（默认：dingtalk）')),
+    ('notify_target', click.option(
+        '--notify-target', default=None,
+        help='通知目标：Webhook URL 或 JSONL 文件路径（默认：--dingding-webhook 的值）')),
+    ('memory_action', click.option(
+        '--memory-action', default=ACTION_RECYCLE, type=click.Choice(MEMORY_ACTIONS),
+        help='浏览器内存超限时：recycle等待进行中的页面结束后重启浏览器，'
+             'throttle临时降低并发（默认：recycle）')),
+]
+
+
+def engine_options(func):
+    """为命令添加任务引擎选项
+
+    这些选项不会逐个传给命令函数，而是收集成 ``engine_settings`` 字典，
+    由 ``build_engine`` 统一转换成引擎参数。指定 ``--profile`` 时整个命令
+    （读取输入、运行、生成报告、发送通知）都在剖析范围内。
+    """
+    names = [name for name, _ in ENGINE_OPTIONS]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        settings = {name: kwargs.pop(name) for name in names}
+        with profile_session(settings.get('profile'),
+                             logging.getLogger('cptools')):
+            return func(*args, engine_settings=settings, **kwargs)
+
+    for _, option in reversed(ENGINE_OPTIONS):
+        wrapper = option(wrapper)
+    return wrapper
+
+
+def readiness_options(strategy: str, timeout: int, selector: str = ''):
+    """为命令添加页面就绪检测选项（各命令的默认值不同）
+
+    选项收集成 ``ready_settings`` 字典传给命令函数，
+    键与 ``wait_until_ready`` 的参数一致。
+    """
+    options = [
+        ('strategy', click.option(
+            '--ready', 'ready_strategy', default=strategy,
+            type=click.Choice(READY_STRATEGIES),
+            help='页面就绪检测策略：networkidle网络空闲、selector等待元素、'
+                 'layout布局稳定、images图片解码完成、none不等待'
+                 f'（默认：{strategy}）')),
+        ('timeout', click.option(
+            '--ready-timeout', default=timeout, type=int,
+            help=f'就绪检测最长等待时间（毫秒，默认：{timeout}），超时后继续处理')),
+        ('selector', click.option(
+            '--ready-selector', default=selector,
+            help='selector 策略等待的CSS选择器'
+                 + (f'（默认：{selector}）' if selector else ''))),
+        ('audit', click.option(
+            '--ready-audit', is_flag=True, default=False,
+            help='就绪后继续等待 networkidle，在耗时统计中记录节省的时间（会变慢，仅用于评估）')),
+    ]
+    names = [name for name, _ in options]
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            settings = {name: kwargs.pop(f'ready_{name}') for name in names}
+            if settings['strategy'] == 'selector' and not settings['selector']:
+                raise click.UsageError("--ready selector 需要同时指定 --ready-selector")
+            return func(*args, ready_settings=settings, **kwargs)
+
+        for _, option in reversed(options):
+            wrapper = option(wrapper)
+        return wrapper
+    return decorator
+
+
+def output_options(func):
+    """为命令添加输出目录的保留策略选项
+
+    选项收集成 ``output_settings`` 字典（keep_runs / max_output_mb）传给命令函数，
+    用于创建 ``RunPruner``。
+    """
+    options = [
+        click.option(
+            '--keep-runs', default=5, type=int,
+            help='输出目录中保留最近N次运行（含本次，默认：5，0为不按次数清理）'),
+        click.option(
+            '--max-output-mb', default=0, type=int,
+            help='保留的旧运行总大小上限MB，超过时从最旧的开始清理（默认：0，不限制）'),
+    ]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        settings = {
+            'keep_runs': kwargs.pop('keep_runs'),
+            'max_output_mb': kwargs.pop('max_output_mb'),
+        }
+        return func(*args, output_settings=settings, **kwargs)
+
+    for option in reversed(options):
+        wrapper = option(wrapper)
+    return wrapper
+
+
+def build_engine(
+    handler: TaskHandler,
+    concurrency: int,
+    logger,
+    timeout: int,
+    engine_settings: Optional[Dict] = None,
+    report: Optional[Callable[[List[Dict], int], None]] = None,
+    notifier: Optional[Notifier] = None
+) -> Engine:
+    """根据命令行的引擎选项创建任务引擎
+
+    report 为命令的报告生成函数（参数为结果列表和刷新秒数），
+    指定 ``--live-report`` 时用于运行期间刷新报告。
+    notifier 为命令创建的通知服务（见 ``build_notifier``）。
+    """
+    settings = engine_settings or {}
+    retry_policy = RetryPolicy(
+        retries=settings.get('retries', 0),
+        backoff=settings.get('retry_backoff', 1.0),
+    )
+    breakers = HostBreakers(
+        threshold=settings.get('breaker_threshold', 0),
+        cooldown=settings.get('breaker_cooldown', 60.0),
+        mode=settings.get('breaker_mode', MODE_DEFER),
+        logger=logger
+    )
+    sinks = []
+    if settings.get('results_jsonl'):
+        sinks.append(JsonlSink(settings['results_jsonl'], handler.command))
+    services = []
+    if settings.get('metrics_port'):
+        services.append(MetricsExporter(settings['metrics_port'], logger))
+    watchdog = MemoryWatchdog(
+        browser_limit_mb=settings.get('max_browser_mb') or 0,
+        python_limit_mb=settings.get('max_python_mb') or 0,
+        action=settings.get('memory_action', ACTION_RECYCLE),
+        logger=logger
+    )
+    if watchdog.enabled:
+        services.append(watchdog)
+    interval = settings.get('live_report') or 0
+    if interval > 0 and report is not None:
+        services.append(LiveReport(
+            lambda results: report(results, interval), interval, logger))
+    if notifier is not None:
+        services.append(notifier)
+    return Engine(
+        handler,
+        concurrency,
+        logger,
+        timeout=timeout,
+        sinks=sinks,
+        retry_policy=retry_policy,
+        breakers=breakers,
+        services=services,
+        delay_scale=settings.get('delay_scale', 1.0),
+        host_limit=settings.get('host_concurrency') or 0,
+        http=HttpPool(
+            limit=settings.get('pool_limit', DEFAULT_POOL_LIMIT),
+            limit_per_host=settings.get('pool_per_host') or 0,
+            dns_ttl=settings.get('dns_ttl', DEFAULT_DNS_TTL),
+            keepalive=settings.get('keepalive', DEFAULT_KEEPALIVE),
+        )
+    )
+
+
+def build_notifier(
+    webhook: str,
+    secret: Optional[str],
+    logger,
+    label: str,
+    final: Callable[[List[Dict]], Optional[Tuple[str, str]]],
+    engine_settings: Optional[Dict] = None
+) -> Optional[Notifier]:
+    """创建通知服务（没有通知目标时返回 None）
+
+    后端和目标由 ``--notify-backend`` / ``--notify-target`` 指定，目标默认为
+    钉钉 Webhook。final 生成运行结束通知；进度和告警按 ``--notify-*`` 选项发送。
+    """
+    settings = engine_settings or {}
+    backend = settings.get('notify_backend') or BACKEND_DINGTALK
+    target = settings.get('notify_target')
+    if not target:
+        if backend == BACKEND_JSONL:
+            raise click.UsageError("--notify-backend jsonl 需要用 --notify-target 指定文件路径")
+        target = webhook
+    if not target:
+        return None
+    # 限流只针对钉钉机器人，其他后端不限制发送频率
+    limits = {} if backend == BACKEND_DINGTALK else {'per_minute': 0, 'min_interval': 0}
+    return Notifier(
+        build_sender(backend, target, secret),
+        logger,
+        label,
+        final=final,
+        progress_percent=settings.get('notify_progress') or 0,
+        progress_interval=settings.get('notify_interval') or 0,
+        error_rate=settings.get('notify_error_rate') or 0,
+        **limits
+    )
+
+
+def breaker_note(results) -> str:
+    """钉钉通知中的熔断说明（没有发生熔断时为空）"""
+    breaker = getattr(results, 'summary', {}).get('breaker') or {}
+    if not breaker.get('events'):
+        return ''
+    opened = sorted({e['host'] for e in breaker['events'] if e['to'] == 'open'})
+    return (f"**Circuit Breaker**: {', '.join(opened)} | "
+            f"Short-circuited {breaker['short_circuited']}\n\n")
@@ -1,33 +1,85 @@
 """下载产品主图命令实现"""
 import click
+import aiohttp
 import asyncio
+import base64
+import codecs
 import csv
-import random
-import shutil
 import webbrowser
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 import sys
 
-from playwright.async_api import async_playwright, Browser
+from cptools.commands.common import (
+    breaker_note, build_engine, build_notifier, engine_options,
+    output_options, readiness_options
+)
+from cptools.engine import USER_AGENT, TaskContext, TaskHandler
+from cptools.engine.breaker import host_of
+from cptools.engine.notifier import Notifier
+from cptools.engine.readiness import wait_until_ready
 from cptools.utils.logger import setup_logger
 from cptools.utils.downloadmips_report import (
-    generate_downloadmips_html_report
+    generate_downloadmips_html_report, summarize_regions
+)
+from cptools.utils.archive import ARCHIVE_SUFFIXES, ArchiveWriter, index_path
+from cptools.utils.atomic_write import (
+    AtomicWriter, file_digest, file_intact, write_atomic)
+from cptools.utils.image_dedup import ImageDedup
+from cptools.utils.image_pipeline import (
+    CONVERT_FORMATS, IMAGE_EXTENSIONS, ImagePipeline, derivative_path,
+    pipeline_error, sniff_format
 )
-from cptools.utils.dingding import send_dingding_notification
+from cptools.utils.mips_index import MipsIndex
+from cptools.utils.mips_parser import MipsImageParser, normalize_image_url
+from cptools.utils.response_cache import ResponseCache
+from cptools.utils.run_dirs import (
+    LATEST_NAME, RunPruner, create_run_dir, update_latest)
+
+# 产品主图所在的元素
+IMAGE_SELECTOR = '.stackable-image-container img'
+
+EXTRACT_MODES = ['browser', 'html', 'auto']
+
+# auto 模式下这些状态码直接判定失败，不再用浏览器重试
+PERMANENT_STATUSES = {404, 410}
+
+# 流式读取页面HTML的块大小
+HTML_CHUNK_SIZE = 64 * 1024
+
+# 各地区站点（--host 和 CSV 的 region 列可以直接写地区代码）
+REGION_HOSTS = {
+    'US': 'https://www.cafepress.com',
+    'AU': 'https://www.cafepress.com.au',
+    'UK': 'https://www.cafepress.co.uk',
+    'CA': 'https://www.cafepress.ca',
+}
+
+# 扩展名 -> 格式名（链接已保存的图片时使用）
+FORMAT_OF_EXTENSION = {ext: name for name, ext in IMAGE_EXTENSIONS.items()}
+
+# 默认就绪检测：主图元素出现即可提取，最多等待 5 秒
+DEFAULT_READY = {
+    'strategy': 'selector',
+    'timeout': 5000,
+    'selector': IMAGE_SELECTOR,
+    'audit': False,
+}
 
 
 @click.command()
 @click.option(
-    '--host', '-h', required=True,
-    help='主机地址（如: https://www.cafepress.com）')
+    '--host', '-h', 'hosts', multiple=True,
+    help='主机地址或地区代码（如: https://www.cafepress.com 或 US），'
+         '可重复指定以一次下载多个地区')
 @click.option(
     '--csv', 'csv_file', required=True, type=click.Path(exists=True),
-    help='CSV文件路径，包含产品编号列表（product_no列）')
+    help='CSV文件路径，包含产品编号列表（product_no列，可选region/host列）')
 @click.option(
     '--output', '-o', default='./mips',
-    help='图片保存目录（默认：./mips）')
+    help='图片保存目录，每次运行写入其中的 <运行ID>/ 子目录，'
+         'latest 链接指向最近一次（默认：./mips）')
 @click.option(
     '--log', '-l', default='',
     help='日志文件路径（默认：./logs/downloadmips_YYYYMMDD_HHMMSS.log）')
@@ -53,17 +105,60 @@ from cptools.utils.dingding import send_dingding_notification
 @click.option(
     '--timeout', default=30000, type=int,
     help='页面加载超时时间（毫秒，默认：30000）')
-def downloadmips(host, csv_file, output, log, html, concurrency,
-                 dingding_webhook, dingding_secret, no_dingding, timeout):
+@click.option(
+    '--extract', default='browser', type=click.Choice(EXTRACT_MODES),
+    help='主图地址提取方式：browser渲染页面，html只请求页面HTML并解析（不启动浏览器），'
+         'auto先解析HTML、找不到主图再用浏览器（默认：browser）')
+@click.option(
+    '--index-file', default='./.cache/downloadmips_index.json',
+    help='主图地址索引文件路径，仅在指定 --index-max-age 或 --refresh-index 时读写'
+         '（默认：./.cache/downloadmips_index.json）')
+@click.option(
+    '--index-max-age', default=0, type=int,
+    help='直接使用不超过该秒数的索引条目，跳过页面渲染；更旧的条目按页面ETag'
+         '发送条件请求，图片同样按上次的ETag发送条件请求（默认：0，不读写索引）')
+@click.option(
+    '--refresh-index', is_flag=True, default=False,
+    help='忽略已有索引，重新提取所有产品的主图地址并重建索引')
+@click.option(
+    '--convert', default=None, type=click.Choice(CONVERT_FORMATS),
+    help='把下载的图片转换为该格式保存（需要Pillow，默认：保持原格式）')
+@click.option(
+    '--quality', default=80, type=click.IntRange(1, 100),
+    help='转换和缩略图的编码质量（1-100，默认：80）')
+@click.option(
+    '--derivatives', default='',
+    help='额外生成的缩略图长边尺寸，逗号分隔（如: 200,400，需要Pillow）')
+@click.option(
+    '--image-workers', default=0, type=int,
+    help='图片转换进程数（默认：0，CPU核数）')
+@click.option(
+    '--archive', 'archive_file', default=None,
+    help='把图片依次追加写入该 .tar / .zip 归档（附带索引），不再逐个生成文件；'
+         '用 cptools archive serve 查看报告中的图片')
+@readiness_options(DEFAULT_READY['strategy'], DEFAULT_READY['timeout'],
+                   DEFAULT_READY['selector'])
+@output_options
+@engine_options
+def downloadmips(hosts, csv_file, output, log, html, concurrency,
+                 dingding_webhook, dingding_secret, no_dingding, timeout,
+                 extract, index_file, index_max_age, refresh_index,
+                 convert, quality, derivatives, image_workers, archive_file,
+                 ready_settings, output_settings, engine_settings):
     """产品主图下载工具
 
     从CSV文件读取产品编号列表并下载主图。CSV文件应包含以下列：
 
     \b
     - product_no: 产品编号（必需）
+    - region / host: 地区代码或主机地址（可选，指定后该行只下载这个地区）
 
     产品URL格式: {host}/+,{product_no}
 
+    指定多个 --host（或CSV中有多个地区）时，所有地区在同一个任务队列中执行，
+    共用一个浏览器，图片保存到 {output}/{地区}/{product_no}/，各地区相同的图片
+    只保存一份（硬链接）。
+
     支持的地区：
 
     \b
@@ -81,6 +176,10 @@ def downloadmips(host, csv_file, output, log, html, concurrency,
     \b
     cptools downloadmips -h https://www.cafepress.com.au \\
         --csv products.csv -c 5
+
+    \b
+    cptools downloadmips -h US -h AU -h UK -h CA \\
+        --csv products.csv -c 8 --host-concurrency 3
     """
     # 如果没有指定日志文件，自动生成基于时间戳的文件名
     if not log:
@@ -90,15 +189,41 @@ def downloadmips(host, csv_file, output, log, html, concurrency,
         Path('./logs').mkdir(parents=True, exist_ok=True)
 
     # 设置日志
-    logger = setup_logger(log)
+    logger = setup_logger(log, log_format=engine_settings['log_format'])
 
     logger.info("=" * 80)
     logger.info("开始执行产品主图下载任务")
-    logger.info(f"主机地址: {host}")
+    logger.info(f"主机地址: {', '.join(hosts) or '（CSV中指定）'}")
     logger.info(f"CSV文件: {csv_file}")
-    logger.info(f"输出目录: {output}")
+    logger.info(f"输出目录: {archive_file or output}")
     logger.info(f"并发数: {concurrency}")
     logger.info(f"超时时间: {timeout}ms")
+    logger.info(f"提取方式: {extract}")
+    if index_max_age > 0 or refresh_index:
+        logger.info(f"主图索引: {index_file} "
+                    f"(max-age={index_max_age}s, refresh={refresh_index})")
+    else:
+        logger.info("主图索引: 未启用")
+    if archive_file and Path(archive_file).suffix.lower() not in ARCHIVE_SUFFIXES:
+        raise click.BadParameter(
+            f"归档文件扩展名必须是 {' / '.join(ARCHIVE_SUFFIXES)}",
+            param_hint='--archive')
+    try:
+        sizes = [int(size) for size in derivatives.split(',') if size.strip()]
+        if any(size <= 0 for size in sizes):
+            raise ValueError(derivatives)
+    except ValueError:
+        raise click.BadParameter(
+            f"无效的尺寸列表（尺寸必须是正整数）: {derivatives}", param_hint='--derivatives')
+    pipeline = ImagePipeline(convert, quality, sizes, image_workers)
+    if pipeline.enabled:
+        error = pipeline_error(convert)
+        if error:
+            raise click.UsageError(error)
+        logger.info(f"图片后处理: 转换={convert or '否'} 质量={quality} "
+                    f"缩略图={sizes or '无'}")
+    logger.info(
+        f"就绪检测: {ready_settings['strategy']}（最长 {ready_settings['timeout']}ms）")
     logger.info("=" * 80)
 
     # 检查Playwright是否已安装
@@ -117,37 +242,106 @@ def downloadmips(host, csv_file, output, log, html, concurrency,
 
     logger.info(f"从CSV文件中读取到 {len(products)} 个Product No")
 
-    # 清理旧文件
-    output_dir = Path(output)
-    html_path = Path(html)
+    # 按地区展开
+    try:
+        host_list = [resolve_host(h) for h in hosts]
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    products = expand_regions(products, host_list, logger)
+    if not products:
+        logger.error("没有可下载的产品：请用 --host 指定主机，或在CSV中提供 region/host 列")
+        sys.exit(1)
+    regions = sorted({p['region'] for p in products})
+    host = products[0]['host']
+    if len(regions) > 1:
+        logger.info(f"共 {len(products)} 个下载任务，地区: {', '.join(regions)}")
 
-    # 删除旧的图片目录
-    if output_dir.exists():
-        logger.info(f"删除旧的Product No目录: {output_dir}")
-        shutil.rmtree(output_dir)
+    output_base = Path(output)
+    output_dir = output_base
+    html_path = Path(html)
 
     # 删除旧的HTML报告
     if html_path.exists():
         logger.info(f"删除旧的HTML报告: {html_path}")
         html_path.unlink()
 
-    # 创建输出目录
-    output_dir.mkdir(parents=True, exist_ok=True)
-    logger.info(f"创建新的Product No目录: {output_dir}")
+    # 创建本次运行的输出目录（或归档）；旧运行在后台按保留策略清理，
+    # 不再在开始时删除整个输出目录
+    archive = None
+    writer = None
+    pruner = None
+    if archive_file:
+        for old_file in (Path(archive_file), index_path(Path(archive_file))):
+            if old_file.exists():
+                logger.info(f"删除旧的归档文件: {old_file}")
+                old_file.unlink()
+        archive = ArchiveWriter(archive_file)
+        logger.info(f"图片写入归档: {archive_file}")
+    else:
+        output_dir = create_run_dir(output_base)
+        logger.info(f"本次运行的Product No目录: {output_dir}")
+        writer = AtomicWriter(output_dir)
+        pruner = RunPruner(
+            output_base, output_dir,
+            keep=output_settings['keep_runs'],
+            max_bytes=output_settings['max_output_mb'] * 1024 * 1024,
+            logger=logger)
+        pruner.start()
+
+    # 加载主图索引：不使用也不重建索引时不读写索引文件
+    mips_index = None
+    if index_max_age > 0 or refresh_index:
+        mips_index = MipsIndex(index_file)
+        mips_index.load(logger)
+        if refresh_index:
+            logger.info(f"忽略已有的 {len(mips_index.pages)} 条索引记录（--refresh-index）")
+            mips_index.clear()
+        else:
+            logger.info(f"已加载 {len(mips_index.pages)} 条索引记录")
 
     # 执行下载任务
     start_time = datetime.now()
-    results = asyncio.run(
-        run_download_tasks(
+
+    # 钉钉通知在任务的事件循环中发送（进度、告警和结束通知）
+    notifier = None
+    if not no_dingding:
+        notifier = build_notifier(
+            dingding_webhook, dingding_secret, logger, 'Product MIPs Download',
+            final=lambda results: downloadmips_notification(
+                results, start_time, csv_file, extract, index_max_age,
+                mips_index),
+            engine_settings=engine_settings)
+    try:
+        results = asyncio.run(run_download_tasks(
             products=products,
             host=host,
             output_dir=output_dir,
             concurrency=concurrency,
             timeout=timeout,
-            logger=logger
-        )
-    )
+            logger=logger,
+            extract=extract,
+            mips_index=mips_index,
+            index_max_age=index_max_age,
+            regions=len(regions) > 1,
+            pipeline=pipeline if pipeline.enabled else None,
+            archive=archive,
+            writer=writer,
+            ready_settings=ready_settings,
+            engine_settings=engine_settings,
+            report=lambda results, refresh: generate_downloadmips_html_report(
+                results, html, title="Product MIPs Download Report",
+                refresh=refresh),
+            notifier=notifier
+        ))
+    finally:
+        if archive is not None:
+            archive.close()
+        if writer is not None:
+            writer.close()
     end_time = datetime.now()
+    if writer is not None and not update_latest(output_base, output_dir):
+        logger.warning(f"Cannot create symlink {output_base / LATEST_NAME}, use {output_dir}")
     duration = (end_time - start_time).total_seconds()
 
     # 统计结果
@@ -155,6 +349,15 @@ def downloadmips(host, csv_file, output, log, html, concurrency,
     success = sum(1 for r in results if r.get('status') == 'success')
     failed = total - success
     total_images = sum(r.get('image_count', 0) for r in results)
+    retried = sum(r.get('attempts', 1) - 1 for r in results)
+    extract_counts = count_extract_paths(results)
+    region_stats = summarize_regions(results)
+
+    if mips_index is not None:
+        try:
+            mips_index.save()
+        except Exception as e:
+            logger.warning(f"Failed to save MIPs index: {str(e)}")
 
     logger.info("=" * 80)
     logger.info("Product MIPs Download Task Completed")
@@ -163,6 +366,45 @@ def downloadmips(host, csv_file, output, log, html, concurrency,
     logger.info(f"Success: {success}")
     logger.info(f"Failed: {failed}")
     logger.info(f"Downloaded Image Count: {total_images}")
+    logger.info(f"Retries: {retried}")
+    if extract != 'browser':
+        logger.info(
+            f"Extracted via HTML: {extract_counts['html']} | "
+            f"via Browser: {extract_counts['browser']} "
+            f"(fallback from HTML: {extract_counts['fallback']})")
+    if index_max_age > 0:
+        index_stats = mips_index.stats()
+        logger.info(
+            f"Index: Hit {index_stats['hits']} "
+            f"(revalidated {index_stats['revalidated']}) | "
+            f"Miss {index_stats['misses']} | "
+            f"Images not modified: {index_stats['image_revalidated']}")
+    if pipeline.enabled:
+        pipeline_stats = pipeline.stats()
+        logger.info(
+            f"Post-processed: {pipeline_stats['processed']} images | "
+            f"Converted: {pipeline_stats['converted']} | "
+            f"Derivatives: {pipeline_stats['derivatives']}")
+    if len(region_stats) > 1:
+        for region, stats in region_stats.items():
+            logger.info(
+                f"Region {region}: Success {stats['success']}/{stats['total']} | "
+                f"Images {stats['images']} (shared {stats['shared']})")
+    if archive is not None:
+        logger.info(
+            f"Archive: {archive_file} ({len(archive.entries)} entries, "
+            f"{archive.bytes_written / 1024 / 1024:.1f} MB)")
+    if writer is not None:
+        write_stats = writer.stats()
+        logger.info(
+            f"Files Written: {write_stats['files']} "
+            f"({write_stats['bytes'] / 1024 / 1024:.1f} MB, "
+            f"{write_stats['syncs']} fsync batches) | "
+            f"Manifest: {writer.manifest_path}")
+    if pruner is not None and pruner.pruned:
+        state = ('removed' if pruner.done()
+                 else 'still removing in background, resumed on next run')
+        logger.info(f"Pruned Runs: {', '.join(pruner.pruned)} ({state})")
     logger.info(f"Duration: {duration:.2f} seconds")
     logger.info("=" * 80)
 
@@ -182,36 +424,133 @@ def downloadmips(host, csv_file, output, log, html, concurrency,
     except Exception as e:
         logger.error(f"Failed to generate HTML report: {str(e)}")
 
-    # 发送钉钉通知
-    if dingding_webhook and not no_dingding:
-        try:
-            notification_content = f"""### 🖼️ Product MIPs Download Completed
+    if no_dingding:
+        logger.info("Dingding notification disabled (--no-dingding)")
+
+    # 如果有失败的任务，以非零状态码退出
+    if failed > 0:
+        sys.exit(1)
+
+
+def downloadmips_notification(
+    results: List[Dict],
+    start_time: datetime,
+    csv_file: str,
+    extract: str,
+    index_max_age: int,
+    mips_index: Optional[MipsIndex]
+) -> Optional[Tuple[str, str]]:
+    """运行结束时的钉钉通知（没有结果时不发送）"""
+    if not results:
+        return None
+    total = len(results)
+    success = sum(1 for r in results if r.get('status') == 'success')
+    failed = total - success
+    total_images = sum(r.get('image_count', 0) for r in results)
+    duration = getattr(results, 'summary', {}).get('elapsed_seconds', 0)
+    extract_counts = count_extract_paths(results)
+    index_stats = mips_index.stats() if mips_index is not None else {}
+    region_stats = summarize_regions(results)
+    content = f"""### 🖼️ Product MIPs Download Completed
 
 **Time**: {start_time.strftime('%Y-%m-%d %H:%M:%S')}
 
 **Results**: Total {total} | Success {success}✅ | Failed {failed}❌
 
-**Images**: {total_images} downloaded in {duration:.2f}s
+{breaker_note(results)}{extract_note(extract, extract_counts)}{index_note(index_max_age, index_stats)}{region_note(region_stats)}**Images**: {total_images} downloaded in {duration:.2f}s
 
 **File**: `{csv_file}`
 """
-            asyncio.run(
-                send_dingding_notification(
-                    dingding_webhook,
-                    "Product MIPs Download Task Completed",
-                    notification_content,
-                    secret=dingding_secret
-                )
-            )
-            logger.info("Dingding Notification Sent Successfully")
-        except Exception as e:
-            logger.error(f"Failed to send Dingding notification: {str(e)}")
-    elif no_dingding:
-        logger.info("Dingding notification disabled (--no-dingding)")
+    return "Product MIPs Download Task Completed", content
+
+
+def count_extract_paths(results: List[Dict]) -> Dict[str, int]:
+    """统计通过索引、HTML解析和浏览器渲染处理的产品数（fallback 为HTML找不到后改用浏览器的数量）"""
+    counts = {'index': 0, 'html': 0, 'browser': 0, 'fallback': 0}
+    for r in results:
+        path = r.get('extract')
+        if path in counts:
+            counts[path] += 1
+        if r.get('extract_fallback'):
+            counts['fallback'] += 1
+    return counts
+
+
+def extract_note(extract: str, counts: Dict[str, int]) -> str:
+    """钉钉通知中的提取方式统计（browser 模式时为空）"""
+    if extract == 'browser':
+        return ''
+    return (f"**Extract**: HTML {counts['html']} | Browser {counts['browser']} "
+            f"(fallback {counts['fallback']})\n\n")
+
+
+def index_note(index_max_age: int, stats: Dict[str, int]) -> str:
+    """钉钉通知中的索引命中统计（未使用索引时为空）"""
+    if index_max_age <= 0:
+        return ''
+    return (f"**Index**: Hit {stats['hits']} | Miss {stats['misses']} | "
+            f"Revalidated {stats['revalidated']}\n\n")
+
+
+def region_note(region_stats: Dict[str, Dict[str, int]]) -> str:
+    """钉钉通知中的分地区统计（只有一个地区时为空）"""
+    if len(region_stats) <= 1:
+        return ''
+    lines = [f"- {region}: {s['success']}/{s['total']} ✅ | Images {s['images']}"
+             for region, s in region_stats.items()]
+    return "**Regions**:\n\n" + "\n".join(lines) + "\n\n"
+
+
+def resolve_host(value: str) -> str:
+    """把地区代码（US/AU/UK/CA）转换为主机地址，主机地址原样返回（去掉末尾的 /）"""
+    value = value.strip()
+    if value.upper() in REGION_HOSTS:
+        return REGION_HOSTS[value.upper()]
+    if not value.startswith(('http://', 'https://')):
+        raise ValueError(
+            f"无效的主机或地区: {value}（可用地区: {', '.join(REGION_HOSTS)}）")
+    return value.rstrip('/')
+
+
+def region_of(host: str) -> str:
+    """主机地址对应的地区代码，未知主机返回域名"""
+    for region, region_host in REGION_HOSTS.items():
+        if host_of(region_host) == host_of(host):
+            return region
+    return host_of(host)
+
+
+def expand_regions(
+    products: List[Dict],
+    hosts: List[str],
+    logger
+) -> List[Dict]:
+    """为每个产品确定要下载的地区
 
-    # 如果有失败的任务，以非零状态码退出
-    if failed > 0:
-        sys.exit(1)
+    CSV 行指定了 region/host 时只下载该地区，否则对每个 --host 各生成一个任务。
+    同一产品的各地区任务相邻排列，使各主机的任务在队列中交错。
+    """
+    expanded = []
+    for product in products:
+        row_region = product.pop('region', '')
+        if row_region:
+            try:
+                product_hosts = [resolve_host(row_region)]
+            except ValueError as e:
+                logger.warning(f"Row {product['index']}: {str(e)}, skipping")
+                continue
+        elif hosts:
+            product_hosts = hosts
+        else:
+            logger.warning(
+                f"Row {product['index']}: no host or region, skipping")
+            continue
+        for host in product_hosts:
+            expanded.append(dict(product, host=host, region=region_of(host)))
+
+    for idx, item in enumerate(expanded, 1):
+        item['index'] = idx
+    return expanded
 
 
 def read_csv_products(csv_file: str, logger) -> List[Dict]:
@@ -219,6 +558,7 @@ def read_csv_products(csv_file: str, logger) -> List[Dict]:
 
     支持的列名（不区分大小写）：
     - product_no/PRODUCT_NO: Product No (Required)
+    - region/host/site: 地区代码或主机地址（可选）
     """
     products = []
 
@@ -255,16 +595,27 @@ def read_csv_products(csv_file: str, logger) -> List[Dict]:
 
             logger.info(f"Using column: PRODUCT_NO='{product_no_column}'")
 
+            # 查找地区列（可选）
+            region_column = None
+            for possible_name in ['region', 'host', 'site']:
+                if possible_name in fieldnames_lower:
+                    region_column = fieldnames_lower[possible_name]
+                    logger.info(f"Using column: REGION='{region_column}'")
+                    break
+
             for idx, row in enumerate(reader, 1):
                 product_no = row.get(product_no_column, '').strip()
                 if not product_no:
                     logger.warning(f"Row {idx}: Product No is empty, skipping")
                     continue
 
-                products.append({
+                product = {
                     'product_no': product_no,
                     'index': idx
-                })
+                }
+                if region_column:
+                    product['region'] = (row.get(region_column) or '').strip()
+                products.append(product)
 
     except Exception as e:
         logger.error(f"读取CSV文件失败: {str(e)}")
@@ -279,334 +630,634 @@ async def run_download_tasks(
     output_dir: Path,
     concurrency: int,
     timeout: int,
-    logger
+    logger,
+    extract: str = 'browser',
+    mips_index: Optional[MipsIndex] = None,
+    index_max_age: int = 0,
+    regions: bool = False,
+    pipeline: Optional[ImagePipeline] = None,
+    archive: Optional[ArchiveWriter] = None,
+    writer: Optional[AtomicWriter] = None,
+    ready_settings: Optional[Dict] = None,
+    engine_settings: Optional[Dict] = None,
+    report: Optional[Callable[[List[Dict], int], None]] = None,
+    notifier: Optional[Notifier] = None
 ) -> List[Dict]:
-    """运行下载任务"""
-    results = []
+    """运行下载任务
 
-    async with async_playwright() as p:
-        # 启动浏览器
-        try:
-            launch_args = [
-                '--no-sandbox',
-                '--disable-dev-shm-usage',
-                '--disable-setuid-sandbox',
-                '--disable-gpu',
-                '--disable-software-rasterizer',
-                '--disable-extensions',
-                '--disable-background-networking',
-                '--disable-background-timer-throttling',
-                '--disable-backgrounding-occluded-windows',
-                '--disable-breakpad',
-                '--disable-client-side-phishing-detection',
-                '--disable-component-update',
-                '--disable-default-apps',
-                '--disable-domain-reliability',
-                '--disable-features=AudioServiceOutOfProcess',
-                '--disable-hang-monitor',
-                '--disable-ipc-flooding-protection',
-                '--disable-notifications',
-                '--disable-offer-store-unmasked-wallet-cards',
-                '--disable-popup-blocking',
-                '--disable-print-preview',
-                '--disable-prompt-on-repost',
-                '--disable-renderer-backgrounding',
-                '--disable-sync',
-                '--disable-translate',
-                '--metrics-recording-only',
-                '--no-first-run',
-                '--mute-audio',
-                '--safebrowsing-disable-auto-update',
-                '--enable-automation',
-                '--password-store=basic',
-                '--use-mock-keychain',
-            ]
-
-            browser = await p.chromium.launch(
-                headless=True,
-                args=launch_args,
-                chromium_sandbox=False,
-            )
-            logger.info("浏览器启动成功")
-        except Exception as e:
-            logger.error(f"启动浏览器失败: {str(e)}")
-            logger.error(
-                "请确保已安装Playwright浏览器: playwright install chromium"
+    产品中带 host 时访问该主机，否则访问 host。regions 为 True 时
+    图片按地区分目录保存，并对各地区相同的图片去重。指定 pipeline 时
+    图片由进程池转换格式并生成缩略图。指定 archive 时图片写入归档，
+    output_dir 不再使用；否则图片原子写入 output_dir，指定 writer 时
+    批量 fsync 并记入完整性清单。
+    """
+    handler = DownloadMipsHandler(
+        host=host, output_dir=output_dir, ready=ready_settings,
+        extract=extract, timeout=timeout, mips_index=mips_index,
+        index_max_age=index_max_age, regions=regions, pipeline=pipeline,
+        archive=archive, writer=writer)
+    engine = build_engine(
+        handler, concurrency, logger, timeout, engine_settings,
+        report=report, notifier=notifier)
+    return await engine.run(products)
+
+
+class DownloadMipsHandler(TaskHandler):
+    """产品主图下载处理器"""
+
+    action = '处理'
+    command = 'downloadmips'
+
+    def __init__(self, host: str, output_dir: Path,
+                 ready: Optional[Dict] = None, extract: str = 'browser',
+                 timeout: int = 30000, mips_index: Optional[MipsIndex] = None,
+                 index_max_age: int = 0, regions: bool = False,
+                 pipeline: Optional[ImagePipeline] = None,
+                 archive: Optional[ArchiveWriter] = None,
+                 writer: Optional[AtomicWriter] = None):
+        self.host = host
+        self.output_dir = output_dir
+        self.ready = ready or DEFAULT_READY
+        self.extract = extract
+        self.timeout = timeout
+        self.mips_index = mips_index
+        self.index_max_age = index_max_age
+        self.regions = regions
+        self.dedup = ImageDedup(archive, writer) if regions else None
+        self.pipeline = pipeline
+        self.archive = archive
+        self.writer = writer
+        # html 模式完全不需要浏览器
+        self.uses_browser = extract != 'html'
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def setup(self):
+        # html / auto 模式和按索引下载时用HTTP会话获取页面和图片
+        if self.extract != 'browser' or (
+                self.mips_index is not None and self.index_max_age > 0):
+            self.session = self.http.session(
+                headers={'User-Agent': USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=self.timeout / 1000),
             )
-            return []
 
-        try:
-            # 创建信号量控制并发
-            semaphore = asyncio.Semaphore(concurrency)
-
-            # 创建所有任务
-            tasks = []
-            for product in products:
-                task = download_single_product(
-                    browser=browser,
-                    product=product,
-                    host=host,
-                    output_dir=output_dir,
-                    timeout=timeout,
-                    semaphore=semaphore,
-                    logger=logger
-                )
-                tasks.append(task)
-
-            # 并发执行所有任务
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # 处理异常结果
-            processed_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    product_no = products[i]['product_no']
-                    processed_results.append({
-                        'product_no': product_no,
-                        'url': (
-                            f"{host}/+,{product_no}"
-                        ),
-                        'status': 'failed',
-                        'error': str(result),
-                        'image_count': 0,
-                        'images': []
-                    })
-                else:
-                    processed_results.append(result)
-
-            results = processed_results
-
-        finally:
-            await browser.close()
-            logger.info("浏览器已关闭")
-
-    return results
+        if self.pipeline is not None:
+            self.pipeline.start()
+
+    async def teardown(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.pipeline is not None:
+            self.pipeline.close()
+
+    def describe(self, item: Dict) -> str:
+        return item['product_no']
+
+    def host_of(self, item: Dict) -> str:
+        return host_of(item.get('host', self.host))
+
+    async def process(self, task: TaskContext) -> Dict:
+        item = task.item
+        # 写入归档时结果中的路径为 <归档路径>/<条目名>
+        output_dir = self.archive.path if self.archive else self.output_dir
+        if self.regions:
+            # 未知主机的地区名是域名（可能带端口），替换掉路径中不能用的冒号
+            output_dir = output_dir / item['region'].replace(':', '_')
+        result = await download_single_product(
+            task=task,
+            host=item.get('host', self.host),
+            output_dir=output_dir,
+            ready=self.ready,
+            extract=self.extract,
+            session=self.session,
+            mips_index=self.mips_index,
+            index_max_age=self.index_max_age,
+            dedup=self.dedup,
+            pipeline=self.pipeline,
+            archive=self.archive,
+            writer=self.writer
+        )
+        if item.get('region'):
+            result['region'] = item['region']
+        return result
+
+    def failure_result(self, item: Dict, error: str) -> Dict:
+        host = item.get('host', self.host)
+        result = failed_product_result(
+            item['product_no'], f"{host}/+,{item['product_no']}", error)
+        if item.get('region'):
+            result['region'] = item['region']
+        return result
+
+
+def failed_product_result(
+    product_no: str,
+    url: str,
+    error: str,
+    status_code: Optional[int] = None,
+    extract: Optional[str] = None,
+    fallback: bool = False
+) -> Dict:
+    """构建失败的产品结果"""
+    result = {
+        'product_no': product_no,
+        'url': url,
+        'status': 'failed',
+        'status_code': status_code,
+        'error': error,
+        'image_count': 0,
+        'images': []
+    }
+    if extract:
+        result['extract'] = extract
+        result['extract_fallback'] = fallback
+    return result
 
 
 async def download_single_product(
-    browser: Browser,
-    product: Dict,
+    task: TaskContext,
     host: str,
     output_dir: Path,
-    timeout: int,
-    semaphore: asyncio.Semaphore,
-    logger
+    ready: Optional[Dict] = None,
+    extract: str = 'browser',
+    session: Optional[aiohttp.ClientSession] = None,
+    mips_index: Optional[MipsIndex] = None,
+    index_max_age: int = 0,
+    dedup: Optional[ImageDedup] = None,
+    pipeline: Optional[ImagePipeline] = None,
+    archive: Optional[ArchiveWriter] = None,
+    writer: Optional[AtomicWriter] = None
 ) -> Dict:
-    """下载单个产品的主图"""
+    """下载单个产品的主图
+
+    extract 为 html 时只用 HTTP 请求获取页面并解析主图地址，图片也用 HTTP 下载；
+    为 auto 时先尝试 HTML，找不到主图再用浏览器渲染页面；为 browser 时只用浏览器。
+    索引中有该产品的有效条目时直接按索引下载图片（extract 记为 index），
+    不访问产品页面。结果的 extract 字段记录实际使用的方式。
+    指定 dedup 时与已保存的相同图片用硬链接代替重复写入；指定 pipeline 时
+    转换格式并生成缩略图；指定 archive 时图片写入归档，否则原子写入
+    product 目录（writer 记录完整性清单）。
+    """
+    product = task.item
     product_no = product['product_no']
-    index = product['index']
+    index = task.index
+    logger = task.logger
     url = f"{host}/+,{product_no}"
 
-    async with semaphore:
-        logger.info(f"[{index}] 开始处理产品: {product_no}")
+    logger.info(f"[{index}] 开始处理产品: {product_no}")
 
-        # 创建产品文件夹
-        product_dir = output_dir / product_no
+    # 创建产品文件夹
+    product_dir = output_dir / product_no
+    if archive is None:
         product_dir.mkdir(parents=True, exist_ok=True)
 
-        page = None
-        context = None
+    # 随机延迟（模拟人类行为）
+    await task.delay(2.0, 4.0)
+
+    if mips_index is not None and index_max_age > 0:
+        img_urls = await image_urls_from_index(
+            task, session, mips_index, url, index_max_age)
+        if img_urls is not None:
+            downloaded_images = await download_images(
+                task, product_no, product_dir, img_urls,
+                lambda img_url: fetch_image_http(
+                    session, img_url, url, mips_index),
+                mips_index, dedup, pipeline, archive, writer)
+            if downloaded_images:
+                return product_result(
+                    task, product_no, url, downloaded_images, extract='index')
+            # 图片地址可能已经变化，删除条目后重新提取
+            logger.info(f"[{index}] 按索引下载图片全部失败，重新提取主图地址")
+            mips_index.drop(url)
+
+    fallback = False
+    if extract != 'browser':
         try:
-            # 随机延迟（模拟人类行为）
-            delay = random.uniform(2.0, 4.0)
-            logger.debug(f"[{index}] 随机延迟 {delay:.2f} 秒")
-            await asyncio.sleep(delay)
-
-            # 创建上下文
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent=(
-                    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                    'AppleWebKit/537.36 (KHTML, like Gecko) '
-                    'Chrome/120.0.0.0 Safari/537.36'
-                ),
-                locale='en-US',
-                ignore_https_errors=True,
-            )
-
-            page = await context.new_page()
-
-            # 设置超时
-            page.set_default_navigation_timeout(timeout)
-            page.set_default_timeout(timeout)
-
-            # 访问页面
-            logger.info(f"[{index}] 访问页面: {url}")
+            status_code, img_urls, page_headers = await fetch_image_urls_html(
+                task, session, url)
+        except Exception as e:
+            if extract == 'html':
+                raise
+            logger.info(f"[{index}] 获取页面HTML失败，改用浏览器: {str(e)}")
+            status_code, img_urls, page_headers = None, [], {}
+
+        if status_code is not None and status_code >= 400 and (
+                extract == 'html' or status_code in PERMANENT_STATUSES):
+            error_msg = f"HTTP {status_code}"
+            logger.error(f"[{index}] 访问失败: {url} - {error_msg}")
+            return failed_product_result(
+                product_no, url, error_msg, status_code=status_code,
+                extract='html')
+
+        if any(img_urls):
+            logger.info(f"[{index}] 从页面HTML找到 {len(img_urls)} 张图片")
+            img_urls = [normalize_image_url(u, host) if u else None
+                        for u in img_urls]
+            if mips_index is not None:
+                mips_index.put(url, product_no, img_urls, page_headers)
+            downloaded_images = await download_images(
+                task, product_no, product_dir, img_urls,
+                lambda img_url: fetch_image_http(
+                    session, img_url, url, mips_index,
+                    revalidate=index_max_age > 0),
+                mips_index, dedup, pipeline, archive, writer)
+            return product_result(
+                task, product_no, url, downloaded_images, extract='html')
+
+        if extract == 'html':
+            error_msg = "未找到产品主图 (class='stackable-image-container')"
+            logger.warning(f"[{index}] {error_msg}")
+            return failed_product_result(
+                product_no, url, error_msg, extract='html')
+        if status_code is not None and status_code >= 400:
+            logger.info(f"[{index}] 页面HTML返回 HTTP {status_code}，改用浏览器渲染")
+        elif status_code is not None:
+            logger.info(f"[{index}] 页面HTML中没有主图，改用浏览器渲染")
+        fallback = True
+
+    async with task.page() as page:
+        # 访问页面
+        logger.info(f"[{index}] 访问页面: {url}")
+        with task.phase('goto'):
             resp = await page.goto(url, wait_until='domcontentloaded')
 
-            # 检查HTTP状态码
-            if resp is None or resp.status >= 400:
-                error_msg = (
-                    f"HTTP {resp.status if resp else 'No Response'}"
-                )
-                logger.error(f"[{index}] 访问失败: {url} - {error_msg}")
-                await context.close()
-                return {
-                    'product_no': product_no,
-                    'url': url,
-                    'status': 'failed',
-                    'error': error_msg,
-                    'image_count': 0,
-                    'images': []
-                }
-
-            # 等待页面加载
+        # 检查HTTP状态码
+        if resp is None or resp.status >= 400:
+            error_msg = f"HTTP {resp.status if resp else 'No Response'}"
+            logger.error(f"[{index}] 访问失败: {url} - {error_msg}")
+            return failed_product_result(
+                product_no, url, error_msg,
+                status_code=resp.status if resp else None,
+                extract='browser', fallback=fallback)
+
+        # 等待页面就绪（默认等待主图元素出现）
+        await wait_until_ready(task, page, **(ready or DEFAULT_READY))
+
+        # 查找所有 class="stackable-image-container" 的 div 下的图片
+        logger.info(f"[{index}] 查找产品主图...")
+        with task.phase('selector'):
+            images = await page.query_selector_all(IMAGE_SELECTOR)
+
+        if not images:
+            error_msg = "未找到产品主图 (class='stackable-image-container')"
+            logger.warning(f"[{index}] {error_msg}")
+            return failed_product_result(
+                product_no, url, error_msg,
+                extract='browser', fallback=fallback)
+
+        logger.info(f"[{index}] 找到 {len(images)} 张图片")
+
+        img_urls = []
+        for img in images:
+            img_url = await img.get_attribute('src')
+            img_urls.append(normalize_image_url(img_url, host) if img_url else None)
+        if mips_index is not None:
             try:
-                await page.wait_for_load_state('networkidle', timeout=5000)
+                page_headers = await resp.all_headers()
             except Exception:
-                logger.debug(f"[{index}] 网络空闲等待超时，继续处理")
-                pass
-
-            # 查找所有 class="stackable-image-container" 的 div 下的图片
-            logger.info(f"[{index}] 查找产品主图...")
-            images = await page.query_selector_all(
-                '.stackable-image-container img'
-            )
-
-            if not images:
-                error_msg = (
-                    "未找到产品主图 (class='stackable-image-container')"
+                page_headers = {}
+            mips_index.put(url, product_no, img_urls, page_headers)
+
+        # 在页面中下载图片（与页面共用 Cookie 和来源）
+        downloaded_images = await download_images(
+            task, product_no, product_dir, img_urls,
+            lambda img_url: fetch_image_in_page(page, img_url),
+            mips_index, dedup, pipeline, archive, writer)
+
+    return product_result(
+        task, product_no, url, downloaded_images,
+        extract='browser', fallback=fallback)
+
+
+async def image_urls_from_index(
+    task: TaskContext,
+    session: aiohttp.ClientSession,
+    mips_index: MipsIndex,
+    url: str,
+    max_age: int
+) -> Optional[List[Optional[str]]]:
+    """从索引获取产品的主图地址，没有可用条目时返回 None
+
+    条目未超过 max_age 时直接使用；更旧的条目如果记录了页面验证器，
+    发送条件请求，返回304时继续使用并刷新提取时间。
+    """
+    entry = mips_index.get(url)
+    if entry is not None and mips_index.is_fresh(entry, max_age):
+        mips_index.hits += 1
+        task.logger.info(f"[{task.index}] 使用索引中的主图地址（跳过页面渲染）")
+        return entry['images']
+
+    headers = ResponseCache.conditional_headers(entry) if entry else {}
+    if headers:
+        try:
+            with task.phase('revalidate'):
+                async with session.get(url, headers=headers) as resp:
+                    status = resp.status
+        except Exception as e:
+            task.logger.debug(f"[{task.index}] 索引条件请求失败: {str(e)}")
+            status = None
+        if status == 304:
+            mips_index.touch(url)
+            mips_index.hits += 1
+            mips_index.revalidated += 1
+            task.logger.info(f"[{task.index}] 产品页面未修改（304），使用索引中的主图地址")
+            return entry['images']
+
+    if task.attempt == 1:
+        mips_index.misses += 1
+    return None
+
+
+async def fetch_image_urls_html(
+    task: TaskContext,
+    session: aiohttp.ClientSession,
+    url: str
+) -> Tuple[int, List[Optional[str]], Dict[str, str]]:
+    """用 HTTP 请求获取产品页面，边下载边解析主图地址
+
+    Returns:
+        (状态码, 主图地址列表, 响应头)；状态码 >= 400 时地址列表为空
+    """
+    parser = MipsImageParser()
+    with task.phase('html'):
+        async with session.get(url) as resp:
+            if resp.status >= 400:
+                return resp.status, [], dict(resp.headers)
+            decoder = codecs.getincrementaldecoder(
+                resp.charset or 'utf-8')(errors='replace')
+            async for chunk in resp.content.iter_chunked(HTML_CHUNK_SIZE):
+                task.add_bytes(len(chunk))
+                parser.feed(decoder.decode(chunk))
+            parser.feed(decoder.decode(b'', final=True))
+            parser.close()
+            return resp.status, parser.images, dict(resp.headers)
+
+
+async def fetch_image_http(
+    session: aiohttp.ClientSession,
+    img_url: str,
+    referer: str,
+    mips_index: Optional[MipsIndex] = None,
+    revalidate: bool = True
+) -> Optional[bytes]:
+    """用 HTTP 请求下载图片，指定 mips_index 时记录图片的验证器
+
+    revalidate 为真、索引中记录了该图片的验证器且上次保存的文件完整（大小和
+    修改时间与记录一致）时发送条件请求，返回304则在线程中读取上次保存的文件；
+    文件已不可读（如旧运行正被清理）时不带条件请求头重新下载。
+    """
+    headers = {'Referer': referer}
+    previous = mips_index.image(img_url) if mips_index is not None and revalidate else None
+    if previous and previous.get('path') and file_intact(previous['path'], previous):
+        conditional = dict(headers, **ResponseCache.conditional_headers(previous))
+        async with session.get(img_url, headers=conditional) as resp:
+            if resp.status != 304:
+                return await read_image_response(resp, img_url, mips_index)
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(
+                None, Path(previous['path']).read_bytes)
+        except OSError:
+            data = None
+        if data:
+            mips_index.image_revalidated += 1
+            mips_index.touch_image(img_url)
+            return data
+
+    async with session.get(img_url, headers=headers) as resp:
+        return await read_image_response(resp, img_url, mips_index)
+
+
+async def read_image_response(
+    resp: aiohttp.ClientResponse,
+    img_url: str,
+    mips_index: Optional[MipsIndex] = None
+) -> bytes:
+    """读取图片响应，状态码 >= 400 时抛出异常"""
+    if resp.status >= 400:
+        raise RuntimeError(f"HTTP {resp.status}")
+    data = await resp.read()
+    if mips_index is not None:
+        mips_index.put_image(img_url, resp.headers)
+    return data
+
+
+async def fetch_image_in_page(page, img_url: str) -> Optional[bytes]:
+    """在页面中用 fetch 下载图片（使用 CDP，更可靠）"""
+    img_data = await page.evaluate(f'''
+        async () => {{
+            const response = await fetch("{img_url}");
+            const blob = await response.blob();
+            const reader = new FileReader();
+            return new Promise((resolve) => {{
+                reader.onloadend = () => {{
+                    resolve(reader.result);
+                }};
+                reader.readAsDataURL(blob);
+            }});
+        }}
+    ''')
+
+    # 解析 base64 数据
+    if img_data and img_data.startswith('data:'):
+        return base64.b64decode(img_data.split(',')[1])
+    return None
+
+
+async def download_images(
+    task: TaskContext,
+    product_no: str,
+    product_dir: Path,
+    img_urls: List[Optional[str]],
+    fetch: Callable[[str], Awaitable[Optional[bytes]]],
+    mips_index: Optional[MipsIndex] = None,
+    dedup: Optional[ImageDedup] = None,
+    pipeline: Optional[ImagePipeline] = None,
+    archive: Optional[ArchiveWriter] = None,
+    writer: Optional[AtomicWriter] = None
+) -> List[Dict]:
+    """依次下载主图并保存，返回下载成功的图片列表
+
+    img_urls 中的 None 表示该图片没有地址（跳过，但保留编号）。
+    扩展名按下载内容的文件头确定，不是图片的内容视为下载失败。
+    指定 mips_index 时记录每张图片保存的位置，供之后的条件请求复用；
+    指定 dedup 时相同的图片链接到已保存的原件（记入 shared_with）；
+    指定 pipeline 时由进程池写出转换后的图片和缩略图；
+    指定 archive 时追加写入归档，不生成文件；否则先写临时文件再原子改名，
+    指定 writer 时由它批量 fsync 并记入完整性清单。
+    """
+    index = task.index
+    logger = task.logger
+    downloaded_images = []
+    for img_idx, img_url in enumerate(img_urls, 1):
+        try:
+            if not img_url:
+                logger.warning(
+                    f"[{index}] 图片 {img_idx} 没有src属性，跳过"
                 )
-                logger.warning(f"[{index}] {error_msg}")
-                await context.close()
-                return {
-                    'product_no': product_no,
-                    'url': url,
-                    'status': 'failed',
-                    'error': error_msg,
-                    'image_count': 0,
-                    'images': []
-                }
-
-            logger.info(f"[{index}] 找到 {len(images)} 张图片")
-
-            # 下载图片
-            downloaded_images = []
-            for img_idx, img in enumerate(images, 1):
-                try:
-                    # 获取图片URL
-                    img_url = await img.get_attribute('src')
-                    if not img_url:
-                        logger.warning(
-                            f"[{index}] 图片 {img_idx} 没有src属性，跳过"
-                        )
-                        continue
-
-                    # 如果是相对路径，转为绝对路径
-                    if img_url.startswith('//'):
-                        img_url = 'https:' + img_url
-                    elif img_url.startswith('/'):
-                        # 使用 host 构建完整 URL
-                        img_url = host.rstrip('/') + img_url
-
-                    # 获取文件扩展名
-                    ext = '.jpg'
-                    if '.png' in img_url.lower():
-                        ext = '.png'
-                    elif '.gif' in img_url.lower():
-                        ext = '.gif'
-                    elif '.webp' in img_url.lower():
-                        ext = '.webp'
-
-                    # 生成文件名
-                    img_filename = f"{product_no}_{img_idx:02d}{ext}"
-                    img_path = product_dir / img_filename
-
-                    # 下载图片
-                    logger.debug(
-                        f"[{index}] 下载图片 {img_idx}: {img_url}"
-                    )
-
-                    # 使用 CDP 下载图片（更可靠）
-                    img_data = await page.evaluate(f'''
-                        async () => {{
-                            const response = await fetch("{img_url}");
-                            const blob = await response.blob();
-                            const reader = new FileReader();
-                            return new Promise((resolve) => {{
-                                reader.onloadend = () => {{
-                                    resolve(reader.result);
-                                }};
-                                reader.readAsDataURL(blob);
-                            }});
-                        }}
-                    ''')
-
-                    # 解析 base64 数据
-                    if img_data and img_data.startswith('data:'):
-                        import base64
-                        base64_data = img_data.split(',')[1]
-                        img_bytes = base64.b64decode(base64_data)
-
-                        # 保存图片
-                        with open(img_path, 'wb') as f:
-                            f.write(img_bytes)
-
-                        logger.info(
-                            f"[{index}] 图片 {img_idx} "
-                            f"下载成功: {img_filename}"
-                        )
-                        downloaded_images.append({
-                            'filename': img_filename,
-                            'path': str(img_path),
-                            'url': img_url
-                        })
-                    else:
-                        logger.warning(
-                            f"[{index}] 图片 {img_idx} "
-                            f"下载失败: 无效的数据"
-                        )
-
-                except Exception as e:
-                    logger.error(
-                        f"[{index}] 图片 {img_idx} 下载失败: {str(e)}"
+                continue
+
+            stem = f"{product_no}_{img_idx:02d}"
+
+            # 其他地区已下载过同一地址时直接链接，不再下载
+            original = dedup.find_url(img_url) if dedup else None
+            if original is not None:
+                image = link_image(
+                    dedup, original, product_dir / f"{stem}{original.suffix}",
+                    img_url, pipeline)
+                if image:
+                    logger.info(
+                        f"[{index}] 图片 {img_idx} 与已下载的图片相同，"
+                        f"已链接: {image['filename']}"
                     )
+                    downloaded_images.append(image)
                     continue
 
-            await context.close()
+            # 下载图片
+            logger.debug(f"[{index}] 下载图片 {img_idx}: {img_url}")
+            with task.phase('fetch'):
+                img_bytes = await fetch(img_url)
 
-            if downloaded_images:
-                logger.info(
-                    f"[{index}] 产品 {product_no} 处理完成，"
-                    f"下载了 {len(downloaded_images)} 张图片"
+            if not img_bytes:
+                logger.warning(
+                    f"[{index}] 图片 {img_idx} 下载失败: 无效的数据"
                 )
-                return {
-                    'product_no': product_no,
-                    'url': url,
-                    'status': 'success',
-                    'error': '',
-                    'image_count': len(downloaded_images),
-                    'images': downloaded_images
-                }
-            else:
-                error_msg = "所有图片下载失败"
-                logger.warning(f"[{index}] {error_msg}")
-                return {
-                    'product_no': product_no,
-                    'url': url,
-                    'status': 'failed',
-                    'error': error_msg,
-                    'image_count': 0,
-                    'images': []
+                continue
+            task.add_bytes(len(img_bytes))
+
+            source_format = sniff_format(img_bytes)
+            if source_format is None:
+                logger.warning(
+                    f"[{index}] 图片 {img_idx} 下载失败: 内容不是图片"
+                    f"（{img_bytes[:16]!r}）"
+                )
+                continue
+
+            output_format = (pipeline.output_format(source_format)
+                             if pipeline else source_format)
+            img_path = product_dir / f"{stem}{IMAGE_EXTENSIONS[output_format]}"
+
+            digest, original = (dedup.find_data(img_bytes) if dedup
+                                else (None, None))
+            image = None
+            if original is not None:
+                image = link_image(dedup, original, img_path, img_url, pipeline)
+            if image is None:
+                image = {
+                    'filename': img_path.name,
+                    'path': str(img_path),
+                    'url': img_url,
+                    'format': output_format
                 }
+                if pipeline is not None:
+                    # 下载的字节直接交给子进程，不写盘再读回
+                    with task.phase('convert'):
+                        info = await pipeline.process(
+                            img_bytes, img_path, source_format,
+                            to_memory=archive is not None)
+                    image['derivatives'] = info['derivatives']
+                    if archive is not None:
+                        with task.phase('write'):
+                            archive.write(img_path, info['data'])
+                            for thumb_path, thumb_data in zip(
+                                    info['derivatives'], info['derivative_data']):
+                                archive.write(thumb_path, thumb_data)
+                    elif writer is not None:
+                        # 子进程已原子写出，这里只记入清单
+                        writer.record(img_path, info['entry'])
+                        for thumb_path, thumb_entry in zip(
+                                info['derivatives'], info['derivative_entries']):
+                            writer.record(thumb_path, thumb_entry)
+                elif archive is not None:
+                    with task.phase('write'):
+                        archive.write(img_path, img_bytes)
+                else:
+                    with task.phase('write'):
+                        (writer.write if writer is not None else write_atomic)(
+                            img_path, img_bytes)
+                if dedup is not None:
+                    dedup.register(img_url, digest, img_path)
+            if mips_index is not None:
+                mips_index.image_saved(
+                    img_url, img_path, saved_integrity(img_path, archive, writer))
+
+            logger.info(
+                f"[{index}] 图片 {img_idx} "
+                f"下载成功: {image['filename']}"
+            )
+            downloaded_images.append(image)
 
         except Exception as e:
-            error_msg = str(e)
-            logger.error(
-                f"[{index}] 处理失败: {product_no} - {error_msg}"
-            )
+            logger.error(f"[{index}] 图片 {img_idx} 下载失败: {str(e)}")
+            continue
+    return downloaded_images
 
-            if context:
-                try:
-                    await context.close()
-                except Exception:
-                    pass
-
-            return {
-                'product_no': product_no,
-                'url': url,
-                'status': 'failed',
-                'error': error_msg,
-                'image_count': 0,
-                'images': []
-            }
+
+def saved_integrity(
+    img_path: Path,
+    archive: Optional[ArchiveWriter] = None,
+    writer: Optional[AtomicWriter] = None
+) -> Dict:
+    """已保存图片的完整性信息（大小、SHA-256，文件还有修改时间），供索引记录"""
+    if archive is not None:
+        return archive.entries.get(archive.name_of(img_path), {})
+    if writer is not None and str(img_path) in writer.entries:
+        return writer.entries[str(img_path)]
+    return file_digest(img_path)
+
+
+def link_image(
+    dedup: ImageDedup,
+    original: Path,
+    img_path: Path,
+    img_url: str,
+    pipeline: Optional[ImagePipeline] = None
+) -> Optional[Dict]:
+    """把图片（和缩略图）硬链接到已保存的原件，失败时返回 None"""
+    if not dedup.link(original, img_path):
+        return None
+    image = {
+        'filename': img_path.name,
+        'path': str(img_path),
+        'url': img_url,
+        'format': FORMAT_OF_EXTENSION.get(original.suffix),
+        'shared_with': str(original)
+    }
+    if pipeline is not None and pipeline.sizes:
+        image['derivatives'] = [
+            str(derivative_path(img_path, size)) for size in pipeline.sizes
+            if dedup.link(derivative_path(original, size),
+                          derivative_path(img_path, size))
+        ]
+    return image
+
+
+def product_result(
+    task: TaskContext,
+    product_no: str,
+    url: str,
+    downloaded_images: List[Dict],
+    extract: str,
+    fallback: bool = False
+) -> Dict:
+    """根据下载的图片构建产品结果"""
+    index = task.index
+    if downloaded_images:
+        task.logger.info(
+            f"[{index}] 产品 {product_no} 处理完成，"
+            f"下载了 {len(downloaded_images)} 张图片"
+        )
+        return {
+            'product_no': product_no,
+            'url': url,
+            'status': 'success',
+            'error': '',
+            'image_count': len(downloaded_images),
+            'images': downloaded_images,
+            'extract': extract,
+            'extract_fallback': fallback
+        }
+
+    error_msg = "所有图片下载失败"
+    task.logger.warning(f"[{index}] {error_msg}")
+    return failed_product_result(
+        product_no, url, error_msg, extract=extract, fallback=fallback)
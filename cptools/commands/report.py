@@ -0,0 +1,84 @@
+"""报告重建命令实现"""
+import click
+import webbrowser
+from pathlib import Path
+import sys
+
+from cptools.engine import read_jsonl_results
+from cptools.utils.logger import setup_logger
+from cptools.utils.html_report import generate_html_report
+from cptools.utils.url404_report import generate_url404_html_report
+from cptools.utils.downloadmips_report import generate_downloadmips_html_report
+
+# 命令名 -> (报告生成函数, 默认标题)
+REPORT_GENERATORS = {
+    'url404': (generate_url404_html_report, 'URL 404检测报告'),
+    'screenshot': (generate_html_report, '截屏报告'),
+    'downloadmips': (generate_downloadmips_html_report, '产品主图下载报告'),
+}
+
+
+@click.command()
+@click.argument('results_file', type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    '--html', default=None,
+    help='HTML报告输出路径（默认：与结果文件同名的 .html）')
+@click.option(
+    '--type', 'report_type', default='auto',
+    type=click.Choice(['auto'] + list(REPORT_GENERATORS)),
+    help='报告类型（默认：auto，按结果文件中记录的命令选择）')
+@click.option(
+    '--title', default=None,
+    help='报告标题（默认与原命令相同）')
+@click.option(
+    '--open', 'open_browser', is_flag=True, default=False,
+    help='生成后在浏览器中打开报告')
+def report(results_file, html, report_type, title, open_browser):
+    """报告重建工具
+
+    根据 --results-jsonl 写出的结果文件重新生成 HTML 报告，不需要重新运行任务。
+    运行中途中断的结果文件也可以使用（只包含已完成的结果）。
+
+    示例：
+
+    \b
+    cptools report results.jsonl
+    cptools report results.jsonl --html ./reports/url404.html --open
+    """
+    logger = setup_logger()
+
+    try:
+        run_info, results = read_jsonl_results(results_file, logger)
+    except OSError as e:
+        logger.error(f"读取结果文件失败: {str(e)}")
+        sys.exit(1)
+
+    command = run_info.get('command', '')
+    if report_type == 'auto':
+        if command not in REPORT_GENERATORS:
+            raise click.UsageError(
+                f"结果文件中没有可识别的命令名（{command or '空'}），请用 --type 指定报告类型")
+        report_type = command
+
+    if not results:
+        logger.error("结果文件中没有任何结果")
+        sys.exit(1)
+
+    generate, default_title = REPORT_GENERATORS[report_type]
+    html = html or str(Path(results_file).with_suffix('.html'))
+    logger.info(
+        f"从 {results_file} 读取 {len(results)} 条结果"
+        f"（运行开始于 {run_info.get('started_at', '未知')}）")
+
+    try:
+        generate(results, html, title=title or default_title)
+    except Exception as e:
+        logger.error(f"生成HTML报告失败: {str(e)}")
+        sys.exit(1)
+    logger.info(f"HTML报告已生成: {html}")
+
+    if open_browser:
+        try:
+            webbrowser.open(f'file://{Path(html).absolute()}')
+        except Exception as e:
+            logger.warning(f"自动打开浏览器失败: {str(e)}")
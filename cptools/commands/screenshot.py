@@ -1,20 +1,52 @@
 """截屏命令实现"""
 import click
 import asyncio
-import csv
-import random
-import shutil
 import webbrowser
 from pathlib import Path
-from urllib.parse import urlparse, urljoin
 from datetime import datetime
-from typing import List, Dict
+from typing import AsyncIterator, Callable, List, Dict, Optional, Tuple
 import sys
-
-from playwright.async_api import async_playwright, Browser
+import shutil
+import tempfile
+
+from cptools.commands.common import (
+    breaker_note, build_engine, build_notifier, engine_options,
+    output_options, readiness_options
+)
+from cptools.engine.notifier import Notifier
+from cptools.engine import TaskContext, TaskHandler, USER_AGENT
+from cptools.engine.readiness import wait_until_ready
 from cptools.utils.logger import setup_logger
+from cptools.utils.sources import build_full_url, open_url_source
 from cptools.utils.html_report import generate_html_report
-from cptools.utils.dingding import send_dingding_notification
+from cptools.utils.archive import ARCHIVE_SUFFIXES, ArchiveWriter, index_path
+from cptools.utils.atomic_write import AtomicWriter, write_atomic
+from cptools.utils.png_stitch import PngStitcher, stitch_available
+from cptools.utils.run_dirs import (
+    LATEST_NAME, RunPruner, create_run_dir, update_latest)
+
+CAPTURE_MODES = ['full', 'tiles', 'stitch', 'auto']
+
+# 默认就绪检测：首屏图片解码完成即可截图，最多等待 3 秒
+DEFAULT_READY = {
+    'strategy': 'images',
+    'timeout': 3000,
+    'selector': '',
+    'audit': False,
+}
+
+# 截图设备像素比（2x DPI，提高截图清晰度）
+DEVICE_SCALE_FACTOR = 2
+
+# auto 模式下页面高度（设备像素）超过此值时改为分块截图；
+# Chromium 单张位图超过 16384 像素后容易失败
+AUTO_TILE_HEIGHT = 16384
+
+# 分块截图的最大块数（防止无限滚动页面一直截下去）
+MAX_TILES = 200
+
+# 每次滚动后等待懒加载内容渲染的时间（秒）
+TILE_SETTLE = 0.1
 
 
 @click.command()
@@ -22,11 +54,15 @@ from cptools.utils.dingding import send_dingding_notification
     '--host', '-h', required=True,
     help='默认主机地址（当CSV中的URL没有域名时使用）')
 @click.option(
-    '--csv', 'csv_file', required=True, type=click.Path(exists=True),
+    '--csv', 'csv_file', default=None, type=click.Path(exists=True),
     help='CSV文件路径，包含要截图的URL列表')
+@click.option(
+    '--sitemap', default=None,
+    help='sitemap.xml 的URL或文件路径（支持sitemap索引和.gz，可替代--csv）')
 @click.option(
     '--output', '-o', default='./screenshots',
-    help='截图保存目录（默认：./screenshots）')
+    help='截图保存目录，每次运行写入其中的 <运行ID>/ 子目录，'
+         'latest 链接指向最近一次（默认：./screenshots）')
 @click.option(
     '--log', '-l', default='',
     help='日志文件路径（默认：./logs/YYYYMMDD_HHMMSS.log）')
@@ -62,12 +98,25 @@ from cptools.utils.dingding import send_dingding_notification
     '--template', default='default',
     type=click.Choice(['default', 'terminal', 'minimal']),
     help='HTML报告模板（默认：default）')
-def screenshot(host, csv_file, output, log, html, concurrency,
+@click.option(
+    '--capture', default='full', type=click.Choice(CAPTURE_MODES),
+    help='截图方式：full整页一次截取，tiles逐屏截取保存为多张分块，'
+         'stitch逐屏截取并拼接成一张（需要Pillow），'
+         'auto仅对超高页面分块（默认：full）')
+@click.option(
+    '--archive', 'archive_file', default=None,
+    help='把截图依次追加写入该 .tar / .zip 归档（附带索引），不再逐个生成文件；'
+         '用 cptools archive serve 查看报告中的截图')
+@readiness_options(DEFAULT_READY['strategy'], DEFAULT_READY['timeout'])
+@output_options
+@engine_options
+def screenshot(host, csv_file, sitemap, output, log, html, concurrency,
                dingding_webhook, dingding_secret, no_dingding, timeout, width,
-               height, template):
+               height, template, capture, archive_file, ready_settings,
+               output_settings, engine_settings):
     """网页截屏工具
 
-    从CSV文件读取URL列表并进行截图。CSV文件应包含以下列：
+    从CSV文件或sitemap.xml读取URL列表并进行截图。CSV文件应包含以下列：
 
     \b
     - url: 页面URL（可以是完整URL或相对路径）
@@ -82,7 +131,21 @@ def screenshot(host, csv_file, output, log, html, concurrency,
     \b
     cptools screenshot --host http://example.com \\
         --csv urls.csv --output ./imgs -c 10
+
+    \b
+    cptools screenshot -h https://www.cafepress.com \\
+        --sitemap https://www.cafepress.com/sitemap.xml
     """
+    if bool(csv_file) == bool(sitemap):
+        raise click.UsageError("必须且只能指定 --csv 或 --sitemap 其中之一")
+    source = csv_file or sitemap
+    if capture == 'stitch' and not stitch_available():
+        raise click.UsageError("--capture stitch 需要安装 Pillow: pip install Pillow")
+    if archive_file and Path(archive_file).suffix.lower() not in ARCHIVE_SUFFIXES:
+        raise click.BadParameter(
+            f"归档文件扩展名必须是 {' / '.join(ARCHIVE_SUFFIXES)}",
+            param_hint='--archive')
+
     # 如果没有指定日志文件，自动生成基于时间戳的文件名
     if not log:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -91,17 +154,20 @@ def screenshot(host, csv_file, output, log, html, concurrency,
         Path('./logs').mkdir(parents=True, exist_ok=True)
 
     # 设置日志
-    logger = setup_logger(log)
+    logger = setup_logger(log, log_format=engine_settings['log_format'])
 
     logger.info("=" * 80)
     logger.info("开始执行截屏任务")
     logger.info(f"主机地址: {host}")
-    logger.info(f"CSV文件: {csv_file}")
-    logger.info(f"输出目录: {output}")
+    logger.info(f"输入源: {source}")
+    logger.info(f"输出目录: {archive_file or output}")
     logger.info(f"并发数: {concurrency}")
     logger.info(f"超时时间: {timeout}ms")
     logger.info(f"窗口大小: {width}x{height}")
     logger.info(f"报告模板: {template}")
+    logger.info(f"截图方式: {capture}")
+    logger.info(
+        f"就绪检测: {ready_settings['strategy']}（最长 {ready_settings['timeout']}ms）")
     logger.info("=" * 80)
 
     # 检查Playwright是否已安装
@@ -112,36 +178,56 @@ def screenshot(host, csv_file, output, log, html, concurrency,
         logger.error("然后运行: playwright install chromium")
         sys.exit(1)
 
-    # 读取CSV文件
-    urls = read_csv_urls(csv_file, logger)
-    if not urls:
-        logger.error("CSV文件中没有找到有效的URL")
-        sys.exit(1)
-
-    logger.info(f"从CSV文件中读取到 {len(urls)} 个URL")
+    # 打开输入源（CSV或sitemap），URL在任务执行过程中逐条读取
+    urls = open_url_source(
+        csv_file, sitemap, logger, name_prefix='screenshot',
+        timeout=timeout, headers={'User-Agent': USER_AGENT})
 
-    # 清理旧文件
-    output_dir = Path(output)
     html_path = Path(html)
 
-    # 删除旧的截图目录
-    if output_dir.exists():
-        logger.info(f"删除旧的截图目录: {output_dir}")
-        shutil.rmtree(output_dir)
-
     # 删除旧的HTML报告
     if html_path.exists():
         logger.info(f"删除旧的HTML报告: {html_path}")
         html_path.unlink()
 
-    # 创建输出目录
-    output_dir.mkdir(parents=True, exist_ok=True)
-    logger.info(f"创建新的截图目录: {output_dir}")
+    # 本次运行写入 <输出目录>/<运行ID>/，旧运行在后台按保留策略清理，
+    # 不再在开始时删除整个输出目录；写入归档时拼接中的长截图暂存在临时目录，
+    # 不创建运行目录
+    output_base = Path(output)
+    pruner = None
+    archive = None
+    if not archive_file:
+        output_dir = create_run_dir(output_base)
+        logger.info(f"本次运行的截图目录: {output_dir}")
+        pruner = RunPruner(
+            output_base, output_dir,
+            keep=output_settings['keep_runs'],
+            max_bytes=output_settings['max_output_mb'] * 1024 * 1024,
+            logger=logger)
+        pruner.start()
+    else:
+        output_dir = Path(tempfile.mkdtemp(prefix='cptools_screenshot_'))
+        for old_file in (Path(archive_file), index_path(Path(archive_file))):
+            if old_file.exists():
+                logger.info(f"删除旧的归档文件: {old_file}")
+                old_file.unlink()
+        archive = ArchiveWriter(archive_file)
+        logger.info(f"截图写入归档: {archive_file}")
+    writer = AtomicWriter(output_dir) if archive is None else None
 
     # 执行截图任务
     start_time = datetime.now()
-    results = asyncio.run(
-        run_screenshot_tasks(
+
+    # 钉钉通知在任务的事件循环中发送（进度、告警和结束通知）
+    notifier = None
+    if not no_dingding:
+        notifier = build_notifier(
+            dingding_webhook, dingding_secret, logger, 'Screenshot',
+            final=lambda results: screenshot_notification(
+                results, start_time, host, source),
+            engine_settings=engine_settings)
+    try:
+        results = asyncio.run(run_screenshot_tasks(
             urls=urls,
             host=host,
             output_dir=output_dir,
@@ -149,22 +235,62 @@ def screenshot(host, csv_file, output, log, html, concurrency,
             timeout=timeout,
             width=width,
             height=height,
-            logger=logger
-        )
-    )
+            logger=logger,
+            capture=capture,
+            archive=archive,
+            writer=writer,
+            ready_settings=ready_settings,
+            engine_settings=engine_settings,
+            report=lambda results, refresh: generate_html_report(
+                results, html, title="截屏报告", template=template,
+                refresh=refresh),
+            notifier=notifier
+        ))
+    finally:
+        if archive is not None:
+            archive.close()
+            shutil.rmtree(output_dir, ignore_errors=True)
+        if writer is not None:
+            writer.close()
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
 
+    if not results:
+        if archive is None:
+            # 空的运行目录不保留，以免占用保留名额
+            try:
+                output_dir.rmdir()
+            except OSError:
+                pass
+        logger.error("输入源中没有找到有效的URL")
+        sys.exit(1)
+
+    if archive is None and not update_latest(output_base, output_dir):
+        logger.warning(f"无法创建符号链接 {output_base / LATEST_NAME}，请直接使用 {output_dir}")
+
     # 统计结果
     total = len(results)
     success = sum(1 for r in results if r.get('status') == 'success')
     failed = total - success
+    retried = sum(r.get('attempts', 1) - 1 for r in results)
 
     logger.info("=" * 80)
     logger.info("截屏任务完成")
     logger.info(f"总数: {total}")
     logger.info(f"成功: {success}")
     logger.info(f"失败: {failed}")
+    logger.info(f"重试次数: {retried}")
+    if archive is not None:
+        logger.info(f"归档: {archive_file}（{len(archive.entries)} 个条目）")
+    if writer is not None:
+        write_stats = writer.stats()
+        logger.info(
+            f"写入文件: {write_stats['files']} 个"
+            f"（{write_stats['bytes'] / 1024 / 1024:.1f} MB，"
+            f"fsync {write_stats['syncs']} 批），清单: {writer.manifest_path}")
+    if pruner is not None and pruner.pruned:
+        state = '已删除' if pruner.done() else '仍在后台删除（未删完的部分下次运行继续）'
+        logger.info(f"清理旧运行: {', '.join(pruner.pruned)}，{state}")
     logger.info(f"耗时: {duration:.2f}秒")
     logger.info("=" * 80)
 
@@ -184,33 +310,7 @@ def screenshot(host, csv_file, output, log, html, concurrency,
     except Exception as e:
         logger.error(f"生成HTML报告失败: {str(e)}")
 
-    # 发送钉钉通知
-    if dingding_webhook and not no_dingding:
-        try:
-            notification_content = f"""### 📸 Screenshot Task Completed
-
-**Time**: {start_time.strftime('%Y-%m-%d %H:%M:%S')}
-
-**Results**: Total {total} | Success {success}✅ | Failed {failed}❌
-
-**Duration**: {duration:.2f}s
-
-**Host**: `{host}`
-
-**File**: `{csv_file}`
-"""
-            asyncio.run(
-                send_dingding_notification(
-                    dingding_webhook,
-                    "Screenshot Task Completed",
-                    notification_content,
-                    secret=dingding_secret
-                )
-            )
-            logger.info("钉钉通知发送成功")
-        except Exception as e:
-            logger.error(f"发送钉钉通知失败: {str(e)}")
-    elif no_dingding:
+    if no_dingding:
         logger.info("已禁用钉钉通知（--no-dingding）")
 
     # 如果有失败的任务，以非零状态码退出
@@ -218,327 +318,328 @@ def screenshot(host, csv_file, output, log, html, concurrency,
         sys.exit(1)
 
 
-def read_csv_urls(csv_file: str, logger) -> List[Dict]:
-    """读取CSV文件中的URL列表
-
-    支持的列名（不区分大小写）：
-    - url/URL: URL地址（必需）
-    - name/PRODUCT_ID: 截图名称（可选）
-    """
-    urls = []
-
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-
-            if not reader.fieldnames:
-                logger.error("CSV文件为空或格式错误")
-                return []
-
-            # 创建列名映射（不区分大小写）
-            fieldnames_lower = {
-                name.lower(): name for name in reader.fieldnames
-            }
-
-            # 查找URL列
-            url_column = None
-            for possible_name in ['url', 'URL']:
-                if possible_name.lower() in fieldnames_lower:
-                    url_column = fieldnames_lower[possible_name.lower()]
-                    break
-
-            if not url_column:
-                logger.error(
-                    f"CSV文件必须包含'url'或'URL'列，"
-                    f"当前列: {', '.join(reader.fieldnames)}"
-                )
-                return []
-
-            # 查找名称列（优先级：name > PRODUCT_ID）
-            name_column = None
-            for possible_name in ['name', 'PRODUCT_ID', 'product_id',
-                                  'title', 'TITLE']:
-                if possible_name.lower() in fieldnames_lower:
-                    name_column = fieldnames_lower[possible_name.lower()]
-                    break
-
-            logger.info(
-                f"使用列: URL='{url_column}', "
-                f"NAME='{name_column or '(自动生成)'}'")
-
-            for idx, row in enumerate(reader, 1):
-                url = row.get(url_column, '').strip()
-                if not url:
-                    logger.warning(f"第{idx}行: URL为空，跳过")
-                    continue
-
-                # 获取名称
-                if name_column:
-                    name = (row.get(name_column, '').strip() or
-                            f'screenshot-{idx}')
-                else:
-                    name = f'screenshot-{idx}'
-
-                urls.append({
-                    'url': url,
-                    'name': name,
-                    'index': idx
-                })
-
-    except Exception as e:
-        logger.error(f"读取CSV文件失败: {str(e)}")
-        return []
-
-    return urls
-
-
 async def run_screenshot_tasks(
-    urls: List[Dict],
+    urls: AsyncIterator[Dict],
     host: str,
     output_dir: Path,
     concurrency: int,
     timeout: int,
     width: int,
     height: int,
-    logger
+    logger,
+    capture: str = 'full',
+    archive: Optional[ArchiveWriter] = None,
+    writer: Optional[AtomicWriter] = None,
+    ready_settings: Optional[Dict] = None,
+    engine_settings: Optional[Dict] = None,
+    report: Optional[Callable[[List[Dict], int], None]] = None,
+    notifier: Optional[Notifier] = None
 ) -> List[Dict]:
-    """运行截图任务"""
-    results = []
+    """运行截图任务（指定 archive 时截图写入归档，否则原子写入 output_dir，
+    writer 批量 fsync 并记录完整性清单）"""
+    handler = ScreenshotHandler(
+        host=host,
+        output_dir=output_dir,
+        width=width,
+        height=height,
+        capture=capture,
+        ready=ready_settings,
+        archive=archive,
+        writer=writer
+    )
+    engine = build_engine(
+        handler, concurrency, logger, timeout, engine_settings,
+        report=report, notifier=notifier)
+    return await engine.run(urls)
 
-    async with async_playwright() as p:
-        # 启动浏览器 - 添加反爬虫和性能优化参数
-        try:
-            # 轻量级浏览器启动参数
-            # （针对低配置服务器优化 + 反爬虫）
-            launch_args = [
-                '--no-sandbox',
-                '--disable-dev-shm-usage',  # 重要：低内存环境
-                '--disable-setuid-sandbox',
-                '--disable-gpu',  # 重要：节省资源
-                '--disable-software-rasterizer',
-                '--disable-extensions',
-                '--disable-background-networking',  # 减少后台网络请求
-                '--disable-background-timer-throttling',
-                '--disable-backgrounding-occluded-windows',
-                '--disable-breakpad',
-                '--disable-client-side-phishing-detection',
-                '--disable-component-update',
-                '--disable-default-apps',
-                '--disable-domain-reliability',
-                '--disable-features=AudioServiceOutOfProcess',
-                '--disable-hang-monitor',
-                '--disable-ipc-flooding-protection',
-                '--disable-notifications',
-                '--disable-offer-store-unmasked-wallet-cards',
-                '--disable-popup-blocking',
-                '--disable-print-preview',
-                '--disable-prompt-on-repost',
-                '--disable-renderer-backgrounding',
-                '--disable-sync',
-                '--disable-translate',
-                '--metrics-recording-only',
-                '--no-first-run',
-                '--mute-audio',
-                '--safebrowsing-disable-auto-update',
-                '--enable-automation',
-                '--password-store=basic',
-                '--use-mock-keychain',
-            ]
-
-            browser = await p.chromium.launch(
-                headless=True,
-                args=launch_args,
-                chromium_sandbox=False,
-            )
-            logger.info("浏览器启动成功（已启用反爬虫优化）")
-        except Exception as e:
-            logger.error(f"启动浏览器失败: {str(e)}")
-            logger.error("请确保已安装Playwright浏览器: playwright install chromium")
-            return []
 
-        try:
-            # 创建信号量控制并发
-            semaphore = asyncio.Semaphore(concurrency)
-
-            # 创建所有任务
-            tasks = []
-            for url_info in urls:
-                task = screenshot_single_page(
-                    browser=browser,
-                    url_info=url_info,
-                    host=host,
-                    output_dir=output_dir,
-                    timeout=timeout,
-                    width=width,
-                    height=height,
-                    semaphore=semaphore,
-                    logger=logger
-                )
-                tasks.append(task)
-
-            # 并发执行所有任务
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # 处理异常结果
-            processed_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    processed_results.append({
-                        'url': urls[i]['url'],
-                        'name': urls[i]['name'],
-                        'status': 'failed',
-                        'error': str(result)
-                    })
-                else:
-                    processed_results.append(result)
+def screenshot_notification(
+    results: List[Dict],
+    start_time: datetime,
+    host: str,
+    source: str
+) -> Optional[Tuple[str, str]]:
+    """运行结束时的钉钉通知（没有结果时不发送）"""
+    if not results:
+        return None
+    total = len(results)
+    success = sum(1 for r in results if r.get('status') == 'success')
+    failed = total - success
+    duration = getattr(results, 'summary', {}).get('elapsed_seconds', 0)
+    content = f"""### 📸 Screenshot Task Completed
 
-            results = processed_results
+**Time**: {start_time.strftime('%Y-%m-%d %H:%M:%S')}
 
-        finally:
-            await browser.close()
-            logger.info("浏览器已关闭")
+**Results**: Total {total} | Success {success}✅ | Failed {failed}❌
+
+{breaker_note(results)}**Duration**: {duration:.2f}s
+
+**Host**: `{host}`
+
+**File**: `{source}`
+"""
+    return "Screenshot Task Completed", content
+
+
+class ScreenshotHandler(TaskHandler):
+    """网页截图处理器"""
+
+    action = '截图'
+    command = 'screenshot'
+
+    def __init__(self, host: str, output_dir: Path, width: int, height: int,
+                 capture: str = 'full', ready: Optional[Dict] = None,
+                 archive: Optional[ArchiveWriter] = None,
+                 writer: Optional[AtomicWriter] = None):
+        self.host = host
+        self.output_dir = output_dir
+        self.width = width
+        self.height = height
+        self.capture = capture
+        self.ready = ready or DEFAULT_READY
+        self.archive = archive
+        self.writer = writer
+
+    def describe(self, item: Dict) -> str:
+        return build_full_url(item['url'], self.host)
+
+    async def process(self, task: TaskContext) -> Dict:
+        return await screenshot_single_page(
+            task=task,
+            host=self.host,
+            output_dir=self.output_dir,
+            width=self.width,
+            height=self.height,
+            capture=self.capture,
+            ready=self.ready,
+            archive=self.archive,
+            writer=self.writer
+        )
 
-    return results
+    def failure_result(self, item: Dict, error: str) -> Dict:
+        return {
+            'url': build_full_url(item['url'], self.host),
+            'name': item['name'],
+            'screenshot_path': '',
+            'status': 'failed',
+            'error': error
+        }
 
 
 async def screenshot_single_page(
-    browser: Browser,
-    url_info: Dict,
+    task: TaskContext,
     host: str,
     output_dir: Path,
-    timeout: int,
     width: int,
     height: int,
-    semaphore: asyncio.Semaphore,
-    logger
+    capture: str = 'full',
+    ready: Optional[Dict] = None,
+    archive: Optional[ArchiveWriter] = None,
+    writer: Optional[AtomicWriter] = None
 ) -> Dict:
-    """截取单个页面"""
-    url = url_info['url']
-    name = url_info['name']
-    index = url_info['index']
-
-    async with semaphore:
-        # 构建完整URL
-        full_url = build_full_url(url, host)
-
-        logger.info(f"[{index}] 开始截图: {full_url}")
-
-        # 生成安全的文件名
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        safe_name = "".join(
-            c for c in name if c.isalnum() or c in (' ', '-', '_')
-        ).strip()
-        safe_name = safe_name or f'screenshot-{index}'
-        filename = f"{safe_name}_{timestamp}.png"
-        screenshot_path = output_dir / filename
-
-        page = None
-        context = None
-        try:
-            # 🔥 反爬虫机制1: 随机延迟（模拟人类行为）
-            delay = random.uniform(1.5, 3.5)
-            logger.debug(f"[{index}] 随机延迟 {delay:.2f} 秒")
-            await asyncio.sleep(delay)
-
-            # 🔥 反爬虫机制2: 轻量级上下文配置 + 真实浏览器特征
-            # 高清晰度设置：启用设备像素比 (device_scale_factor)
-            context = await browser.new_context(
-                viewport={'width': width, 'height': height},
-                device_scale_factor=2,  # 2x DPI，提高截图清晰度
-                user_agent=(
-                    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                    'AppleWebKit/537.36 (KHTML, like Gecko) '
-                    'Chrome/120.0.0.0 Safari/537.36'
-                ),
-                locale='en-US',
-                ignore_https_errors=True,  # 忽略 HTTPS 错误
-            )
-
-            page = await context.new_page()
-
-            # 设置超时
-            page.set_default_navigation_timeout(timeout)
-            page.set_default_timeout(timeout)
-
-            # 🔥 反爬虫机制3: 使用 domcontentloaded 而不是完全加载
-            # （更快，更像真实浏览）
-            resp = await page.goto(full_url,
-                                   wait_until='domcontentloaded')
-
-            # 🔥 反爬虫机制4: 尝试等待网络空闲，但不强制
-            # （避免超时）
-            try:
-                await page.wait_for_load_state('networkidle',
-                                               timeout=3000)
-            except Exception:
-                # 超时不影响截图，继续执行
-                logger.debug(f"[{index}] 网络空闲等待超时，继续截图")
-                pass
-
-            # 检查 HTTP 状态码
-            if resp is not None and resp.status >= 400:
-                error_msg = f"HTTP {resp.status}"
-                logger.warning(
-                    f"[{index}] HTTP 错误: {full_url} - {error_msg}")
-                await context.close()
-                return {
-                    'url': full_url,
-                    'name': name,
-                    'screenshot_path': '',
-                    'status': 'failed',
-                    'error': error_msg
-                }
-
-            # 🔥 反爬虫机制5: 使用 JPEG 格式 + 降低质量（更快）
-            # 但保持 PNG 格式以确保质量（根据需求调整）
-            await page.screenshot(path=str(screenshot_path),
-                                  full_page=True)
-
-            logger.info(f"[{index}] 截图成功: {full_url}")
-
-            await context.close()
-
-            return {
-                'url': full_url,
-                'name': name,
-                'screenshot_path': str(screenshot_path),
-                'status': 'success',
-                'error': ''
-            }
-
-        except Exception as e:
-            error_msg = str(e)
-            logger.error(f"[{index}] 截图失败: {full_url} - {error_msg}")
-
-            if context:
-                try:
-                    await context.close()
-                except Exception:
-                    pass
+    """截取单个页面
 
+    capture 为 tiles / stitch（或 auto 遇到超高页面）时逐屏截取，
+    每次只在浏览器和内存中保留一屏的位图。指定 archive 时截图写入归档，
+    结果中的路径为 <归档路径>/<文件名>；否则先写临时文件再原子改名，
+    不会留下截断的截图。
+    """
+    url_info = task.item
+    name = url_info['name']
+    index = task.index
+    logger = task.logger
+
+    # 构建完整URL
+    full_url = build_full_url(url_info['url'], host)
+
+    logger.info(f"[{index}] 开始截图: {full_url}")
+
+    # 生成安全的文件名
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    safe_name = "".join(
+        c for c in name if c.isalnum() or c in (' ', '-', '_')
+    ).strip()
+    safe_name = safe_name or f'screenshot-{index}'
+    filename = f"{safe_name}_{timestamp}.png"
+    screenshot_path = (archive.path if archive else output_dir) / filename
+
+    # 🔥 反爬虫机制1: 随机延迟（模拟人类行为）
+    await task.delay(1.5, 3.5)
+
+    # 🔥 反爬虫机制2: 轻量级上下文配置 + 真实浏览器特征
+    # 高清晰度设置：启用设备像素比 (device_scale_factor)
+    async with task.page(
+        viewport={'width': width, 'height': height},
+        device_scale_factor=DEVICE_SCALE_FACTOR,
+    ) as page:
+        # 🔥 反爬虫机制3: 使用 domcontentloaded 而不是完全加载
+        # （更快，更像真实浏览）
+        with task.phase('goto'):
+            resp = await page.goto(full_url, wait_until='domcontentloaded')
+
+        # 🔥 反爬虫机制4: 等待页面就绪，但不强制（超时后继续截图）
+        await wait_until_ready(task, page, **(ready or DEFAULT_READY))
+
+        # 检查 HTTP 状态码
+        if resp is not None and resp.status >= 400:
+            error_msg = f"HTTP {resp.status}"
+            logger.warning(f"[{index}] HTTP 错误: {full_url} - {error_msg}")
             return {
                 'url': full_url,
                 'name': name,
                 'screenshot_path': '',
                 'status': 'failed',
+                'status_code': resp.status,
                 'error': error_msg
             }
 
-
-def build_full_url(url: str, host: str) -> str:
-    """构建完整URL
-
-    如果URL已经包含域名，直接使用；否则使用提供的host
+        mode = capture
+        if mode == 'auto':
+            page_height = await page.evaluate(
+                '() => document.documentElement.scrollHeight')
+            if page_height * DEVICE_SCALE_FACTOR <= AUTO_TILE_HEIGHT:
+                mode = 'full'
+            else:
+                mode = 'stitch' if stitch_available() else 'tiles'
+                logger.info(
+                    f"[{index}] 页面高度 {page_height}px，改为分块截图（{mode}）")
+
+        if mode != 'full':
+            return await capture_tiled(
+                task, page, full_url, name, screenshot_path, width, height,
+                stitch=(mode == 'stitch'), archive=archive,
+                stitch_path=output_dir / filename, writer=writer)
+
+        # 🔥 反爬虫机制5: 使用 JPEG 格式 + 降低质量（更快）
+        # 但保持 PNG 格式以确保质量（根据需求调整）
+        with task.phase('screenshot'):
+            image = await page.screenshot(full_page=True)
+        task.add_bytes(len(image))
+
+    # 写文件放到线程池，避免大图阻塞事件循环
+    with task.phase('write'):
+        await asyncio.get_running_loop().run_in_executor(
+            None, save_function(archive, writer), screenshot_path, image)
+
+    logger.info(f"[{index}] 截图成功: {full_url}")
+
+    return {
+        'url': full_url,
+        'name': name,
+        'screenshot_path': str(screenshot_path),
+        'status': 'success',
+        'error': ''
+    }
+
+
+def save_function(
+    archive: Optional[ArchiveWriter] = None,
+    writer: Optional[AtomicWriter] = None
+) -> Callable[[Path, bytes], object]:
+    """返回写入截图的函数：写入归档，或原子写文件（writer 记录完整性清单）"""
+    if archive is not None:
+        return archive.write
+    if writer is not None:
+        return writer.write
+    return write_atomic
+
+
+async def capture_tiled(
+    task: TaskContext,
+    page,
+    full_url: str,
+    name: str,
+    screenshot_path: Path,
+    width: int,
+    height: int,
+    stitch: bool,
+    archive: Optional[ArchiveWriter] = None,
+    stitch_path: Optional[Path] = None,
+    writer: Optional[AtomicWriter] = None
+) -> Dict:
+    """逐屏滚动截图
+
+    每次滚动一屏并只截取当前视口，浏览器不需要渲染整页位图。
+    stitch 为 True 时逐块拼接到 screenshot_path，否则在同名目录下保存
+    tile_001.png、tile_002.png ...（结果的 screenshot_path 为第一块，
+    tiles 为全部分块）。懒加载使页面变高时会继续向下截取，最多 MAX_TILES 块。
+    写入归档时分块逐个追加到归档；拼接先写到磁盘上的 stitch_path，完成后
+    复制进归档并删除。
     """
-    url = url.strip()
-
-    # 检查是否已经是完整URL
-    parsed = urlparse(url)
-    if parsed.scheme and parsed.netloc:
-        return url
-
-    # 如果是相对路径，与host组合
-    if not url.startswith('/'):
-        url = '/' + url
-
-    return urljoin(host, url)
+    loop = asyncio.get_running_loop()
+    index = task.index
+    if stitch:
+        stitcher = PngStitcher(
+            stitch_path if archive is not None else screenshot_path)
+        tiles_dir = None
+    else:
+        stitcher = None
+        tiles_dir = screenshot_path.with_suffix('')
+        if archive is None:
+            tiles_dir.mkdir(parents=True, exist_ok=True)
+
+    tiles: List[str] = []
+    count = 0
+    offset = 0
+    try:
+        while count < MAX_TILES:
+            # 滚动到目标位置，返回实际滚动位置（到底部时会小于目标）和当前页面高度
+            scroll_y, page_height = await page.evaluate(
+                '(y) => { window.scrollTo(0, y); return '
+                '[window.scrollY, document.documentElement.scrollHeight]; }',
+                offset)
+            if offset >= page_height:
+                break
+            clip_height = min(height, page_height - offset)
+            await asyncio.sleep(TILE_SETTLE)
+            with task.phase('screenshot'):
+                image = await page.screenshot(clip={
+                    'x': 0, 'y': offset - scroll_y,
+                    'width': width, 'height': clip_height})
+            task.add_bytes(len(image))
+            count += 1
+
+            with task.phase('write'):
+                if stitcher is not None:
+                    await loop.run_in_executor(None, stitcher.add, image)
+                else:
+                    tile_path = tiles_dir / f"tile_{count:03d}.png"
+                    await loop.run_in_executor(
+                        None, save_function(archive, writer), tile_path, image)
+                    tiles.append(str(tile_path))
+            offset += clip_height
+        else:
+            task.logger.warning(
+                f"[{index}] 分块数达到上限 {MAX_TILES}，页面后续部分未截取")
+
+        if count == 0:
+            raise RuntimeError("页面高度为 0，没有可截取的内容")
+        if stitcher is not None:
+            with task.phase('write'):
+                await loop.run_in_executor(None, stitcher.close)
+                if archive is not None:
+                    await loop.run_in_executor(
+                        None, archive.add_file,
+                        archive.name_of(screenshot_path), stitch_path)
+                    stitch_path.unlink()
+                elif writer is not None:
+                    await loop.run_in_executor(
+                        None, writer.record, screenshot_path)
+    except BaseException:
+        if stitcher is not None:
+            stitcher.abort()
+        raise
+
+    task.logger.info(
+        f"[{index}] 截图成功: {full_url}（{count} 块，高 {offset}px）")
+    result = {
+        'url': full_url,
+        'name': name,
+        'screenshot_path': str(screenshot_path) if stitcher else tiles[0],
+        'status': 'success',
+        'error': '',
+        'tile_count': count,
+    }
+    if stitcher is None:
+        result['tiles'] = tiles
+    return result
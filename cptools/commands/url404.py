@@ -1,20 +1,22 @@
 """URL 404检测命令实现"""
 import click
 import asyncio
-import csv
-import random
-import shutil
 import webbrowser
 from pathlib import Path
-from urllib.parse import urlparse, urljoin
 from datetime import datetime
-from typing import List, Dict
+from typing import AsyncIterator, Callable, List, Dict, Optional, Tuple
 import sys
 
-from playwright.async_api import async_playwright, Browser
+import aiohttp
+from cptools.commands.common import (
+    breaker_note, build_engine, build_notifier, engine_options
+)
+from cptools.engine.notifier import Notifier
+from cptools.engine import TaskContext, TaskHandler, USER_AGENT
 from cptools.utils.logger import setup_logger
+from cptools.utils.sources import build_full_url, open_url_source
+from cptools.utils.response_cache import ResponseCache
 from cptools.utils.url404_report import generate_url404_html_report
-from cptools.utils.dingding import send_dingding_notification
 
 
 @click.command()
@@ -22,8 +24,11 @@ from cptools.utils.dingding import send_dingding_notification
     '--host', '-h', required=True,
     help='默认主机地址（当CSV中的URL没有域名时使用）')
 @click.option(
-    '--csv', 'csv_file', required=True, type=click.Path(exists=True),
+    '--csv', 'csv_file', default=None, type=click.Path(exists=True),
     help='CSV文件路径，包含要检测的URL列表')
+@click.option(
+    '--sitemap', default=None,
+    help='sitemap.xml 的URL或文件路径（支持sitemap索引和.gz，可替代--csv）')
 @click.option(
     '--log', '-l', default='',
     help='日志文件路径（默认：./logs/url404_YYYYMMDD_HHMMSS.log）')
@@ -49,11 +54,23 @@ from cptools.utils.dingding import send_dingding_notification
 @click.option(
     '--timeout', default=30000, type=int,
     help='页面加载超时时间（毫秒，默认：30000）')
-def url404(host, csv_file, log, html, concurrency,
-           dingding_webhook, dingding_secret, no_dingding, timeout):
+@click.option(
+    '--cache-file', default='./.cache/url404_responses.json',
+    help='响应缓存文件路径，仅在指定 --max-age 或 --revalidate 时读写'
+         '（默认：./.cache/url404_responses.json）')
+@click.option(
+    '--max-age', default=0, type=int,
+    help='直接使用不超过该秒数的缓存结果，不访问网络（默认：0，不使用缓存）')
+@click.option(
+    '--revalidate', is_flag=True, default=False,
+    help='对过期缓存发送条件请求（If-None-Match/If-Modified-Since）')
+@engine_options
+def url404(host, csv_file, sitemap, log, html, concurrency,
+           dingding_webhook, dingding_secret, no_dingding, timeout,
+           cache_file, max_age, revalidate, engine_settings):
     """URL 404/500错误检测工具
 
-    从CSV文件读取URL列表并检测状态码。CSV文件应包含以下列：
+    从CSV文件或sitemap.xml读取URL列表并检测状态码。CSV文件应包含以下列：
 
     \b
     - url: 页面URL（可以是完整URL或相对路径）
@@ -68,7 +85,19 @@ def url404(host, csv_file, log, html, concurrency,
     \b
     cptools url404 --host http://example.com \\
         --csv urls.csv -c 10
+
+    \b
+    cptools url404 -h http://www.cafepress.com \\
+        --csv test_10.csv --max-age 3600 --revalidate
+
+    \b
+    cptools url404 -h https://www.cafepress.com \\
+        --sitemap https://www.cafepress.com/sitemap.xml
     """
+    if bool(csv_file) == bool(sitemap):
+        raise click.UsageError("必须且只能指定 --csv 或 --sitemap 其中之一")
+    source = csv_file or sitemap
+
     # 如果没有指定日志文件，自动生成基于时间戳的文件名
     if not log:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -77,14 +106,19 @@ def url404(host, csv_file, log, html, concurrency,
         Path('./logs').mkdir(parents=True, exist_ok=True)
 
     # 设置日志
-    logger = setup_logger(log)
+    logger = setup_logger(log, log_format=engine_settings['log_format'])
 
     logger.info("=" * 80)
     logger.info("开始执行URL 404检测任务")
     logger.info(f"主机地址: {host}")
-    logger.info(f"CSV文件: {csv_file}")
+    logger.info(f"输入源: {source}")
     logger.info(f"并发数: {concurrency}")
     logger.info(f"超时时间: {timeout}ms")
+    if max_age > 0 or revalidate:
+        logger.info(f"响应缓存: {cache_file} "
+                    f"(max-age={max_age}s, revalidate={revalidate})")
+    else:
+        logger.info("响应缓存: 未启用")
     logger.info("=" * 80)
 
     # 检查Playwright是否已安装
@@ -95,13 +129,10 @@ def url404(host, csv_file, log, html, concurrency,
         logger.error("然后运行: playwright install chromium")
         sys.exit(1)
 
-    # 读取CSV文件
-    urls = read_csv_urls(csv_file, logger)
-    if not urls:
-        logger.error("CSV文件中没有找到有效的URL")
-        sys.exit(1)
-
-    logger.info(f"从CSV文件中读取到 {len(urls)} 个URL")
+    # 打开输入源（CSV或sitemap），URL在任务执行过程中逐条读取
+    urls = open_url_source(
+        csv_file, sitemap, logger, name_prefix='url',
+        timeout=timeout, headers={'User-Agent': USER_AGENT})
 
     # 删除旧的HTML报告
     html_path = Path(html)
@@ -109,26 +140,61 @@ def url404(host, csv_file, log, html, concurrency,
         logger.info(f"删除旧的HTML报告: {html_path}")
         html_path.unlink()
 
+    # 加载响应缓存：不使用缓存结果时不读写缓存，也不读取响应正文
+    cache = None
+    if max_age > 0 or revalidate:
+        cache = ResponseCache(cache_file)
+        cache.load(logger)
+        logger.info(f"已加载 {len(cache.entries)} 条缓存记录")
+
     # 执行检测任务
     start_time = datetime.now()
+
+    # 钉钉通知在任务的事件循环中发送（进度、告警和结束通知）
+    notifier = None
+    if not no_dingding:
+        notifier = build_notifier(
+            dingding_webhook, dingding_secret, logger, 'URL 404 Check',
+            final=lambda results: url404_notification(
+                results, start_time, host, source, cache),
+            engine_settings=engine_settings)
+
     results = asyncio.run(
         run_url404_tasks(
             urls=urls,
             host=host,
             concurrency=concurrency,
             timeout=timeout,
-            logger=logger
+            logger=logger,
+            cache=cache,
+            max_age=max_age,
+            revalidate=revalidate,
+            engine_settings=engine_settings,
+            report=lambda results, refresh: generate_url404_html_report(
+                results, html, title="URL 404检测报告", refresh=refresh),
+            notifier=notifier
         )
     )
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
 
+    if not results:
+        logger.error("输入源中没有找到有效的URL")
+        sys.exit(1)
+
     # 统计结果
     total = len(results)
     success = sum(1 for r in results if r.get('status_code') and 200 <= r.get('status_code') < 400)
     error_404 = sum(1 for r in results if r.get('status_code') == 404)
     error_500 = sum(1 for r in results if r.get('status_code') and r.get('status_code') >= 500)
     other_errors = total - success - error_404 - error_500
+    retried = sum(r.get('attempts', 1) - 1 for r in results)
+
+    if cache is not None:
+        try:
+            cache.save()
+        except Exception as e:
+            logger.warning(f"保存响应缓存失败: {str(e)}")
 
     logger.info("=" * 80)
     logger.info("URL 404检测任务完成")
@@ -137,6 +203,13 @@ def url404(host, csv_file, log, html, concurrency,
     logger.info(f"404错误: {error_404}")
     logger.info(f"500错误: {error_500}")
     logger.info(f"其他错误: {other_errors}")
+    logger.info(f"重试次数: {retried}")
+    if cache is not None:
+        cache_stats = cache.stats()
+        logger.info(
+            f"缓存命中: {cache_stats['hits']} "
+            f"(其中条件请求304: {cache_stats['revalidated']})，"
+            f"未命中: {cache_stats['misses']}")
     logger.info(f"耗时: {duration:.2f}秒")
     logger.info("=" * 80)
 
@@ -155,33 +228,7 @@ def url404(host, csv_file, log, html, concurrency,
     except Exception as e:
         logger.error(f"生成HTML报告失败: {str(e)}")
 
-    # 发送钉钉通知
-    if dingding_webhook and not no_dingding:
-        try:
-            notification_content = f"""### 🔍 URL 404 Check Completed
-
-**Time**: {start_time.strftime('%Y-%m-%d %H:%M:%S')}
-
-**Results**: Total {total} | OK {success}✅ | 404 {error_404}⚠️ | 500+ {error_500}❌
-
-**Duration**: {duration:.2f}s
-
-**Host**: `{host}`
-
-**File**: `{csv_file}`
-"""
-            asyncio.run(
-                send_dingding_notification(
-                    dingding_webhook,
-                    "URL 404 Check Completed",
-                    notification_content,
-                    secret=dingding_secret
-                )
-            )
-            logger.info("钉钉通知发送成功")
-        except Exception as e:
-            logger.error(f"发送钉钉通知失败: {str(e)}")
-    elif no_dingding:
+    if no_dingding:
         logger.info("已禁用钉钉通知（--no-dingding）")
 
     # 如果有失败的任务，以非零状态码退出
@@ -189,295 +236,273 @@ def url404(host, csv_file, log, html, concurrency,
         sys.exit(1)
 
 
-def read_csv_urls(csv_file: str, logger) -> List[Dict]:
-    """读取CSV文件中的URL列表
-
-    支持的列名（不区分大小写）：
-    - url/URL: URL地址（必需）
-    - name/PRODUCT_ID: URL名称（可选）
-    """
-    urls = []
-
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-
-            if not reader.fieldnames:
-                logger.error("CSV文件为空或格式错误")
-                return []
-
-            # 创建列名映射（不区分大小写）
-            fieldnames_lower = {
-                name.lower(): name for name in reader.fieldnames
-            }
-
-            # 查找URL列
-            url_column = None
-            for possible_name in ['url', 'URL']:
-                if possible_name.lower() in fieldnames_lower:
-                    url_column = fieldnames_lower[possible_name.lower()]
-                    break
-
-            if not url_column:
-                logger.error(
-                    f"CSV文件必须包含'url'或'URL'列，"
-                    f"当前列: {', '.join(reader.fieldnames)}"
-                )
-                return []
-
-            # 查找名称列（优先级：name > PRODUCT_ID）
-            name_column = None
-            for possible_name in ['name', 'PRODUCT_ID', 'product_id',
-                                  'title', 'TITLE']:
-                if possible_name.lower() in fieldnames_lower:
-                    name_column = fieldnames_lower[possible_name.lower()]
-                    break
-
-            logger.info(
-                f"使用列: URL='{url_column}', "
-                f"NAME='{name_column or '(自动生成)'}'")
-
-            for idx, row in enumerate(reader, 1):
-                url = row.get(url_column, '').strip()
-                if not url:
-                    logger.warning(f"第{idx}行: URL为空，跳过")
-                    continue
-
-                # 获取名称
-                if name_column:
-                    name = (row.get(name_column, '').strip() or
-                            f'url-{idx}')
-                else:
-                    name = f'url-{idx}'
-
-                urls.append({
-                    'url': url,
-                    'name': name,
-                    'index': idx
-                })
-
-    except Exception as e:
-        logger.error(f"读取CSV文件失败: {str(e)}")
-        return []
-
-    return urls
-
-
 async def run_url404_tasks(
-    urls: List[Dict],
+    urls: AsyncIterator[Dict],
     host: str,
     concurrency: int,
     timeout: int,
-    logger
+    logger,
+    cache: Optional[ResponseCache] = None,
+    max_age: int = 0,
+    revalidate: bool = False,
+    engine_settings: Optional[Dict] = None,
+    report: Optional[Callable[[List[Dict], int], None]] = None,
+    notifier: Optional[Notifier] = None
 ) -> List[Dict]:
     """运行URL检测任务"""
-    results = []
+    handler = Url404Handler(
+        host=host,
+        timeout=timeout,
+        cache=cache,
+        max_age=max_age,
+        revalidate=revalidate
+    )
+    engine = build_engine(
+        handler, concurrency, logger, timeout, engine_settings,
+        report=report, notifier=notifier)
+    return await engine.run(urls)
 
-    async with async_playwright() as p:
-        # 启动浏览器
-        try:
-            launch_args = [
-                '--no-sandbox',
-                '--disable-dev-shm-usage',
-                '--disable-setuid-sandbox',
-                '--disable-gpu',
-                '--disable-software-rasterizer',
-                '--disable-extensions',
-                '--disable-background-networking',
-                '--disable-background-timer-throttling',
-                '--disable-backgrounding-occluded-windows',
-                '--disable-breakpad',
-                '--disable-client-side-phishing-detection',
-                '--disable-component-update',
-                '--disable-default-apps',
-                '--disable-domain-reliability',
-                '--disable-features=AudioServiceOutOfProcess',
-                '--disable-hang-monitor',
-                '--disable-ipc-flooding-protection',
-                '--disable-notifications',
-                '--disable-offer-store-unmasked-wallet-cards',
-                '--disable-popup-blocking',
-                '--disable-print-preview',
-                '--disable-prompt-on-repost',
-                '--disable-renderer-backgrounding',
-                '--disable-sync',
-                '--disable-translate',
-                '--metrics-recording-only',
-                '--no-first-run',
-                '--mute-audio',
-                '--safebrowsing-disable-auto-update',
-                '--enable-automation',
-                '--password-store=basic',
-                '--use-mock-keychain',
-            ]
-
-            browser = await p.chromium.launch(
-                headless=True,
-                args=launch_args,
-                chromium_sandbox=False,
-            )
-            logger.info("浏览器启动成功")
-        except Exception as e:
-            logger.error(f"启动浏览器失败: {str(e)}")
-            logger.error("请确保已安装Playwright浏览器: playwright install chromium")
-            return []
 
-        try:
-            # 创建信号量控制并发
-            semaphore = asyncio.Semaphore(concurrency)
-
-            # 创建所有任务
-            tasks = []
-            for url_info in urls:
-                task = check_single_url(
-                    browser=browser,
-                    url_info=url_info,
-                    host=host,
-                    timeout=timeout,
-                    semaphore=semaphore,
-                    logger=logger
-                )
-                tasks.append(task)
-
-            # 并发执行所有任务
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # 处理异常结果
-            processed_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    processed_results.append({
-                        'url': urls[i]['url'],
-                        'name': urls[i]['name'],
-                        'status_code': None,
-                        'status_text': 'Exception',
-                        'error': str(result)
-                    })
-                else:
-                    processed_results.append(result)
-
-            results = processed_results
-
-        finally:
-            await browser.close()
-            logger.info("浏览器已关闭")
-
-    return results
+def url404_notification(
+    results: List[Dict],
+    start_time: datetime,
+    host: str,
+    source: str,
+    cache: Optional[ResponseCache]
+) -> Optional[Tuple[str, str]]:
+    """运行结束时的钉钉通知（没有结果时不发送）"""
+    if not results:
+        return None
+    total = len(results)
+    success = sum(1 for r in results if r.get('status_code') and 200 <= r.get('status_code') < 400)
+    error_404 = sum(1 for r in results if r.get('status_code') == 404)
+    error_500 = sum(1 for r in results if r.get('status_code') and r.get('status_code') >= 500)
+    cache_note = ''
+    if cache is not None:
+        cache_stats = cache.stats()
+        cache_note = (f"**Cache**: Hit {cache_stats['hits']} | "
+                      f"Miss {cache_stats['misses']} | "
+                      f"Revalidated {cache_stats['revalidated']}\n\n")
+    duration = getattr(results, 'summary', {}).get('elapsed_seconds', 0)
+    content = f"""### 🔍 URL 404 Check Completed
 
+**Time**: {start_time.strftime('%Y-%m-%d %H:%M:%S')}
 
-async def check_single_url(
-    browser: Browser,
-    url_info: Dict,
-    host: str,
-    timeout: int,
-    semaphore: asyncio.Semaphore,
-    logger
-) -> Dict:
-    """检测单个URL的状态码"""
-    url = url_info['url']
-    name = url_info['name']
-    index = url_info['index']
+**Results**: Total {total} | OK {success}✅ | 404 {error_404}⚠️ | 500+ {error_500}❌
 
-    async with semaphore:
-        # 构建完整URL
-        full_url = build_full_url(url, host)
+{cache_note}{breaker_note(results)}**Duration**: {duration:.2f}s
 
-        logger.info(f"[{index}] 开始检测: {full_url}")
+**Host**: `{host}`
 
-        page = None
-        context = None
-        try:
-            # 随机延迟（模拟人类行为）
-            delay = random.uniform(1.0, 2.5)
-            logger.debug(f"[{index}] 随机延迟 {delay:.2f} 秒")
-            await asyncio.sleep(delay)
-
-            # 创建上下文
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent=(
-                    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                    'AppleWebKit/537.36 (KHTML, like Gecko) '
-                    'Chrome/120.0.0.0 Safari/537.36'
-                ),
-                locale='en-US',
-                ignore_https_errors=True,
+**File**: `{source}`
+"""
+    return "URL 404 Check Completed", content
+
+
+class Url404Handler(TaskHandler):
+    """URL状态码检测处理器"""
+
+    action = '检测'
+    command = 'url404'
+
+    def __init__(
+        self,
+        host: str,
+        timeout: int,
+        cache: Optional[ResponseCache] = None,
+        max_age: int = 0,
+        revalidate: bool = False
+    ):
+        self.host = host
+        self.timeout = timeout
+        self.cache = cache
+        self.max_age = max_age
+        self.revalidate = revalidate
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def setup(self):
+        # 条件请求使用独立的HTTP会话
+        if self.cache is not None and self.revalidate:
+            self.session = self.http.session(
+                headers={'User-Agent': USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=self.timeout / 1000),
             )
 
-            page = await context.new_page()
-
-            # 设置超时
-            page.set_default_navigation_timeout(timeout)
-            page.set_default_timeout(timeout)
+    async def teardown(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def describe(self, item: Dict) -> str:
+        return build_full_url(item['url'], self.host)
+
+    async def process(self, task: TaskContext) -> Dict:
+        return await check_single_url(
+            task=task,
+            host=self.host,
+            cache=self.cache,
+            max_age=self.max_age,
+            session=self.session
+        )
 
-            # 访问页面并获取响应
-            resp = await page.goto(full_url, wait_until='domcontentloaded')
+    def failure_result(self, item: Dict, error: str) -> Dict:
+        return {
+            'url': build_full_url(item['url'], self.host),
+            'name': item['name'],
+            'status_code': None,
+            'status_text': 'Error',
+            'error': error
+        }
+
+    def is_success(self, result: Dict) -> bool:
+        status_code = result.get('status_code')
+        return bool(status_code) and 200 <= status_code < 400
+
+    def touched_network(self, result: Dict) -> bool:
+        return result.get('cache') not in CACHE_SOURCES
+
+    def failure_info(self, result: Dict) -> Dict:
+        info = super().failure_info(result)
+        # 来自缓存的结果没有访问网络，重试只会得到同样的缓存结果
+        if result.get('cache') in CACHE_SOURCES:
+            info['retryable'] = False
+        return info
+
+
+# 结果的 cache 字段为这些值时，结果来自缓存而不是本次访问
+CACHE_SOURCES = ('hit', 'revalidated')
+
+
+def cached_result(full_url: str, name: str, entry: Dict, source: str) -> Dict:
+    """根据缓存条目构建检测结果"""
+    status_code = entry.get('status_code')
+    return {
+        'url': full_url,
+        'name': name,
+        'status_code': status_code,
+        'status_text': entry.get('status_text', ''),
+        'error': status_error_message(status_code),
+        'cache': source
+    }
+
+
+def status_error_message(status_code: Optional[int]) -> str:
+    """根据状态码生成错误描述，成功时返回空字符串"""
+    if status_code is None:
+        return "无法获取响应"
+    elif status_code == 404:
+        return "页面不存在(404)"
+    elif status_code >= 500:
+        return f"服务器错误({status_code})"
+    elif status_code >= 400:
+        return f"客户端错误({status_code})"
+    return ""
+
+
+async def revalidate_url(
+    session: aiohttp.ClientSession,
+    full_url: str,
+    entry: Dict
+) -> Optional[int]:
+    """发送条件请求，返回状态码（失败时返回None）
+
+    缓存条目没有 ETag/Last-Modified 时不发送请求。缓存的验证器来自页面跟随
+    重定向后的最终响应，条件请求同样跟随重定向，在最终地址上比较验证器。
+    """
+    headers = ResponseCache.conditional_headers(entry)
+    if not headers:
+        return None
+    async with session.get(full_url, headers=headers) as resp:
+        return resp.status
 
-            # 获取状态码
-            status_code = resp.status if resp else None
-            status_text = resp.status_text if resp else 'No Response'
-
-            # 判断状态
-            if status_code is None:
-                error_msg = "无法获取响应"
-                logger.warning(f"[{index}] {error_msg}: {full_url}")
-            elif status_code == 404:
-                error_msg = "页面不存在(404)"
-                logger.warning(f"[{index}] {error_msg}: {full_url}")
-            elif status_code >= 500:
-                error_msg = f"服务器错误({status_code})"
-                logger.error(f"[{index}] {error_msg}: {full_url}")
-            elif status_code >= 400:
-                error_msg = f"客户端错误({status_code})"
-                logger.warning(f"[{index}] {error_msg}: {full_url}")
-            else:
-                error_msg = ""
-                logger.info(f"[{index}] 检测成功 [{status_code}]: {full_url}")
-
-            await context.close()
-
-            return {
-                'url': full_url,
-                'name': name,
-                'status_code': status_code,
-                'status_text': status_text,
-                'error': error_msg
-            }
 
+async def check_single_url(
+    task: TaskContext,
+    host: str,
+    cache: Optional[ResponseCache] = None,
+    max_age: int = 0,
+    session: Optional[aiohttp.ClientSession] = None
+) -> Dict:
+    """检测单个URL的状态码"""
+    url_info = task.item
+    name = url_info['name']
+    index = task.index
+    logger = task.logger
+
+    # 构建完整URL
+    full_url = build_full_url(url_info['url'], host)
+
+    # 未过期的缓存直接返回，不访问网络；重试时缓存中是上一次尝试的结果，
+    # 必须重新访问
+    entry = cache.get(full_url) if cache is not None and task.attempt == 1 else None
+    if entry and cache.is_fresh(entry, max_age):
+        cache.hits += 1
+        logger.info(
+            f"[{index}] 使用缓存结果 [{entry.get('status_code')}]: "
+            f"{full_url}")
+        return cached_result(full_url, name, entry, 'hit')
+
+    # 过期缓存先发送条件请求，304时沿用缓存结果
+    if entry and session is not None:
+        try:
+            with task.phase('revalidate'):
+                status = await revalidate_url(session, full_url, entry)
         except Exception as e:
-            error_msg = str(e)
-            logger.error(f"[{index}] 检测失败: {full_url} - {error_msg}")
-
-            if context:
-                try:
-                    await context.close()
-                except Exception:
-                    pass
-
-            return {
-                'url': full_url,
-                'name': name,
-                'status_code': None,
-                'status_text': 'Error',
-                'error': error_msg
-            }
-
-
-def build_full_url(url: str, host: str) -> str:
-    """构建完整URL
+            status = None
+            logger.debug(f"[{index}] 条件请求失败: {str(e)}")
+        if status == 304:
+            cache.touch(full_url)
+            cache.hits += 1
+            cache.revalidated += 1
+            logger.info(
+                f"[{index}] 条件请求未修改(304)，沿用缓存结果 "
+                f"[{entry.get('status_code')}]: {full_url}")
+            return cached_result(full_url, name, entry, 'revalidated')
 
-    如果URL已经包含域名，直接使用；否则使用提供的host
-    """
-    url = url.strip()
+    if cache is not None and task.attempt == 1:
+        cache.misses += 1
 
-    # 检查是否已经是完整URL
-    parsed = urlparse(url)
-    if parsed.scheme and parsed.netloc:
-        return url
+    logger.info(f"[{index}] 开始检测: {full_url}")
 
-    # 如果是相对路径，与host组合
-    if not url.startswith('/'):
-        url = '/' + url
+    # 随机延迟（模拟人类行为）
+    await task.delay(1.0, 2.5)
 
-    return urljoin(host, url)
+    async with task.page() as page:
+        # 访问页面并获取响应
+        with task.phase('goto'):
+            resp = await page.goto(full_url, wait_until='domcontentloaded')
 
+        # 获取状态码
+        status_code = resp.status if resp else None
+        status_text = resp.status_text if resp else 'No Response'
+
+        # 判断状态
+        error_msg = status_error_message(status_code)
+        if status_code is not None and status_code >= 500:
+            logger.error(f"[{index}] {error_msg}: {full_url}")
+        elif error_msg:
+            logger.warning(f"[{index}] {error_msg}: {full_url}")
+        else:
+            logger.info(f"[{index}] 检测成功 [{status_code}]: {full_url}")
+
+        # 记录响应元数据到缓存
+        if cache is not None and resp is not None:
+            with task.phase('cache'):
+                try:
+                    body = await resp.body()
+                except Exception:
+                    # 重定向等响应没有正文
+                    body = None
+                if body:
+                    task.add_bytes(len(body))
+                cache.put(full_url, status_code, status_text,
+                          headers=await resp.all_headers(), body=body)
+
+    return {
+        'url': full_url,
+        'name': name,
+        'status_code': status_code,
+        'status_text': status_text,
+        'error': error_msg,
+        'cache': 'miss' if cache is not None else ''
+    }
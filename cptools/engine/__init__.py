@@ -0,0 +1,26 @@
+"""任务引擎：三个命令共用的浏览器管理、调度、指标和结果输出"""
+from cptools.engine.browser import (
+    BrowserManager, DEFAULT_CONTEXT_OPTIONS, LAUNCH_ARGS, USER_AGENT
+)
+from cptools.engine.handler import TaskContext, TaskHandler
+from cptools.engine.metrics import RunMetrics
+from cptools.engine.runner import Engine
+from cptools.engine.sinks import (
+    JsonlSink, ListSink, ResultSink, RunResults, read_jsonl_results
+)
+
+__all__ = [
+    'BrowserManager',
+    'DEFAULT_CONTEXT_OPTIONS',
+    'Engine',
+    'JsonlSink',
+    'LAUNCH_ARGS',
+    'ListSink',
+    'ResultSink',
+    'RunMetrics',
+    'RunResults',
+    'TaskContext',
+    'TaskHandler',
+    'USER_AGENT',
+    'read_jsonl_results',
+]
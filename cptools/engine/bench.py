@@ -0,0 +1,77 @@
+"""任务引擎吞吐量基准测试
+
+不启动浏览器，使用只做 ``asyncio.sleep`` 的处理器测量引擎本身的调度开销：
+
+    python -m cptools.engine.bench --items 20000 --concurrency 50 --latency 0.001
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Dict
+
+from cptools.engine.handler import TaskContext, TaskHandler
+from cptools.engine.runner import Engine
+
+
+class SleepHandler(TaskHandler):
+    """模拟固定延迟的处理器"""
+
+    action = '基准'
+    uses_browser = False
+
+    def __init__(self, latency: float, fail_every: int = 0):
+        self.latency = latency
+        self.fail_every = fail_every
+
+    async def process(self, task: TaskContext) -> Dict:
+        await asyncio.sleep(self.latency)
+        if self.fail_every and task.index % self.fail_every == 0:
+            raise RuntimeError('simulated failure')
+        return {'index': task.index, 'status': 'success', 'error': ''}
+
+    def failure_result(self, item: Dict, error: str) -> Dict:
+        return {'index': item['index'], 'status': 'failed', 'error': error}
+
+
+async def run_bench(
+    items: int,
+    concurrency: int,
+    latency: float,
+    fail_every: int = 0
+) -> Dict:
+    """运行一次基准测试，返回指标汇总"""
+    logger = logging.getLogger('cptools.bench')
+    engine = Engine(SleepHandler(latency, fail_every), concurrency, logger)
+    source = ({'index': i} for i in range(1, items + 1))
+    cpu_start = time.process_time()
+    results = await engine.run(source)
+    summary = engine.metrics.summary()
+    summary['cpu_seconds'] = round(time.process_time() - cpu_start, 3)
+    # 理想吞吐：所有 worker 始终忙碌时的条/秒
+    summary['ideal_items_per_second'] = (
+        round(concurrency / latency, 2) if latency > 0 else None
+    )
+    summary['ordered'] = all(
+        r['index'] == i for i, r in enumerate(results, 1))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='任务引擎吞吐量基准测试')
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.001,
+                        help='每条任务的模拟耗时（秒）')
+    parser.add_argument('--fail-every', type=int, default=0,
+                        help='每 N 条任务抛出一次异常（0 表示不失败）')
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_bench(
+        args.items, args.concurrency, args.latency, args.fail_every))
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
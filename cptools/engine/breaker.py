@@ -0,0 +1,188 @@
+"""按主机的熔断器
+
+某个主机连续出现超时、连接错误或 5xx 达到阈值后熔断（open），熔断期间该主机的
+任务不再访问网络，而是延后或直接失败；冷却时间过后进入半开（half_open）状态，
+只放行一个探测任务，探测成功则恢复（closed），失败则重新熔断。
+"""
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# 熔断期间的处理方式
+MODE_DEFER = 'defer'
+MODE_FAIL = 'fail'
+
+# defer 模式下单条任务最多被延后的次数（每次等待到冷却结束），超过后按失败处理；
+# 半开状态下等待探测结果的时间不计入
+MAX_DEFERRALS = 5
+
+
+class CircuitBreaker:
+    """单个主机的熔断器"""
+
+    def __init__(self, host: str, threshold: int, cooldown: float):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allow(self, now: float) -> bool:
+        """当前是否允许访问该主机（半开状态只放行一个探测任务）"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.probing = False
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def retry_after(self, now: float) -> float:
+        """距离下一次探测还需要等待的秒数
+
+        半开状态下探测进行中时，引擎会等探测结果记录后再处理任务（不调用
+        此方法），这里返回一个冷却时间只是兜底。
+        """
+        if self.state == OPEN:
+            return max(0.0, self.cooldown - (now - self.opened_at))
+        return self.cooldown
+
+    @property
+    def probe_in_flight(self) -> bool:
+        return self.state == HALF_OPEN and self.probing
+
+    def record_success(self):
+        self.failures = 0
+        self.probing = False
+        self.state = CLOSED
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.failures >= self.threshold):
+            self.state = OPEN
+            self.opened_at = now
+
+
+class HostBreakers:
+    """所有主机的熔断器集合，负责记录和输出状态变化
+
+    Args:
+        threshold: 连续失败多少次后熔断（0 表示禁用）
+        cooldown: 熔断后多少秒进入半开状态
+        mode: 熔断期间的处理方式（defer 延后 / fail 直接失败）
+        logger: 日志记录器
+    """
+
+    def __init__(
+        self,
+        threshold: int,
+        cooldown: float,
+        mode: str = MODE_DEFER,
+        logger=None
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.mode = mode
+        self.logger = logger
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.events: List[Dict] = []
+        self.short_circuited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def _get(self, host: str) -> CircuitBreaker:
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host, self.threshold, self.cooldown)
+            self.breakers[host] = breaker
+        return breaker
+
+    def allow(self, host: str) -> bool:
+        if not self.enabled or not host:
+            return True
+        breaker = self._get(host)
+        before = breaker.state
+        allowed = breaker.allow(time.monotonic())
+        self._record_change(breaker, before)
+        if not allowed:
+            self.short_circuited += 1
+        return allowed
+
+    def retry_after(self, host: str) -> float:
+        return self._get(host).retry_after(time.monotonic())
+
+    def probe_in_flight(self, host: str) -> bool:
+        """该主机是否有探测任务正在执行"""
+        breaker = self.breakers.get(host)
+        return breaker is not None and breaker.probe_in_flight
+
+    def record(self, host: str, healthy: bool):
+        """记录一次访问结果：healthy 表示主机有正常响应"""
+        if not self.enabled or not host:
+            return
+        breaker = self._get(host)
+        before = breaker.state
+        if healthy:
+            breaker.record_success()
+        else:
+            breaker.record_failure(time.monotonic())
+        self._record_change(breaker, before)
+
+    def release(self, host: str):
+        """任务没有访问网络（如使用缓存结果）：不计入熔断，交还探测名额"""
+        breaker = self.breakers.get(host)
+        if breaker is not None and breaker.probe_in_flight:
+            breaker.probing = False
+
+    def _record_change(self, breaker: CircuitBreaker, before: str):
+        if breaker.state == before:
+            return
+        self.events.append({
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'host': breaker.host,
+            'from': before,
+            'to': breaker.state,
+            'failures': breaker.failures,
+        })
+        if self.logger is None:
+            return
+        if breaker.state == OPEN:
+            self.logger.warning(
+                f"熔断器打开: {breaker.host} 连续失败 {breaker.failures} 次，"
+                f"{self.cooldown:g} 秒后探测恢复")
+        elif breaker.state == HALF_OPEN:
+            self.logger.info(f"熔断器半开: {breaker.host} 放行一个探测任务")
+        else:
+            self.logger.info(f"熔断器关闭: {breaker.host} 已恢复")
+
+    def summary(self) -> Dict:
+        return {
+            'events': list(self.events),
+            'short_circuited': self.short_circuited,
+            'open_hosts': sorted(
+                host for host, b in self.breakers.items() if b.state != CLOSED
+            ),
+        }
+
+
+def breaker_error(host: str) -> str:
+    """熔断导致失败时的错误信息"""
+    return f"主机 {host} 已熔断，跳过访问"
+
+
+def host_of(url: Optional[str]) -> str:
+    """从URL中提取主机名"""
+    return urlparse(url or '').netloc.lower()
@@ -0,0 +1,184 @@
+"""浏览器生命周期管理
+
+三个命令共用同一套 Chromium 启动参数和上下文配置，浏览器在第一次需要页面时才启动。
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from playwright.async_api import async_playwright, Browser
+
+
+# 轻量级浏览器启动参数（针对低配置服务器优化 + 反爬虫）
+LAUNCH_ARGS = [
+    '--no-sandbox',
+    '--disable-dev-shm-usage',  # 重要：低内存环境
+    '--disable-setuid-sandbox',
+    '--disable-gpu',  # 重要：节省资源
+    '--disable-software-rasterizer',
+    '--disable-extensions',
+    '--disable-background-networking',  # 减少后台网络请求
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-breakpad',
+    '--disable-client-side-phishing-detection',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-domain-reliability',
+    '--disable-features=AudioServiceOutOfProcess',
+    '--disable-hang-monitor',
+    '--disable-ipc-flooding-protection',
+    '--disable-notifications',
+    '--disable-offer-store-unmasked-wallet-cards',
+    '--disable-popup-blocking',
+    '--disable-print-preview',
+    '--disable-prompt-on-repost',
+    '--disable-renderer-backgrounding',
+    '--disable-sync',
+    '--disable-translate',
+    '--metrics-recording-only',
+    '--no-first-run',
+    '--mute-audio',
+    '--safebrowsing-disable-auto-update',
+    '--enable-automation',
+    '--password-store=basic',
+    '--use-mock-keychain',
+]
+
+# 真实浏览器特征
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+    'AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/120.0.0.0 Safari/537.36'
+)
+
+# 所有上下文共用的默认配置
+DEFAULT_CONTEXT_OPTIONS = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': USER_AGENT,
+    'locale': 'en-US',
+    'ignore_https_errors': True,  # 忽略 HTTPS 错误
+}
+
+
+class BrowserManager:
+    """共享浏览器实例
+
+    浏览器按需启动；启动失败后记住错误，后续任务直接失败而不是反复重试启动。
+    """
+
+    def __init__(self, logger, timeout: int = 30000):
+        self.logger = logger
+        self.timeout = timeout
+        self._playwright = None
+        self._browser: Optional[Browser] = None
+        self._launch_error: Optional[Exception] = None
+        self._lock = asyncio.Lock()
+        self.contexts_open = 0
+        # 浏览器启动次数（包括内存回收后的重启）
+        self.launches = 0
+
+    async def get(self) -> Browser:
+        """返回浏览器实例，首次调用时启动"""
+        if self._browser is not None:
+            return self._browser
+        if self._launch_error is not None:
+            raise self._launch_error
+
+        async with self._lock:
+            if self._browser is None and self._launch_error is None:
+                try:
+                    self._playwright = await async_playwright().start()
+                    self._browser = await self._playwright.chromium.launch(
+                        headless=True,
+                        args=LAUNCH_ARGS,
+                        chromium_sandbox=False,
+                    )
+                    self.launches += 1
+                    if self.launches == 1:
+                        self.logger.info("浏览器启动成功（已启用反爬虫优化）")
+                    else:
+                        self.logger.info(f"浏览器第 {self.launches} 次启动成功")
+                except Exception as e:
+                    self._launch_error = e
+                    self.logger.error(f"启动浏览器失败: {str(e)}")
+                    self.logger.error(
+                        "请确保已安装Playwright浏览器: "
+                        "playwright install chromium")
+                    await self._stop_playwright()
+        if self._launch_error is not None:
+            raise self._launch_error
+        return self._browser
+
+    @asynccontextmanager
+    async def page(self, **context_options):
+        """创建独立的浏览器上下文和页面，退出时关闭上下文
+
+        Args:
+            context_options: 覆盖 DEFAULT_CONTEXT_OPTIONS 的上下文参数
+        """
+        browser = await self.get()
+        options: Dict = dict(DEFAULT_CONTEXT_OPTIONS)
+        options.update(context_options)
+
+        context = await browser.new_context(**options)
+        self.contexts_open += 1
+        try:
+            page = await context.new_page()
+
+            # 设置超时
+            page.set_default_navigation_timeout(self.timeout)
+            page.set_default_timeout(self.timeout)
+
+            yield page
+        finally:
+            self.contexts_open -= 1
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    @property
+    def driver_pid(self) -> Optional[int]:
+        """Playwright 驱动进程的 PID（Chromium 进程都是它的子孙），未启动时为 None
+
+        Playwright 没有公开该进程，这里读取其管道传输对象，取不到时返回 None
+        （内存监控会记录警告并改为统计全部子进程）。
+        """
+        if self._playwright is None:
+            return None
+        try:
+            return self._playwright._impl_obj._connection._transport._proc.pid
+        except AttributeError:
+            return None
+
+    @property
+    def running(self) -> bool:
+        """浏览器是否已启动"""
+        return self._browser is not None
+
+    async def recycle(self):
+        """关闭当前浏览器，下一次需要页面时重新启动
+
+        调用前应先等待进行中的页面全部结束（见 ``Engine.drain``）。
+        """
+        async with self._lock:
+            await self.close()
+
+    async def close(self):
+        """关闭浏览器（未启动时不做任何事）"""
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            finally:
+                self._browser = None
+                self.logger.info("浏览器已关闭")
+        await self._stop_playwright()
+
+    async def _stop_playwright(self):
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
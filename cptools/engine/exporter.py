@@ -0,0 +1,141 @@
+"""OpenMetrics 指标端点
+
+``--metrics-port`` 启用后，运行期间在本机提供 ``/metrics``，本地 Prometheus
+可以抓取实时的并发数、完成数、分阶段耗时直方图、下载字节数、浏览器上下文数量
+和进程内存，用于观察吞吐和对卡住的任务告警。
+"""
+from typing import List, Optional
+
+from aiohttp import web
+
+from cptools.engine.resources import process_rss
+from cptools.engine.services import RunService
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return (str(value).replace('\\', '\\\\')
+            .replace('"', '\\"').replace('\n', '\\n'))
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return '{' + pairs + '}'
+
+
+def _le(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def render_metrics(engine, prefix: str = 'cptools') -> str:
+    """把引擎的实时指标渲染成 OpenMetrics 文本"""
+    metrics = engine.metrics
+    command = engine.handler.__class__.__name__
+    lines: List[str] = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f'# TYPE {prefix}_{name} {kind}')
+        lines.append(f'# HELP {prefix}_{name} {help_text}')
+        for suffix, labels, value in samples:
+            lines.append(f'{prefix}_{name}{suffix}{_labels(**labels)} {value}')
+
+    base = {'handler': command}
+    family('tasks_in_flight', 'gauge', '正在执行的任务数',
+           [('', base, metrics.in_flight)])
+    family('tasks_submitted', 'counter', '已投递的输入条数',
+           [('_total', base, metrics.submitted)])
+    family('task_attempts', 'counter', '任务尝试次数（含重试）',
+           [('_total', base, metrics.attempts)])
+    family('task_retries', 'counter', '重试次数',
+           [('_total', base, metrics.retried)])
+    family('items_completed', 'counter', '产出最终结果的条数（按结果和状态码）', [
+        ('_total', dict(base, outcome=outcome, status=status), count)
+        for (outcome, status), count in sorted(metrics.status_counts.items())
+    ])
+    family('bytes_downloaded', 'counter', '下载的字节数',
+           [('_total', base, metrics.bytes_downloaded)])
+    family('concurrency_limit', 'gauge', '当前允许同时执行的任务数',
+           [('', base, engine.concurrency_limit)])
+
+    histogram_samples = []
+    for phase, hist in metrics.timings.histograms().items():
+        labels = dict(base, phase=phase)
+        for bound, count in hist['buckets']:
+            histogram_samples.append(
+                ('_bucket', dict(labels, le=_le(bound)), count))
+        histogram_samples.append(('_count', labels, hist['count']))
+        histogram_samples.append(('_sum', labels, round(hist['sum'], 6)))
+    family('phase_seconds', 'histogram', '单条任务各阶段耗时（秒）',
+           histogram_samples)
+
+    if engine.browser is not None:
+        family('browser_contexts_open', 'gauge', '打开的浏览器上下文数',
+               [('', base, engine.browser.contexts_open)])
+        family('browser_launches', 'counter', '浏览器启动次数（含内存回收后的重启）',
+               [('_total', base, engine.browser.launches)])
+    http = engine.http
+    family('http_requests', 'counter', '经连接池发出的HTTP请求数',
+           [('_total', base, http.requests)])
+    family('http_connections', 'counter', '连接池取得的连接数（reused 复用，created 新建）',
+           [('_total', dict(base, kind='reused'), http.reused),
+            ('_total', dict(base, kind='created'), http.created)])
+    family('breaker_open_hosts', 'gauge', '处于熔断状态的主机数',
+           [('', base, len(engine.breakers.summary()['open_hosts']))])
+
+    rss = process_rss()
+    if rss is not None:
+        family('process_resident_memory_bytes', 'gauge', 'Python进程常驻内存',
+               [('', {}, rss)])
+
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter(RunService):
+    """运行期间提供 /metrics 的 HTTP 服务
+
+    Args:
+        port: 监听端口
+        logger: 日志记录器
+        host: 监听地址（默认只监听本机）
+    """
+
+    name = '指标端点'
+
+    def __init__(self, port: int, logger, host: str = '127.0.0.1'):
+        self.port = port
+        self.host = host
+        self.logger = logger
+        self.engine = None
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, engine):
+        self.engine = engine
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except OSError as e:
+            # 端口被占用等问题不影响任务本身
+            await runner.cleanup()
+            self.logger.warning(f"指标端点启动失败: {str(e)}")
+            return
+        self._runner = runner
+        self.logger.info(
+            f"指标端点已启动: http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=render_metrics(self.engine).encode('utf-8'),
+            headers={'Content-Type': CONTENT_TYPE},
+        )
@@ -0,0 +1,133 @@
+"""单条任务处理器接口"""
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+from cptools.engine.breaker import host_of
+from cptools.engine.browser import BrowserManager
+from cptools.engine.http import HttpPool
+
+
+class TaskContext:
+    """单条任务的执行上下文，由引擎创建并传给处理器"""
+
+    def __init__(
+        self,
+        item: Dict,
+        browser: Optional[BrowserManager],
+        logger,
+        attempt: int = 1,
+        delay_scale: float = 1.0
+    ):
+        self.item = item
+        self.index = item.get('index')
+        self.browser = browser
+        self.logger = logger
+        self.attempt = attempt
+        self.delay_scale = delay_scale
+        # 各阶段耗时（秒），由引擎写入结果的 timings 字段
+        self.timings: Dict[str, float] = {}
+        # 本次尝试下载/读取的字节数
+        self.bytes = 0
+
+    def record(self, phase: str, seconds: float):
+        """累加某个阶段的耗时"""
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def add_bytes(self, size: int):
+        """累加下载的字节数（计入运行指标）"""
+        self.bytes += size
+
+    @contextmanager
+    def phase(self, name: str):
+        """统计 with 块内的耗时（块内可以 await）"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - started)
+
+    @asynccontextmanager
+    async def page(self, **context_options):
+        """创建页面（async with），退出时自动关闭上下文
+
+        创建上下文和页面的耗时（首次还包括启动浏览器）计入 new_context 阶段。
+        """
+        started = time.monotonic()
+        async with self.browser.page(**context_options) as page:
+            self.record('new_context', time.monotonic() - started)
+            yield page
+
+    async def delay(self, low: float, high: float):
+        """随机延迟（模拟人类行为），基准测试时按 delay_scale 缩放"""
+        delay = random.uniform(low, high) * self.delay_scale
+        if delay <= 0:
+            return
+        self.logger.debug(f"[{self.index}] 随机延迟 {delay:.2f} 秒")
+        with self.phase('delay'):
+            await asyncio.sleep(delay)
+
+
+class TaskHandler:
+    """任务处理器基类
+
+    子类实现 ``process`` 处理单条输入并返回结果字典；处理过程中抛出的异常由引擎
+    统一捕获，并通过 ``failure_result`` 转换成失败结果。
+    """
+
+    # 日志中使用的动作名称，如 "截图"、"检测"
+    action = '处理'
+
+    # 命令名，写入 JSONL 结果文件，用于 ``cptools report`` 选择报告类型
+    command = ''
+
+    # 是否需要浏览器（不需要时引擎不会启动 Chromium）
+    uses_browser = True
+
+    # 运行共用的HTTP连接池，由引擎设置
+    http: Optional[HttpPool] = None
+
+    async def setup(self):
+        """运行开始前调用（在事件循环内），用于创建会话等资源
+
+        HTTP会话应通过 ``self.http.session()`` 创建，以共用连接池。
+        """
+
+    async def teardown(self):
+        """运行结束后调用，释放 setup 中创建的资源"""
+
+    def describe(self, item: Dict) -> str:
+        """日志中用于标识输入项的文字"""
+        return str(item.get('url', item.get('index')))
+
+    def host_of(self, item: Dict) -> str:
+        """输入项访问的主机（用于按主机熔断）"""
+        return host_of(self.describe(item))
+
+    async def process(self, task: TaskContext) -> Dict:
+        """处理单条输入，返回结果字典"""
+        raise NotImplementedError
+
+    def failure_result(self, item: Dict, error: str) -> Dict:
+        """根据异常信息构建失败结果"""
+        raise NotImplementedError
+
+    def is_success(self, result: Dict) -> bool:
+        """判断结果是否成功（用于统计和重试判断）"""
+        return result.get('status') == 'success'
+
+    def touched_network(self, result: Dict) -> bool:
+        """结果是否来自本次对主机的访问（来自缓存的结果不计入熔断）"""
+        return True
+
+    def failure_info(self, result: Dict) -> Dict:
+        """提取失败结果中用于重试分类的信息（HTTP状态码和错误信息）
+
+        可以附带 ``retryable`` 明确指定是否重试，不再按状态码和错误信息判断。
+        """
+        return {
+            'status_code': result.get('status_code'),
+            'error': result.get('error', ''),
+        }
@@ -0,0 +1,147 @@
+"""运行共用的HTTP连接池
+
+一次运行中所有 aiohttp 请求（url404 条件请求、downloadmips 的页面和图片、
+通知）共用一个 ``TCPConnector``：同一主机的连接保持长连接复用，不必每次
+重新解析 DNS 和握手；DNS 结果按 TTL 缓存；可以限制总连接数和单个主机的连接数。
+
+通过 aiohttp 的 TraceConfig 统计连接池命中（复用已有连接）、未命中（新建
+连接，耗时为 TCP 连接和 TLS 握手时间）、等待空闲连接的次数和 DNS 缓存命中，
+写入运行汇总的 ``http`` 字段。
+"""
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from cptools.engine.timings import percentile
+
+# 连接池总连接数上限
+DEFAULT_POOL_LIMIT = 100
+
+# DNS 缓存有效期（秒）
+DEFAULT_DNS_TTL = 300
+
+# 空闲连接保持时间（秒）
+DEFAULT_KEEPALIVE = 30.0
+
+
+class HttpPool:
+    """一次运行共用的连接池，``session()`` 创建的会话都使用同一个连接器
+
+    连接器在第一次创建会话时（事件循环内）才创建，不发HTTP请求的运行没有开销。
+
+    Args:
+        limit: 总连接数上限（0 为不限制）
+        limit_per_host: 单个主机的连接数上限（0 为不限制）
+        dns_ttl: DNS 缓存有效期（秒，0 为不缓存）
+        keepalive: 空闲连接保持时间（秒，0 为每个请求结束后关闭连接）
+    """
+
+    def __init__(
+        self,
+        limit: int = DEFAULT_POOL_LIMIT,
+        limit_per_host: int = 0,
+        dns_ttl: int = DEFAULT_DNS_TTL,
+        keepalive: float = DEFAULT_KEEPALIVE
+    ):
+        self.limit = max(0, limit)
+        self.limit_per_host = max(0, limit_per_host)
+        self.dns_ttl = max(0, dns_ttl)
+        self.keepalive = max(0.0, keepalive)
+        self.requests = 0
+        self.reused = 0
+        self.created = 0
+        self.queued = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+        self.connect_seconds: List[float] = []
+        self.dns_seconds: List[float] = []
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._trace = self._build_trace()
+
+    def session(self, **kwargs) -> aiohttp.ClientSession:
+        """创建使用共享连接器的会话（关闭会话不会关闭连接器）"""
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=self.dns_ttl > 0,
+                ttl_dns_cache=self.dns_ttl or None,
+                force_close=self.keepalive <= 0,
+                keepalive_timeout=self.keepalive if self.keepalive > 0 else None,
+                enable_cleanup_closed=True,
+            )
+        return aiohttp.ClientSession(
+            connector=self._connector,
+            connector_owner=False,
+            trace_configs=[self._trace],
+            **kwargs)
+
+    async def close(self):
+        """关闭连接器和其中的连接（运行结束时由引擎调用）"""
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+
+    def summary(self) -> Dict:
+        connects = sorted(self.connect_seconds)
+        lookups = sorted(self.dns_seconds)
+        acquired = self.reused + self.created
+        return {
+            'requests': self.requests,
+            'pool_hits': self.reused,
+            'pool_misses': self.created,
+            'hit_rate': round(self.reused / acquired, 3) if acquired else 0.0,
+            'queued': self.queued,
+            'handshake_p50_ms': round(percentile(connects, 50) * 1000, 1),
+            'handshake_max_ms': round(connects[-1] * 1000, 1) if connects else 0.0,
+            'dns_hits': self.dns_hits,
+            'dns_misses': self.dns_misses,
+            'dns_p50_ms': round(percentile(lookups, 50) * 1000, 1),
+        }
+
+    def _build_trace(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def request_start(session, ctx, params):
+            self.requests += 1
+
+        async def queued_start(session, ctx, params):
+            self.queued += 1
+
+        async def reused(session, ctx, params):
+            self.reused += 1
+
+        async def create_start(session, ctx, params):
+            ctx.connect_started = time.monotonic()
+
+        async def create_end(session, ctx, params):
+            self.created += 1
+            started = getattr(ctx, 'connect_started', None)
+            if started is not None:
+                self.connect_seconds.append(time.monotonic() - started)
+
+        async def dns_hit(session, ctx, params):
+            self.dns_hits += 1
+
+        async def dns_miss(session, ctx, params):
+            self.dns_misses += 1
+
+        async def resolve_start(session, ctx, params):
+            ctx.resolve_started = time.monotonic()
+
+        async def resolve_end(session, ctx, params):
+            started = getattr(ctx, 'resolve_started', None)
+            if started is not None:
+                self.dns_seconds.append(time.monotonic() - started)
+
+        trace.on_request_start.append(request_start)
+        trace.on_connection_queued_start.append(queued_start)
+        trace.on_connection_reuseconn.append(reused)
+        trace.on_connection_create_start.append(create_start)
+        trace.on_connection_create_end.append(create_end)
+        trace.on_dns_cache_hit.append(dns_hit)
+        trace.on_dns_cache_miss.append(dns_miss)
+        trace.on_dns_resolvehost_start.append(resolve_start)
+        trace.on_dns_resolvehost_end.append(resolve_end)
+        return trace
@@ -0,0 +1,71 @@
+"""运行期间定时刷新HTML报告"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from cptools.engine.services import RunService
+
+
+class LiveReport(RunService):
+    """每隔 ``interval`` 秒用已完成的结果重新生成报告
+
+    报告直接使用引擎内存中收集的结果（只复制引用列表，不复制结果本身），
+    在单独的线程中渲染和写入，避免大报告的字符串拼接阻塞事件循环。
+    运行开始时先生成一份空报告，之后只有新增结果时才重新生成；
+    最终报告仍由命令在运行结束后生成。
+
+    Args:
+        render: 渲染函数，参数为按输入顺序排列的结果列表
+        interval: 刷新间隔（秒）
+        logger: 日志记录器
+    """
+
+    name = '实时报告'
+
+    def __init__(
+        self,
+        render: Callable[[List[Dict]], None],
+        interval: float,
+        logger
+    ):
+        self.render = render
+        self.interval = interval
+        self.logger = logger
+        self.renders = 0
+        self._engine = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='live-report')
+
+    async def start(self, engine):
+        self._engine = engine
+        self._task = asyncio.ensure_future(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # 等待正在进行的渲染完成，避免覆盖命令随后生成的最终报告
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._executor.shutdown)
+        if self.renders:
+            self.logger.info(f"实时报告共刷新 {self.renders} 次")
+
+    async def _refresh_loop(self):
+        rendered_count = -1
+        while True:
+            completed = self._engine.metrics.completed
+            if completed != rendered_count:
+                snapshot = self._engine.collector.results()
+                try:
+                    await asyncio.wrap_future(
+                        self._executor.submit(self.render, snapshot))
+                    self.renders += 1
+                    rendered_count = completed
+                except Exception as e:
+                    self.logger.warning(f"刷新实时报告失败: {str(e)}")
+            await asyncio.sleep(self.interval)
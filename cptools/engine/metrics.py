@@ -0,0 +1,83 @@
+"""运行指标统计"""
+import time
+from typing import Dict, Tuple
+
+from cptools.engine.timings import PhaseTimings
+
+
+class RunMetrics:
+    """记录一次运行的任务计数、并发和吞吐量"""
+
+    def __init__(self):
+        self.started_at = None
+        self.finished_at = None
+        self.submitted = 0
+        self.completed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.task_seconds = 0.0
+        self.retried = 0
+        self.attempts = 0
+        # 最终结果的分阶段耗时
+        self.timings = PhaseTimings()
+        # (结果, 状态) -> 条数，状态为HTTP状态码或 none
+        self.status_counts: Dict[Tuple[str, str], int] = {}
+        self.bytes_downloaded = 0
+
+    def start(self):
+        self.started_at = time.monotonic()
+
+    def finish(self):
+        self.finished_at = time.monotonic()
+
+    def task_started(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def task_finished(self, seconds: float):
+        """一次尝试结束（重试的每次尝试都会计数）"""
+        self.in_flight -= 1
+        self.task_seconds += seconds
+        self.attempts += 1
+
+    def item_finished(self, success: bool, status_code=None):
+        """一条输入产出最终结果"""
+        self.completed += 1
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        key = ('success' if success else 'failed', str(status_code or 'none'))
+        self.status_counts[key] = self.status_counts.get(key, 0) + 1
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at or time.monotonic()
+        return end - self.started_at
+
+    def summary(self) -> Dict:
+        """返回可序列化的指标汇总"""
+        elapsed = self.elapsed
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'attempts': self.attempts,
+            'retried': self.retried,
+            'max_in_flight': self.max_in_flight,
+            'elapsed_seconds': round(elapsed, 3),
+            'items_per_second': (
+                round(self.completed / elapsed, 2) if elapsed > 0 else 0.0
+            ),
+            'avg_task_seconds': (
+                round(self.task_seconds / self.attempts, 3)
+                if self.attempts else 0.0
+            ),
+            'bytes_downloaded': self.bytes_downloaded,
+            'timings': self.timings.summary(),
+        }
@@ -0,0 +1,310 @@
+"""运行期间的通知服务
+
+在任务所在的事件循环中发送进度通知、失败率告警和运行结束通知，整个运行共用一个
+HTTP 会话（使用引擎的连接池）。发送在单独的协程中进行，不阻塞 worker；发送频率受机器人限流约束，
+等待期间到达的消息合并为一条。
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from cptools.engine.services import RunService
+from cptools.utils.dingding import RATE_LIMIT_PER_MINUTE
+
+# 发送函数：send(session, title, content)，失败时抛出异常
+Sender = Callable[[aiohttp.ClientSession, str, str], Awaitable[None]]
+
+# 检查进度的间隔（秒）
+WATCH_INTERVAL = 1.0
+
+# 计算失败率的最近结果数
+ERROR_WINDOW = 20
+
+# 同一机器人两条消息的最小间隔（秒）
+MIN_SEND_INTERVAL = 3.0
+
+# 消息种类
+PROGRESS = 'progress'
+ALERT = 'alert'
+FINAL = 'final'
+
+
+class Notifier(RunService):
+    """进度、告警和运行结束通知
+
+    - 进度：每完成 ``progress_percent``%（需要知道任务总数）或每隔
+      ``progress_interval`` 秒发送一次
+    - 告警：最近 ``ERROR_WINDOW`` 条结果的失败率达到 ``error_rate`` 时发送，
+      失败率回落到一半以下后才会再次告警
+    - 限流：两条消息至少间隔 ``min_interval`` 秒，每分钟不超过 ``per_minute``
+      条（默认为钉钉机器人的限制）；等待期间积压的进度消息只保留最新一条，其余
+      消息合并发送
+    - 重试：发送失败按指数退避重试 ``retries`` 次；运行结束时最多再等待
+      ``shutdown_timeout`` 秒把剩余消息（含结束通知）发完，超时放弃并记录日志，
+      不会拖慢退出
+
+    Args:
+        send: 发送函数 ``send(session, title, content)``
+        logger: 日志记录器
+        label: 消息标题中的任务名称（如 Screenshot）
+        final: 运行结束时生成结束通知的函数，参数为结果列表（附带 summary），
+            返回 (标题, 内容)，返回 None 时不发送
+        progress_percent: 进度通知的百分比间隔（0 为不按百分比发送）
+        progress_interval: 进度通知的时间间隔（秒，0 为不按时间发送）
+        error_rate: 失败率告警阈值（0-1，0 为不告警）
+        per_minute: 每分钟最多发送的消息数（0 为不限制）
+        min_interval: 两条消息的最小间隔（秒）
+        retries: 发送失败后的重试次数
+        shutdown_timeout: 运行结束时等待发送完成的最长时间（秒）
+    """
+
+    name = '通知服务'
+    summary_key = 'notifications'
+
+    def __init__(
+        self,
+        send: Sender,
+        logger,
+        label: str,
+        final: Optional[Callable[[List[Dict]], Optional[Tuple[str, str]]]] = None,
+        progress_percent: int = 0,
+        progress_interval: float = 0,
+        error_rate: float = 0,
+        per_minute: int = RATE_LIMIT_PER_MINUTE,
+        min_interval: float = MIN_SEND_INTERVAL,
+        retries: int = 2,
+        shutdown_timeout: float = 10.0
+    ):
+        self.send = send
+        self.logger = logger
+        self.label = label
+        self.final = final
+        self.progress_percent = progress_percent
+        self.progress_interval = progress_interval
+        self.error_rate = error_rate
+        self.per_minute = per_minute
+        self.min_interval = min_interval
+        self.retries = retries
+        self.shutdown_timeout = shutdown_timeout
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.send_seconds: List[float] = []
+        self.shutdown_seconds = 0.0
+        self._engine = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._queue: List[Tuple[str, str, str]] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._sent_at: Deque[float] = deque()
+        self._deadline: Optional[float] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self._send_task: Optional[asyncio.Task] = None
+
+    async def start(self, engine):
+        self._engine = engine
+        self._session = engine.http.session(
+            timeout=aiohttp.ClientTimeout(total=10))
+        self._wake = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._send_task = asyncio.ensure_future(self._send_loop())
+        if self.progress_percent > 0 or self.progress_interval > 0 or self.error_rate > 0:
+            self._watch_task = asyncio.ensure_future(self._watch_loop())
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+        # 结束通知会包含最终进度，积压的进度消息不再发送
+        pending = len(self._queue)
+        self._queue = [m for m in self._queue if m[0] != PROGRESS]
+        self.coalesced += pending - len(self._queue)
+        if self.final is not None:
+            try:
+                results = self._engine.collector.results()
+                results.summary = self._engine.summary()
+                message = self.final(results)
+            except Exception as e:
+                self.logger.error(f"生成结束通知失败: {str(e)}")
+                message = None
+            if message:
+                self.notify(*message, kind=FINAL)
+
+        loop = asyncio.get_running_loop()
+        self._deadline = loop.time() + self.shutdown_timeout
+        waited_from = time.monotonic()
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            # 队列为空时说明正在发送（或重试）最后一条
+            dropped = max(len(self._queue), 1)
+            self.dropped += dropped
+            self.logger.warning(
+                f"通知服务在 {self.shutdown_timeout:.0f} 秒内未发完，"
+                f"放弃剩余 {dropped} 条消息")
+        self.shutdown_seconds = time.monotonic() - waited_from
+        self._send_task.cancel()
+        await asyncio.gather(self._send_task, return_exceptions=True)
+        await self._session.close()
+        if self.sent or self.failed:
+            self.logger.info(
+                f"通知: 发送 {self.sent} 条，失败 {self.failed} 条，"
+                f"合并 {self.coalesced} 条")
+
+    def notify(self, title: str, content: str, kind: str = ALERT):
+        """加入一条消息，由发送协程按限流发送"""
+        self._queue.append((kind, title, content))
+        self._idle.clear()
+        self._wake.set()
+
+    def summary(self) -> Dict:
+        latencies = sorted(self.send_seconds)
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'p50_send_ms': round(latencies[len(latencies) // 2] * 1000, 1) if latencies else 0,
+            'max_send_ms': round(latencies[-1] * 1000, 1) if latencies else 0,
+            # 运行结束时等待剩余消息发完的时间
+            'shutdown_wait_ms': round(self.shutdown_seconds * 1000, 1),
+        }
+
+    # ---- 进度检测 ----
+
+    async def _watch_loop(self):
+        metrics = self._engine.metrics
+        last_percent = 0
+        last_progress_at = time.monotonic()
+        last_progress_completed = 0
+        samples: Deque[Tuple[int, int]] = deque([(0, 0)])
+        alerting = False
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL)
+            completed, failed = metrics.completed, metrics.failed
+            total = self._engine.total
+
+            due = False
+            if self.progress_percent > 0 and total:
+                percent = completed * 100 // total
+                step = percent // self.progress_percent * self.progress_percent
+                if step > last_percent and completed < total:
+                    last_percent = step
+                    due = True
+            if (self.progress_interval > 0
+                    and completed != last_progress_completed
+                    and time.monotonic() - last_progress_at >= self.progress_interval):
+                due = True
+            if due:
+                last_progress_at = time.monotonic()
+                last_progress_completed = completed
+                self.notify(*self._progress_message(), kind=PROGRESS)
+
+            if self.error_rate > 0:
+                samples.append((completed, failed))
+                # 保留覆盖最近 ERROR_WINDOW 条结果的最少采样
+                while len(samples) > 2 and completed - samples[1][0] >= ERROR_WINDOW:
+                    samples.popleft()
+                window = completed - samples[0][0]
+                if window >= ERROR_WINDOW:
+                    rate = (failed - samples[0][1]) / window
+                    if not alerting and rate >= self.error_rate:
+                        alerting = True
+                        self.notify(*self._alert_message(rate, window), kind=ALERT)
+                    elif alerting and rate < self.error_rate / 2:
+                        alerting = False
+
+    def _progress_line(self) -> str:
+        metrics = self._engine.metrics
+        total = self._engine.total
+        if total:
+            done = f"{metrics.completed}/{total} ({metrics.completed * 100 // total}%)"
+        else:
+            done = f"{metrics.completed}"
+        return (f"**Progress**: {done} | Success {metrics.succeeded}✅ | "
+                f"Failed {metrics.failed}❌")
+
+    def _progress_message(self) -> Tuple[str, str]:
+        elapsed = self._engine.metrics.elapsed
+        rate = self._engine.metrics.completed / elapsed if elapsed else 0
+        title = f"{self.label} Progress"
+        return title, (f"### ⏳ {title}\n\n{self._progress_line()}\n\n"
+                       f"**Elapsed**: {elapsed:.0f}s | {rate:.2f} items/s\n")
+
+    def _alert_message(self, rate: float, window: int) -> Tuple[str, str]:
+        title = f"{self.label} Error Rate Alert"
+        return title, (f"### ⚠️ {title}\n\n"
+                       f"**Failed**: {rate:.0%} of the last {window} results\n\n"
+                       f"{self._progress_line()}\n")
+
+    # ---- 发送 ----
+
+    async def _send_loop(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._queue:
+                await self._wait_for_slot()
+                title, content = self._take()
+                await self._deliver(title, content)
+            self._idle.set()
+
+    def _take(self) -> Tuple[str, str]:
+        """取出全部积压的消息合并为一条：进度只保留最新的一条"""
+        messages, self._queue = self._queue, []
+        latest_progress = max(
+            (i for i, m in enumerate(messages) if m[0] == PROGRESS), default=None)
+        kept = [m for i, m in enumerate(messages)
+                if m[0] != PROGRESS or i == latest_progress]
+        self.coalesced += len(messages) - 1
+        if len(kept) == 1:
+            return kept[0][1], kept[0][2]
+        title = f"{kept[-1][1]} (+{len(kept) - 1})"
+        return title, "\n\n---\n\n".join(m[2] for m in kept)
+
+    async def _wait_for_slot(self):
+        """按最小间隔和每分钟条数限流"""
+        while True:
+            now = time.monotonic()
+            while self._sent_at and now - self._sent_at[0] >= 60:
+                self._sent_at.popleft()
+            wait = 0.0
+            if self._sent_at:
+                wait = self._sent_at[-1] + self.min_interval - now
+            if self.per_minute > 0 and len(self._sent_at) >= self.per_minute:
+                wait = max(wait, self._sent_at[0] + 60 - now)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def _deliver(self, title: str, content: str):
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            started = time.monotonic()
+            try:
+                await self.send(self._session, title, content)
+            except Exception as e:
+                delay = 2.0 ** attempt
+                out_of_time = (self._deadline is not None
+                               and loop.time() + delay > self._deadline)
+                if attempt == self.retries or out_of_time:
+                    self.failed += 1
+                    self.logger.warning(f"发送通知失败: {title} - {str(e)}")
+                    return
+                self.logger.debug(
+                    f"发送通知失败，{delay:.0f} 秒后重试: {title} - {str(e)}")
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                self._sent_at.append(time.monotonic())
+            self.send_seconds.append(time.monotonic() - started)
+            self.sent += 1
+            self.logger.info(f"通知已发送: {title}")
+            return
@@ -0,0 +1,160 @@
+"""性能剖析：事件循环延迟监控和 ``--profile`` 的 cProfile 会话"""
+import asyncio
+import cProfile
+import io
+import pstats
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from cptools.engine.services import RunService
+from cptools.engine.timings import percentile
+
+# 摘要中列出的函数数量
+PROFILE_TOP = 30
+
+# 按源码路径把耗时归到各个部分（先匹配先得）
+COMPONENTS = [
+    ('engine', ('cptools/engine/',)),
+    ('reports', ('_report.py',)),
+    ('handlers', ('cptools/commands/',)),
+    ('utils', ('cptools/utils/',)),
+    ('playwright', ('playwright/',)),
+    ('aiohttp', ('aiohttp/', 'yarl/', 'multidict/')),
+    ('logging', ('logging/',)),
+    ('asyncio', ('asyncio/', 'selectors.py')),
+]
+
+
+class LoopLagMonitor(RunService):
+    """测量事件循环的调度延迟
+
+    每隔 ``interval`` 秒请求唤醒一次，实际唤醒时间与预期的差值即为事件循环被
+    阻塞（日志写盘、base64解码、大字符串拼接等）的时间。
+    """
+
+    name = '事件循环监控'
+    summary_key = 'loop_lag'
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, engine):
+        self._task = asyncio.ensure_future(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def summary(self) -> Dict:
+        """延迟统计（毫秒）"""
+        values = sorted(self.samples)
+        if not values:
+            return {'samples': 0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'samples': len(values),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'max_ms': round(values[-1] * 1000, 2),
+        }
+
+
+def component_of(filename: str) -> str:
+    """根据源码路径判断函数属于哪个部分"""
+    path = filename.replace('\\', '/')
+    for component, markers in COMPONENTS:
+        if any(marker in path for marker in markers):
+            return component
+    if path.startswith('<') or path == '~':
+        return 'builtins'
+    return 'other'
+
+
+def component_breakdown(stats: pstats.Stats) -> Dict[str, float]:
+    """按部分汇总函数自身耗时（秒），从大到小排列"""
+    totals: Dict[str, float] = {}
+    for (filename, _, _), (_, _, tottime, _, _) in stats.stats.items():
+        component = component_of(filename)
+        totals[component] = totals.get(component, 0.0) + tottime
+    return dict(sorted(
+        ((k, round(v, 3)) for k, v in totals.items()),
+        key=lambda pair: pair[1], reverse=True))
+
+
+def format_profile_summary(
+    profiler: cProfile.Profile,
+    wall_seconds: float,
+    top: int = PROFILE_TOP
+) -> str:
+    """生成文本摘要：各部分耗时 + 按累计时间和自身时间排序的前 N 个函数"""
+    stats = pstats.Stats(profiler)
+    breakdown = component_breakdown(stats)
+    total = sum(breakdown.values()) or 1.0
+    lines = [
+        f"墙钟时间: {wall_seconds:.2f} 秒，Python CPU（剖析内）: "
+        f"{stats.total_tt:.2f} 秒",
+        "",
+        "按部分统计的函数自身耗时:",
+    ]
+    for component, seconds in breakdown.items():
+        lines.append(
+            f"  {component:<12} {seconds:>9.3f} 秒  {seconds / total:6.1%}")
+
+    for title, key in (('累计时间', 'cumulative'), ('自身时间', 'tottime')):
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats(key).print_stats(top)
+        lines += ["", f"按{title}排序的前 {top} 个函数:", buffer.getvalue()]
+    return '\n'.join(lines)
+
+
+@contextmanager
+def profile_session(path: Optional[str], logger=None):
+    """在 with 块内启用 cProfile（path 为空时不做任何事）
+
+    结束时写入 ``path``（pstats 格式，可用 snakeviz 等工具查看）和
+    ``path`` + ``.txt`` 文本摘要。
+    """
+    if not path:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    started = time.monotonic()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        wall_seconds = time.monotonic() - started
+        try:
+            output = Path(path)
+            output.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(output))
+            summary_path = output.with_name(output.name + '.txt')
+            summary_path.write_text(
+                format_profile_summary(profiler, wall_seconds),
+                encoding='utf-8')
+            if logger is not None:
+                breakdown = component_breakdown(pstats.Stats(profiler))
+                logger.info(
+                    "剖析各部分耗时: " + '，'.join(
+                        f"{k} {v:.2f}s" for k, v in breakdown.items()))
+                logger.info(f"剖析结果已保存: {output}（摘要: {summary_path}）")
+        except Exception as e:
+            if logger is not None:
+                logger.error(f"保存剖析结果失败: {str(e)}")
@@ -0,0 +1,120 @@
+"""页面就绪检测
+
+页面导航（domcontentloaded）之后，按策略等待页面“可用”再截图或提取内容，
+代替固定等待 networkidle：
+
+- ``networkidle``: 等待 500ms 内没有网络请求（原来的做法，广告和埋点请求多时常常等满超时）
+- ``selector``: 等待指定元素出现（如 downloadmips 的 ``.stackable-image-container img``）
+- ``layout``: 等待页面高度不再变化且没有布局偏移（layout shift）持续 ``LAYOUT_QUIET_MS``
+- ``images``: 等待首屏和非懒加载图片下载并解码完成
+- ``none``: 不等待
+
+所有策略都有超时，超时后继续处理（与原来的 networkidle 行为一致）。等待时间
+记入 ``ready`` 阶段；开启审计时在就绪后继续等待 networkidle，额外等待的时间记入
+``ready_audit`` 阶段，即该策略相对 networkidle 节省的时间。
+"""
+from typing import Optional
+
+READY_STRATEGIES = ['networkidle', 'selector', 'layout', 'images', 'none']
+
+# layout 策略：页面保持稳定多长时间（毫秒）视为就绪
+LAYOUT_QUIET_MS = 500
+
+# 高度不变且没有 layout-shift 持续 quiet 毫秒后返回 true，超时返回 false
+_LAYOUT_STABLE_JS = '''
+([quiet, timeout]) => new Promise(resolve => {
+    const start = performance.now();
+    let last = start;
+    let height = document.documentElement.scrollHeight;
+    let observer = null;
+    try {
+        observer = new PerformanceObserver(list => {
+            if (list.getEntries().length) last = performance.now();
+        });
+        observer.observe({type: 'layout-shift'});
+    } catch (e) {}
+    const timer = setInterval(() => {
+        const now = performance.now();
+        const current = document.documentElement.scrollHeight;
+        if (current !== height) { height = current; last = now; }
+        const stable = now - last >= quiet;
+        if (stable || now - start >= timeout) {
+            clearInterval(timer);
+            if (observer) observer.disconnect();
+            resolve(stable);
+        }
+    }, 50);
+})
+'''
+
+# 首屏图片和非懒加载图片全部加载并解码后返回 true，超时返回 false
+_IMAGES_DECODED_JS = '''
+(timeout) => {
+    const pending = Array.from(document.images).filter(img =>
+        !(img.loading === 'lazy'
+          && img.getBoundingClientRect().top > window.innerHeight)
+    ).map(img => img.complete
+        ? (img.decode ? img.decode().catch(() => {}) : null)
+        : new Promise(done => {
+            img.addEventListener('load', done, {once: true});
+            img.addEventListener('error', done, {once: true});
+        }));
+    return Promise.race([
+        Promise.all(pending).then(() => true),
+        new Promise(done => setTimeout(() => done(false), timeout)),
+    ]);
+}
+'''
+
+
+async def wait_until_ready(
+    task,
+    page,
+    strategy: str,
+    timeout: int,
+    selector: Optional[str] = None,
+    audit: bool = False
+) -> bool:
+    """按策略等待页面就绪，返回是否在超时前就绪
+
+    Args:
+        task: 当前任务的 TaskContext（记录阶段耗时和日志）
+        page: Playwright 页面
+        strategy: 就绪策略（READY_STRATEGIES 之一）
+        timeout: 最长等待时间（毫秒）
+        selector: selector 策略等待的元素
+        audit: 就绪后继续等待 networkidle，记录节省的时间
+    """
+    if strategy == 'none':
+        return True
+
+    ready = True
+    try:
+        with task.phase('ready'):
+            if strategy == 'networkidle':
+                await page.wait_for_load_state('networkidle', timeout=timeout)
+            elif strategy == 'selector':
+                await page.wait_for_selector(
+                    selector, state='attached', timeout=timeout)
+            elif strategy == 'layout':
+                ready = await page.evaluate(
+                    _LAYOUT_STABLE_JS, [LAYOUT_QUIET_MS, timeout])
+            elif strategy == 'images':
+                ready = await page.evaluate(_IMAGES_DECODED_JS, timeout)
+            else:
+                raise ValueError(f"未知的就绪策略: {strategy}")
+    except ValueError:
+        raise
+    except Exception:
+        ready = False
+    if not ready:
+        # 超时不影响后续处理，继续执行
+        task.logger.debug(f"[{task.index}] 就绪等待（{strategy}）超时，继续处理")
+
+    if audit and strategy != 'networkidle':
+        try:
+            with task.phase('ready_audit'):
+                await page.wait_for_load_state('networkidle', timeout=timeout)
+        except Exception:
+            pass
+    return bool(ready)
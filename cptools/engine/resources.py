@@ -0,0 +1,85 @@
+"""进程资源读取（Linux 下通过 /proc，其它平台返回 None）"""
+import os
+from typing import Dict, Iterable, List, Optional
+
+
+def process_rss(pid: Optional[int] = None) -> Optional[int]:
+    """返回进程当前的常驻内存（字节），无法读取时返回 None"""
+    path = f"/proc/{pid or os.getpid()}/status"
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def process_pss(pid: Optional[int] = None) -> Optional[int]:
+    """返回进程的比例集内存（PSS，字节）：共享页按共享的进程数分摊
+
+    多个 Chromium 进程共享大量内存页，RSS 直接相加会重复计算；内核不支持
+    smaps_rollup 时退回 RSS。
+    """
+    path = f"/proc/{pid or os.getpid()}/smaps_rollup"
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return process_rss(pid)
+    return process_rss(pid)
+
+
+def child_pids(
+    pid: Optional[int] = None,
+    exclude: Iterable[int] = ()
+) -> List[int]:
+    """返回进程的所有子孙进程（如 Playwright 驱动和 Chromium 进程）
+
+    exclude 中的进程及其子孙不计入。
+    """
+    excluded = set(exclude)
+    root = pid or os.getpid()
+    parents: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding='utf-8') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名可能包含空格，ppid 在最后一个 ')' 之后的第二个字段
+        fields = stat.rsplit(')', 1)[-1].split()
+        if len(fields) > 1:
+            parents.setdefault(int(fields[1]), []).append(int(entry))
+
+    found = []
+    stack = [root]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            if child in excluded:
+                continue
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def children_rss(
+    pid: Optional[int] = None,
+    exclude: Iterable[int] = ()
+) -> int:
+    """所有子孙进程的常驻内存之和（字节）"""
+    return sum(process_rss(child) or 0 for child in child_pids(pid, exclude))
+
+
+def tree_pss(pid: int) -> int:
+    """进程及其所有子孙进程的 PSS 之和（字节），进程不存在时为 0"""
+    return sum(process_pss(p) or 0 for p in [pid] + child_pids(pid))
@@ -0,0 +1,100 @@
+"""重试策略：指数退避 + 抖动，以及失败原因分类"""
+import asyncio
+import random
+from typing import Optional
+
+
+# 可重试的HTTP状态码（限流和网关类错误）
+RETRYABLE_STATUS = frozenset({429, 502, 503, 504})
+
+# 永久失败的HTTP状态码（重试没有意义）
+PERMANENT_STATUS = frozenset({404, 410})
+
+# 可重试的异常信息特征（不区分大小写）
+RETRYABLE_ERROR_MARKERS = (
+    'timeout',
+    'timed out',
+    'net::err_connection_reset',
+    'net::err_connection_closed',
+    'net::err_connection_refused',
+    'net::err_connection_timed_out',
+    'net::err_timed_out',
+    'net::err_empty_response',
+    'net::err_network_changed',
+    'net::err_http2_protocol_error',
+    'connection reset',
+    'connection refused',
+    'server disconnected',
+)
+
+# 可重试的异常类型
+RETRYABLE_EXCEPTIONS = (
+    asyncio.TimeoutError,
+    ConnectionError,
+)
+
+
+class RetryPolicy:
+    """重试策略
+
+    Args:
+        retries: 失败后最多重试的次数（0 表示不重试）
+        backoff: 第一次重试前的基础等待时间（秒），之后每次翻倍
+        max_backoff: 单次等待时间上限（秒）
+        jitter: 抖动比例，实际等待时间在 [d*(1-jitter), d] 之间随机
+    """
+
+    def __init__(
+        self,
+        retries: int = 2,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        jitter: float = 0.5
+    ):
+        self.retries = max(0, retries)
+        self.backoff = max(0.0, backoff)
+        self.max_backoff = max_backoff
+        self.jitter = min(max(jitter, 0.0), 1.0)
+
+    @property
+    def max_attempts(self) -> int:
+        return self.retries + 1
+
+    def is_retryable(
+        self,
+        status_code: Optional[int] = None,
+        error: str = '',
+        exc: Optional[BaseException] = None,
+        retryable: Optional[bool] = None
+    ) -> bool:
+        """判断一次失败是否值得重试
+
+        处理器明确给出 retryable 时以它为准（如来自缓存的结果，重试也不会访问
+        网络）。否则 HTTP 状态码优先：404/410 永久失败，429/502/503/504 可重试；
+        没有状态码时根据异常类型和错误信息判断是否为超时或连接类错误。
+        """
+        if retryable is not None:
+            return retryable
+        if status_code in PERMANENT_STATUS:
+            return False
+        if status_code in RETRYABLE_STATUS:
+            return True
+        if status_code:
+            return False
+        if exc is not None and isinstance(exc, RETRYABLE_EXCEPTIONS):
+            return True
+        message = (error or '').lower()
+        return any(marker in message for marker in RETRYABLE_ERROR_MARKERS)
+
+    def should_retry(self, attempt: int, **failure) -> bool:
+        """第 attempt 次尝试失败后是否还要重试"""
+        return attempt < self.max_attempts and self.is_retryable(**failure)
+
+    def delay(self, attempt: int) -> float:
+        """第 attempt 次尝试失败后的等待时间（秒）"""
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+        return delay * random.uniform(1.0 - self.jitter, 1.0)
+
+
+# 不重试的策略
+NO_RETRY = RetryPolicy(retries=0)
@@ -0,0 +1,395 @@
+"""任务调度引擎
+
+输入项通过有界队列边读边投递，固定数量的 worker 并发消费。每条输入交给
+处理器（TaskHandler）处理，异常统一转换成失败结果，结果依次写入各个输出。
+可重试的失败在退避等待后重新排到队列末尾，等待期间不占用 worker。
+后台服务可以临时降低同时执行的任务数，或暂停接收新任务、等待进行中的任务
+结束（如内存监控重启浏览器前）。指定 host_limit 时同一主机同时执行的任务数
+不超过该值，其他主机的任务照常执行（输入按主机交错排列时效果最好）。
+"""
+import asyncio
+import time
+from typing import AsyncIterable, Dict, Iterable, List, Optional, Tuple, Union
+
+from cptools.engine.breaker import (
+    HostBreakers, MAX_DEFERRALS, MODE_DEFER, breaker_error
+)
+from cptools.engine.browser import BrowserManager
+from cptools.engine.handler import TaskContext, TaskHandler
+from cptools.engine.http import HttpPool
+from cptools.engine.metrics import RunMetrics
+from cptools.engine.profiling import LoopLagMonitor
+from cptools.engine.retry import NO_RETRY, RetryPolicy
+from cptools.engine.services import RunService
+from cptools.engine.sinks import ListSink, ResultSink, RunResults
+from cptools.engine.timings import format_timing_lines
+
+
+class Engine:
+    """通用任务引擎
+
+    Args:
+        handler: 单条任务处理器
+        concurrency: 并发 worker 数量
+        logger: 日志记录器
+        timeout: 页面默认超时时间（毫秒）
+        sinks: 额外的结果输出（内存收集始终启用）
+        retry_policy: 重试策略（默认不重试）
+        breakers: 按主机的熔断器（默认不熔断）
+        services: 运行期间的后台服务（如指标端点）
+        delay_scale: 处理器随机延迟的缩放系数（基准测试时为 0）
+        host_limit: 同一主机同时执行的最大任务数（0 表示不限制）
+        http: 运行共用的HTTP连接池（默认按默认参数创建）
+    """
+
+    def __init__(
+        self,
+        handler: TaskHandler,
+        concurrency: int,
+        logger,
+        timeout: int = 30000,
+        sinks: Optional[List[ResultSink]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        breakers: Optional[HostBreakers] = None,
+        services: Optional[List[RunService]] = None,
+        delay_scale: float = 1.0,
+        host_limit: int = 0,
+        http: Optional[HttpPool] = None
+    ):
+        self.handler = handler
+        self.retry_policy = retry_policy or NO_RETRY
+        self.breakers = breakers or HostBreakers(0, 0)
+        self.concurrency = max(1, concurrency)
+        # 当前允许同时执行的任务数（内存监控可临时降低）
+        self.concurrency_limit = self.concurrency
+        self.logger = logger
+        self.metrics = RunMetrics()
+        self.collector = ListSink()
+        self.sinks: List[ResultSink] = [self.collector] + list(sinks or [])
+        # 事件循环延迟监控始终启用（开销很小），结果写入运行汇总
+        self.loop_lag = LoopLagMonitor()
+        self.services: List[RunService] = [self.loop_lag] + list(services or [])
+        self.delay_scale = delay_scale
+        self.host_limit = max(0, host_limit)
+        self._host_in_flight: Dict[str, int] = {}
+        self.browser = (
+            BrowserManager(logger, timeout) if handler.uses_browser else None
+        )
+        self.http = http or HttpPool()
+        handler.http = self.http
+        # 任务总数：输入为列表时运行开始即可知道，流式输入读完后才确定
+        self.total: Optional[int] = None
+        # 已投递但尚未产出最终结果的任务数（包括等待重试的任务）
+        self._pending = 0
+        self._input_done = False
+        self._all_done: Optional[asyncio.Event] = None
+        self._gate: Optional[asyncio.Condition] = None
+        self._draining = False
+        self._retry_tasks = set()
+        self._deferrals: Dict[int, int] = {}
+        # 主机 -> 等待半开探测结果的任务 (item, attempt)
+        self._probe_waiters: Dict[str, List[Tuple[Dict, int]]] = {}
+
+    async def run(
+        self,
+        items: Union[AsyncIterable[Dict], Iterable[Dict]]
+    ) -> RunResults:
+        """执行全部任务，返回按输入顺序排列的结果（附带 summary 运行汇总）"""
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        self._all_done = asyncio.Event()
+        self._gate = asyncio.Condition()
+        self.metrics.start()
+        self.total = len(items) if hasattr(items, '__len__') else None
+        started_services = []
+        workers = []
+        try:
+            for service in self.services:
+                await service.start(self)
+                started_services.append(service)
+            await self.handler.setup()
+            workers = [
+                asyncio.ensure_future(self._work(queue))
+                for _ in range(self.concurrency)
+            ]
+            await self._produce(items, queue)
+            self._input_done = True
+            self.total = self.metrics.submitted
+            self._check_done()
+            # 等待所有任务（包括等待重试的任务）产出最终结果
+            await self._all_done.wait()
+        finally:
+            for task in list(self._retry_tasks) + workers:
+                task.cancel()
+            await asyncio.gather(
+                *self._retry_tasks, *workers, return_exceptions=True)
+            await self.handler.teardown()
+            if self.browser is not None:
+                await self.browser.close()
+            for sink in self.sinks:
+                try:
+                    sink.close()
+                except Exception as e:
+                    self.logger.error(f"关闭结果输出失败: {str(e)}")
+            self.metrics.finish()
+            for service in reversed(started_services):
+                try:
+                    await service.stop()
+                except Exception as e:
+                    self.logger.error(
+                        f"停止{service.name}失败: {str(e)}")
+            # 通知服务停止时还会发送结束通知，连接池最后关闭
+            await self.http.close()
+
+        summary = self.summary()
+        self.logger.info(
+            f"任务引擎: 完成 {summary['completed']} 条，"
+            f"耗时 {summary['elapsed_seconds']:.2f} 秒，"
+            f"吞吐 {summary['items_per_second']} 条/秒，"
+            f"最大并发 {summary['max_in_flight']}，"
+            f"重试 {summary['retried']} 次，"
+            f"事件循环延迟 p99 {summary['loop_lag']['p99_ms']} 毫秒")
+        breaker = summary['breaker']
+        if breaker['events']:
+            self.logger.info(
+                f"熔断: 状态变化 {len(breaker['events'])} 次，"
+                f"跳过/延后 {breaker['short_circuited']} 次，"
+                f"结束时仍未恢复的主机: "
+                f"{', '.join(breaker['open_hosts']) or '无'}")
+        http = summary['http']
+        if http['requests']:
+            self.logger.info(
+                f"连接池: 请求 {http['requests']} 次，"
+                f"复用连接 {http['pool_hits']} 次，新建连接 {http['pool_misses']} 次"
+                f"（握手 p50 {http['handshake_p50_ms']} 毫秒），"
+                f"等待空闲连接 {http['queued']} 次，"
+                f"DNS 缓存命中 {http['dns_hits']} / 未命中 {http['dns_misses']}")
+        for line in format_timing_lines(summary['timings']):
+            self.logger.info(line)
+        results = self.collector.results()
+        results.summary = summary
+        return results
+
+    def summary(self) -> Dict:
+        """引擎运行汇总"""
+        summary = self.metrics.summary()
+        summary['breaker'] = self.breakers.summary()
+        summary['http'] = self.http.summary()
+        for service in self.services:
+            if service.summary_key:
+                summary[service.summary_key] = service.summary()
+        return summary
+
+    async def set_concurrency_limit(self, limit: int):
+        """调整允许同时执行的任务数（1 到 concurrency 之间）
+
+        降低时不打断进行中的任务，只是在它们结束前不再开始新任务。
+        """
+        self.concurrency_limit = min(self.concurrency, max(1, limit))
+        async with self._gate:
+            self._gate.notify_all()
+
+    async def drain(self):
+        """暂停开始新任务，等待进行中的任务全部结束（之后需调用 resume）"""
+        self._draining = True
+        async with self._gate:
+            await self._gate.wait_for(lambda: self.metrics.in_flight == 0)
+
+    async def resume(self):
+        """drain 之后恢复开始新任务"""
+        self._draining = False
+        async with self._gate:
+            self._gate.notify_all()
+
+    def _can_start(self, host: str) -> bool:
+        return (not self._draining
+                and self.metrics.in_flight < self.concurrency_limit
+                and (not self.host_limit
+                     or self._host_in_flight.get(host, 0) < self.host_limit))
+
+    async def _admit(self, host: str):
+        """等待可以开始新任务：未暂停、执行中的任务数低于当前上限，
+        且该主机执行中的任务数低于 host_limit"""
+        if not self._can_start(host):
+            async with self._gate:
+                await self._gate.wait_for(lambda: self._can_start(host))
+        self._host_in_flight[host] = self._host_in_flight.get(host, 0) + 1
+
+    async def _release(self, host: str):
+        """任务结束，唤醒等待开始的 worker 和 drain"""
+        self._host_in_flight[host] -= 1
+        if (self._draining or self.host_limit
+                or self.concurrency_limit < self.concurrency):
+            async with self._gate:
+                self._gate.notify_all()
+
+    async def _produce(self, items, queue: asyncio.Queue):
+        """从输入源读取任务并投递到队列"""
+        try:
+            if hasattr(items, '__aiter__'):
+                async for item in items:
+                    await self._submit(item, queue)
+            else:
+                for item in items:
+                    await self._submit(item, queue)
+        except Exception as e:
+            self.logger.error(f"读取输入源失败: {str(e)}")
+
+    async def _submit(self, item: Dict, queue: asyncio.Queue):
+        self.metrics.submitted += 1
+        self._pending += 1
+        await queue.put((item, 1))
+
+    def _check_done(self):
+        if self._input_done and self._pending == 0:
+            self._all_done.set()
+
+    async def _work(self, queue: asyncio.Queue):
+        """worker：循环从队列取任务执行"""
+        while True:
+            item, attempt = await queue.get()
+            try:
+                await self._run_item(item, attempt, queue)
+            except Exception as e:
+                self.logger.error(f"任务调度异常: {str(e)}")
+                self._finish(item, self.handler.failure_result(item, str(e)),
+                             attempt)
+
+    async def _run_item(self, item: Dict, attempt: int, queue: asyncio.Queue):
+        """执行单条任务，异常转换为失败结果，可重试的失败重新排队"""
+        handler = self.handler
+        host = handler.host_of(item)
+        if not self.breakers.allow(host):
+            self._short_circuit(item, attempt, host, queue)
+            return
+
+        await self._admit(host)
+        task = TaskContext(item, self.browser, self.logger, attempt=attempt,
+                           delay_scale=self.delay_scale)
+        self.metrics.task_started()
+        started = time.monotonic()
+        exc = None
+        try:
+            result = await handler.process(task)
+        except Exception as e:
+            exc = e
+            result = handler.failure_result(
+                item, str(e) or e.__class__.__name__)
+        success = handler.is_success(result)
+        elapsed = time.monotonic() - started
+        self.metrics.task_finished(elapsed)
+        await self._release(host)
+        self.metrics.bytes_downloaded += task.bytes
+        task.record('total', elapsed)
+        result['timings'] = {
+            phase: round(seconds, 3) for phase, seconds in task.timings.items()
+        }
+
+        failure = handler.failure_info(result)
+        # 404等永久失败说明主机有正常响应，只有超时、连接错误和5xx计入熔断；
+        # 没有访问网络的结果（如缓存）不反映主机状态
+        if exc is not None or handler.touched_network(result):
+            self.breakers.record(host, success or not self.retry_policy.is_retryable(
+                exc=exc, **failure))
+        else:
+            self.breakers.release(host)
+        self._wake_probe_waiters(host, queue)
+
+        if not success:
+            if self.retry_policy.should_retry(attempt, exc=exc, **failure):
+                delay = self.retry_policy.delay(attempt)
+                self.logger.warning(
+                    f"[{task.index}] {handler.action}第 {attempt} 次失败，"
+                    f"{delay:.1f} 秒后重试: {handler.describe(item)} - "
+                    f"{failure['error'] or failure['status_code']}")
+                self._schedule_retry(item, attempt + 1, delay, queue)
+                return
+            if exc is not None:
+                self.logger.error(
+                    f"[{task.index}] {handler.action}失败: "
+                    f"{handler.describe(item)} - {failure['error']}")
+
+        self._finish(item, result, attempt)
+
+    def _short_circuit(
+        self,
+        item: Dict,
+        attempt: int,
+        host: str,
+        queue: asyncio.Queue
+    ):
+        """主机熔断中：延后任务，或直接产出失败结果"""
+        if (self.breakers.mode == MODE_DEFER
+                and self.breakers.probe_in_flight(host)):
+            # 探测进行中：等探测结果记录后再处理，不计入延后次数
+            self.logger.debug(
+                f"[{item.get('index')}] 主机 {host} 正在探测恢复，等待探测结果")
+            self._probe_waiters.setdefault(host, []).append((item, attempt))
+            return
+
+        key = id(item)
+        deferrals = self._deferrals.get(key, 0)
+        if (self.breakers.mode == MODE_DEFER
+                and deferrals < MAX_DEFERRALS):
+            self._deferrals[key] = deferrals + 1
+            delay = self.breakers.retry_after(host)
+            self.logger.debug(
+                f"[{item.get('index')}] 主机 {host} 熔断中，"
+                f"{delay:.1f} 秒后再处理")
+            self._requeue_later(item, attempt, delay, queue)
+            return
+
+        error = breaker_error(host)
+        self.logger.warning(
+            f"[{item.get('index')}] {self.handler.action}失败: "
+            f"{self.handler.describe(item)} - {error}")
+        self._finish(item, self.handler.failure_result(item, error), attempt)
+
+    def _wake_probe_waiters(self, host: str, queue: asyncio.Queue):
+        """主机有了新的访问结果（如探测结束），等待探测的任务重新排队"""
+        for item, attempt in self._probe_waiters.pop(host, []):
+            self._requeue_later(item, attempt, 0, queue)
+
+    def _schedule_retry(
+        self,
+        item: Dict,
+        attempt: int,
+        delay: float,
+        queue: asyncio.Queue
+    ):
+        """退避等待后把任务重新放到队列末尾（等待期间不占用 worker）"""
+        self.metrics.retried += 1
+        self._requeue_later(item, attempt, delay, queue)
+
+    def _requeue_later(
+        self,
+        item: Dict,
+        attempt: int,
+        delay: float,
+        queue: asyncio.Queue
+    ):
+        async def requeue():
+            await asyncio.sleep(delay)
+            await queue.put((item, attempt))
+
+        retry_task = asyncio.ensure_future(requeue())
+        self._retry_tasks.add(retry_task)
+        retry_task.add_done_callback(self._retry_tasks.discard)
+
+    def _finish(self, item: Dict, result: Dict, attempt: int):
+        """产出最终结果"""
+        self._deferrals.pop(id(item), None)
+        result['attempts'] = attempt
+        self.metrics.item_finished(
+            self.handler.is_success(result), result.get('status_code'))
+        self.metrics.timings.add(
+            self.handler.host_of(item), result.get('timings'))
+        self._emit(item, result)
+        self._pending -= 1
+        self._check_done()
+
+    def _emit(self, item: Dict, result: Dict):
+        for sink in self.sinks:
+            try:
+                sink.add(item, result)
+            except Exception as e:
+                self.logger.error(f"写入结果失败: {str(e)}")
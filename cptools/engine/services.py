@@ -0,0 +1,24 @@
+"""运行期间的后台服务
+
+服务在引擎启动 worker 之前 ``start``，在所有任务结束、浏览器关闭之后 ``stop``，
+与任务运行在同一个事件循环中（如指标端点、实时报告、内存监控）。
+"""
+
+
+class RunService:
+    """后台服务基类"""
+
+    # 日志中使用的服务名称
+    name = '服务'
+    # 非空时 ``summary()`` 的返回值以此为键写入引擎运行汇总
+    summary_key = None
+
+    async def start(self, engine):
+        """引擎开始运行时调用，engine 为当前的 Engine 实例"""
+
+    async def stop(self):
+        """引擎运行结束时调用（即使运行中出现异常）"""
+
+    def summary(self):
+        """写入运行汇总的可序列化统计（需设置 summary_key）"""
+        return None
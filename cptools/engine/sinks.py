@@ -0,0 +1,137 @@
+"""任务结果输出"""
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+# JSONL 结果文件的格式版本
+JSONL_VERSION = 1
+
+
+class RunResults(list):
+    """按输入顺序排列的结果列表，附带引擎运行汇总（summary）"""
+
+    def __init__(self, results=(), summary: Optional[Dict] = None):
+        super().__init__(results)
+        self.summary = summary or {}
+
+
+class ResultSink:
+    """结果输出基类：每完成一条任务调用一次 ``add``"""
+
+    def add(self, item: Dict, result: Dict):
+        raise NotImplementedError
+
+    def close(self):
+        """运行结束时调用"""
+
+
+class ListSink(ResultSink):
+    """在内存中收集结果，按输入顺序返回"""
+
+    def __init__(self):
+        self._results = []
+
+    def add(self, item: Dict, result: Dict):
+        self._results.append((item.get('index', 0), result))
+
+    def results(self) -> RunResults:
+        self._results.sort(key=lambda pair: pair[0])
+        return RunResults(result for _, result in self._results)
+
+
+class JsonlSink(ResultSink):
+    """把每条最终结果追加写入 JSONL 文件，运行中途崩溃也不会丢失已完成的结果
+
+    第一行是运行信息（type=run，包含命令名），之后每行一条结果
+    （type=result）。写入经过缓冲，每 ``fsync_every`` 条或每
+    ``fsync_interval`` 秒刷新并 fsync 一次，结束时再 fsync 一次。
+
+    Args:
+        path: 输出文件路径
+        command: 命令名（url404 / screenshot / downloadmips），用于重建报告
+        fsync_every: 每多少条结果 fsync 一次
+        fsync_interval: 距离上次 fsync 超过多少秒时 fsync
+    """
+
+    def __init__(
+        self,
+        path: str,
+        command: str,
+        fsync_every: int = 100,
+        fsync_interval: float = 2.0
+    ):
+        self.path = Path(path)
+        self.command = command
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        self._write({
+            'type': 'run',
+            'version': JSONL_VERSION,
+            'command': command,
+            'started_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        self._sync()
+
+    def _write(self, record: Dict):
+        self._file.write(
+            json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def add(self, item: Dict, result: Dict):
+        self._write({
+            'type': 'result',
+            'index': item.get('index', 0),
+            'result': result,
+        })
+        self._unsynced += 1
+        if (self._unsynced >= self.fsync_every
+                or time.monotonic() - self._synced_at >= self.fsync_interval):
+            self._sync()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._sync()
+        self._file.close()
+
+
+def read_jsonl_results(path: str, logger=None) -> Tuple[Dict, RunResults]:
+    """读取 JSONL 结果文件，返回 (运行信息, 按输入顺序排列的结果)
+
+    同一序号出现多次时以最后一条为准；末尾不完整的行（运行中途崩溃）会被跳过。
+    """
+    run_info: Dict = {}
+    by_index: Dict[int, Dict] = {}
+    for lineno, record in _iter_jsonl(path, logger):
+        kind = record.get('type')
+        if kind == 'run' and not run_info:
+            run_info = record
+        elif kind == 'result' and isinstance(record.get('result'), dict):
+            by_index[record.get('index', lineno)] = record['result']
+    return run_info, RunResults(
+        result for _, result in sorted(by_index.items()))
+
+
+def _iter_jsonl(path: str, logger=None) -> Iterator[Tuple[int, Dict]]:
+    with open(path, encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield lineno, json.loads(line)
+            except ValueError:
+                if logger is not None:
+                    logger.warning(f"跳过无法解析的第 {lineno} 行: {path}")
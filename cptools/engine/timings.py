@@ -0,0 +1,155 @@
+"""分阶段耗时统计
+
+处理器在 ``TaskContext.phase(name)`` 中执行各阶段，单条任务的各阶段耗时写入结果的
+``timings`` 字段（秒）；这里把多条结果的耗时汇总成每个阶段、每个主机的
+p50/p90/p99 分位数，供日志汇总和HTML报告使用。
+"""
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional
+
+from cptools.engine.breaker import host_of
+
+# 阶段的显示顺序，未列出的阶段按名称排在后面
+PHASE_ORDER = [
+    'delay',
+    'revalidate',
+    'new_context',
+    'html',
+    'goto',
+    'networkidle',
+    'ready',
+    'ready_audit',
+    'selector',
+    'fetch',
+    'convert',
+    'screenshot',
+    'write',
+    'cache',
+    'total',
+]
+
+PHASE_LABELS = {
+    'delay': '随机延迟',
+    'revalidate': '条件请求',
+    'new_context': '创建上下文',
+    'html': '获取页面HTML',
+    'goto': '页面导航',
+    'networkidle': '等待网络空闲',
+    'ready': '就绪等待',
+    'ready_audit': '比networkidle节省',
+    'selector': '等待元素',
+    'fetch': '下载图片',
+    'convert': '图片转换',
+    'screenshot': '截图编码',
+    'write': '写入磁盘',
+    'cache': '写入缓存',
+    'total': '单条合计',
+}
+
+PERCENTILES = (50, 90, 99)
+
+# 直方图桶上限（秒），供指标端点输出
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法计算分位数（values 需已排序）"""
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * q // 100))
+    return values[int(rank) - 1]
+
+
+def phase_sort_key(phase: str):
+    if phase in PHASE_ORDER:
+        return (PHASE_ORDER.index(phase), phase)
+    return (len(PHASE_ORDER), phase)
+
+
+class PhaseTimings:
+    """按阶段、按主机收集耗时样本，同时维护累计直方图"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.host_samples: Dict[str, Dict[str, List[float]]] = {}
+        # 阶段 -> 每个桶的计数（与 HISTOGRAM_BUCKETS 对应，最后一个为 +Inf）
+        self.buckets: Dict[str, List[int]] = {}
+
+    def add(self, host: str, timings: Optional[Dict[str, float]]):
+        if not timings:
+            return
+        per_host = self.host_samples.setdefault(host or '-', {})
+        for phase, seconds in timings.items():
+            self.samples.setdefault(phase, []).append(seconds)
+            per_host.setdefault(phase, []).append(seconds)
+            counts = self.buckets.setdefault(
+                phase, [0] * (len(HISTOGRAM_BUCKETS) + 1))
+            counts[bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+
+    def histograms(self) -> Dict[str, Dict]:
+        """{阶段: {'buckets': [(上限, 累计次数), ...], 'count', 'sum'}}"""
+        histograms = {}
+        for phase in sorted(self.buckets, key=phase_sort_key):
+            cumulative = list(accumulate(self.buckets[phase]))
+            bounds = list(HISTOGRAM_BUCKETS) + [float('inf')]
+            histograms[phase] = {
+                'buckets': list(zip(bounds, cumulative)),
+                'count': cumulative[-1],
+                'sum': sum(self.samples[phase]),
+            }
+        return histograms
+
+    @staticmethod
+    def _stats(samples: Dict[str, List[float]]) -> Dict[str, Dict]:
+        stats = {}
+        for phase in sorted(samples, key=phase_sort_key):
+            values = sorted(samples[phase])
+            entry = {'count': len(values)}
+            for q in PERCENTILES:
+                entry[f'p{q}'] = round(percentile(values, q), 3)
+            entry['max'] = round(values[-1], 3)
+            entry['sum'] = round(sum(values), 3)
+            stats[phase] = entry
+        return stats
+
+    def summary(self) -> Dict:
+        """{'phases': {阶段: 统计}, 'hosts': {主机: {阶段: 统计}}}"""
+        return {
+            'phases': self._stats(self.samples),
+            'hosts': {
+                host: self._stats(samples)
+                for host, samples in sorted(self.host_samples.items())
+            },
+        }
+
+
+def summarize_timings(results: Iterable[Dict]) -> Dict:
+    """根据结果中的 ``timings`` 字段汇总分阶段耗时（主机取自结果的 url）"""
+    collector = PhaseTimings()
+    for result in results:
+        collector.add(host_of(result.get('url')), result.get('timings'))
+    return collector.summary()
+
+
+def format_timing_lines(summary: Dict) -> List[str]:
+    """把耗时汇总格式化成日志行，多个主机时再按主机分别输出"""
+    phases = summary.get('phases') or {}
+    if not phases:
+        return []
+
+    def table(stats: Dict[str, Dict], indent: str = '  ') -> List[str]:
+        return [
+            f"{indent}{PHASE_LABELS.get(phase, phase)}({phase}): "
+            f"p50 {s['p50']:.3f}s  p90 {s['p90']:.3f}s  "
+            f"p99 {s['p99']:.3f}s  max {s['max']:.3f}s  n={s['count']}"
+            for phase, s in stats.items()
+        ]
+
+    lines = ["分阶段耗时:"] + table(phases)
+    hosts = summary.get('hosts') or {}
+    if len(hosts) > 1:
+        for host, stats in hosts.items():
+            lines.append(f"  主机 {host}:")
+            lines.extend(table(stats, indent='    '))
+    return lines
@@ -0,0 +1,235 @@
+"""内存监控：浏览器或 Python 内存超过上限时重启浏览器或临时降低并发"""
+import asyncio
+import gc
+import time
+from typing import Dict, List, Optional, Tuple
+
+from cptools.engine.resources import children_rss, process_rss, tree_pss
+from cptools.engine.services import RunService
+
+ACTION_RECYCLE = 'recycle'
+ACTION_THROTTLE = 'throttle'
+MEMORY_ACTIONS = [ACTION_RECYCLE, ACTION_THROTTLE]
+
+# 采样间隔（秒）
+CHECK_INTERVAL = 5.0
+# 两次重启浏览器的最小间隔（秒）；间隔内再次超限时改为降低并发
+RECYCLE_MIN_INTERVAL = 30.0
+# 内存降到上限的这个比例以下时逐步恢复并发
+RESTORE_RATIO = 0.8
+
+MB = 1024 * 1024
+
+
+def _mb(value: Optional[int]) -> str:
+    return '未知' if value is None else f"{value / MB:.0f} MB"
+
+
+class MemoryWatchdog(RunService):
+    """定期采样浏览器和 Python 进程的内存
+
+    浏览器内存只统计 Playwright 驱动进程及其子孙（Chromium），按 PSS 计算，
+    共享页不重复计入；图片处理进程池等其他子进程不计入，重启浏览器不会让它们
+    变小。取不到驱动进程的 PID 时（Playwright 内部结构变化）记录一次警告，
+    改为统计 Python 进程全部子孙进程的常驻内存（含其他子进程，偏大）。
+
+    浏览器内存超限时：
+
+    - ``recycle``：暂停开始新任务，等待进行中的页面结束，关闭浏览器，
+      下一条任务自动启动新浏览器；距上次重启不足 ``RECYCLE_MIN_INTERVAL``
+      秒时改为降低并发
+    - ``throttle``：把同时执行的任务数减半（最少 1）
+
+    Python 内存超限时重启浏览器没有帮助，只做垃圾回收并降低并发。
+    内存回落到上限的 ``RESTORE_RATIO`` 以下后，每次采样把并发恢复一倍。
+    每次处理都记录触发时的内存读数，写入日志和运行汇总。
+
+    Args:
+        browser_limit_mb: 浏览器内存上限（MB，0 为不限制）
+        python_limit_mb: Python 进程内存上限（MB，0 为不限制）
+        action: 浏览器内存超限时的处理方式
+        logger: 日志记录器
+        interval: 采样间隔（秒）
+    """
+
+    name = '内存监控'
+    summary_key = 'memory'
+
+    def __init__(
+        self,
+        browser_limit_mb: int,
+        python_limit_mb: int,
+        action: str,
+        logger,
+        interval: float = CHECK_INTERVAL
+    ):
+        self.browser_limit = browser_limit_mb * MB if browser_limit_mb > 0 else 0
+        self.python_limit = python_limit_mb * MB if python_limit_mb > 0 else 0
+        self.action = action
+        self.logger = logger
+        self.interval = interval
+        self.events: List[Dict] = []
+        self.peak_browser = 0
+        self.peak_python = 0
+        self._engine = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_recycle = float('-inf')
+        self._pid_warned = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.browser_limit or self.python_limit)
+
+    async def start(self, engine):
+        self._engine = engine
+        self._task = asyncio.ensure_future(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        recycles = sum(1 for e in self.events if e['action'] == ACTION_RECYCLE)
+        throttles = sum(1 for e in self.events if e['action'] == ACTION_THROTTLE)
+        if self.events:
+            self.logger.info(
+                f"内存监控: 重启浏览器 {recycles} 次，降低并发 {throttles} 次，"
+                f"浏览器内存峰值 {_mb(self.peak_browser)}，"
+                f"Python 内存峰值 {_mb(self.peak_python)}")
+
+    def summary(self) -> Dict:
+        return {
+            'peak_browser_rss_bytes': self.peak_browser,
+            'peak_python_rss_bytes': self.peak_python,
+            'concurrency_limit': (
+                self._engine.concurrency_limit if self._engine else None),
+            'events': list(self.events),
+        }
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            # 遍历 /proc 放到线程中，避免阻塞事件循环
+            browser_rss, python_rss = await loop.run_in_executor(
+                None, self._sample, *self._browser_target())
+            try:
+                await self._check(browser_rss, python_rss)
+            except Exception as e:
+                self.logger.error(f"内存监控处理失败: {str(e)}")
+
+    def _browser_target(self) -> Tuple[Optional[int], bool]:
+        """返回 (驱动进程PID, 是否改为统计全部子孙进程)"""
+        browser = self._engine.browser
+        if browser is None or not browser.running:
+            return None, False
+        driver_pid = browser.driver_pid
+        if driver_pid is None:
+            if not self._pid_warned:
+                self._pid_warned = True
+                self.logger.warning(
+                    "无法获取 Playwright 驱动进程的 PID，浏览器内存改为统计"
+                    "本进程全部子进程的常驻内存（含图片处理进程等，可能偏大）")
+            return None, True
+        return driver_pid, False
+
+    @staticmethod
+    def _sample(driver_pid: Optional[int], all_children: bool = False):
+        if driver_pid:
+            browser_rss = tree_pss(driver_pid)
+        elif all_children:
+            browser_rss = children_rss()
+        else:
+            browser_rss = 0
+        return browser_rss, process_rss()
+
+    async def _check(self, browser_rss: int, python_rss: Optional[int]):
+        engine = self._engine
+        self.peak_browser = max(self.peak_browser, browser_rss)
+        self.peak_python = max(self.peak_python, python_rss or 0)
+
+        browser_over = bool(self.browser_limit) and browser_rss > self.browser_limit
+        python_over = (bool(self.python_limit) and python_rss is not None
+                       and python_rss > self.python_limit)
+
+        if browser_over:
+            can_recycle = (
+                self.action == ACTION_RECYCLE
+                and engine.browser is not None and engine.browser.running
+                and time.monotonic() - self._last_recycle >= RECYCLE_MIN_INTERVAL)
+            if can_recycle:
+                await self._recycle(browser_rss, python_rss)
+            else:
+                await self._throttle('浏览器', browser_rss, python_rss)
+        elif python_over:
+            gc.collect()
+            await self._throttle('Python', browser_rss, python_rss)
+        elif engine.concurrency_limit < engine.concurrency and self._below_restore(
+                browser_rss, python_rss):
+            limit = min(engine.concurrency, engine.concurrency_limit * 2)
+            await engine.set_concurrency_limit(limit)
+            self.logger.info(
+                f"内存回落（浏览器 {_mb(browser_rss)}，Python {_mb(python_rss)}），"
+                f"并发恢复到 {limit}")
+
+    def _below_restore(self, browser_rss: int, python_rss: Optional[int]) -> bool:
+        if self.browser_limit and browser_rss > self.browser_limit * RESTORE_RATIO:
+            return False
+        if (self.python_limit and python_rss is not None
+                and python_rss > self.python_limit * RESTORE_RATIO):
+            return False
+        return True
+
+    async def _recycle(self, browser_rss: int, python_rss: Optional[int]):
+        engine = self._engine
+        self.logger.warning(
+            f"浏览器内存 {_mb(browser_rss)} 超过上限 {_mb(self.browser_limit)}"
+            f"（Python {_mb(python_rss)}），等待 {engine.metrics.in_flight} "
+            f"个进行中的任务结束后重启浏览器")
+        started = time.monotonic()
+        await engine.drain()
+        try:
+            await engine.browser.recycle()
+        finally:
+            await engine.resume()
+        self._last_recycle = time.monotonic()
+        # 新浏览器在下一条任务时才启动，此时驱动进程已退出
+        after, _ = await asyncio.get_running_loop().run_in_executor(
+            None, self._sample, *self._browser_target())
+        self._record(ACTION_RECYCLE, browser_rss, python_rss,
+                     browser_rss_after=after,
+                     pause_seconds=round(self._last_recycle - started, 3))
+        self.logger.warning(
+            f"浏览器已关闭，暂停 {self._last_recycle - started:.1f} 秒，"
+            f"子进程内存 {_mb(browser_rss)} → {_mb(after)}，下一条任务将启动新浏览器")
+
+    async def _throttle(self, source: str, browser_rss: int,
+                        python_rss: Optional[int]):
+        engine = self._engine
+        limit = max(1, engine.concurrency_limit // 2)
+        if limit == engine.concurrency_limit:
+            return
+        await engine.set_concurrency_limit(limit)
+        self._record(ACTION_THROTTLE, browser_rss, python_rss,
+                     source=source, concurrency_limit=limit)
+        self.logger.warning(
+            f"{source}内存超过上限（浏览器 {_mb(browser_rss)} / "
+            f"{_mb(self.browser_limit) if self.browser_limit else '不限'}，"
+            f"Python {_mb(python_rss)} / "
+            f"{_mb(self.python_limit) if self.python_limit else '不限'}），"
+            f"并发临时降到 {limit}")
+
+    def _record(self, action: str, browser_rss: int,
+                python_rss: Optional[int], **extra):
+        event = {
+            'action': action,
+            'completed': self._engine.metrics.completed,
+            'elapsed_seconds': round(self._engine.metrics.elapsed, 3),
+            'browser_rss_bytes': browser_rss,
+            'python_rss_bytes': python_rss,
+        }
+        event.update(extra)
+        self.events.append(event)
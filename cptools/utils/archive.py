@@ -0,0 +1,239 @@
+"""归档输出
+
+``--archive out.tar`` / ``out.zip`` 时截图和主图不再逐个写成小文件，而是在完成
+时依次追加到一个归档文件中，避免海量小文件拖慢 rsync 和备份。
+
+每写入一个条目就在 ``<归档>.index.jsonl`` 追加一行索引（条目名、数据偏移、大小、
+SHA-256），运行中断后已写入的条目仍可按索引直接读取；tar 中相同的图片写成硬链接
+条目，只存一份数据。结果中的路径记为 ``<归档路径>/<条目名>``，报告据此引用归档中的条目，
+由 ``cptools archive serve`` 提供访问，或用 ``cptools archive extract`` 解出。
+"""
+import hashlib
+import io
+import json
+import shutil
+import tarfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from cptools.utils.atomic_write import write_atomic
+
+ARCHIVE_SUFFIXES = ('.tar', '.zip')
+
+# 复制文件到归档时的块大小
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def index_path(archive_path: Path) -> Path:
+    """归档对应的索引文件路径"""
+    return archive_path.with_name(archive_path.name + '.index.jsonl')
+
+
+def archive_member(path) -> Optional[Tuple[Path, str]]:
+    """如果 path 指向归档中的条目（某一级父路径是归档文件），返回 (归档路径, 条目名)"""
+    path = Path(path)
+    for parent in path.parents:
+        if parent.suffix.lower() in ARCHIVE_SUFFIXES and parent.is_file():
+            return parent, path.relative_to(parent).as_posix()
+    return None
+
+
+class _HashingReader:
+    """读取时同时计算 SHA-256（复制进归档时顺便得到条目的哈希）"""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1) -> bytes:
+        data = self._fileobj.read(size)
+        self.digest.update(data)
+        return data
+
+
+class ArchiveWriter:
+    """追加写入 tar / zip 归档（线程安全，截图在线程池中写入）
+
+    Args:
+        path: 归档文件路径，按扩展名选择 tar 或 zip（zip 不压缩，图片本身已压缩）
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        suffix = self.path.suffix.lower()
+        if suffix not in ARCHIVE_SUFFIXES:
+            raise ValueError(
+                f"不支持的归档格式: {self.path.name}（支持: {', '.join(ARCHIVE_SUFFIXES)}）")
+        self.format = suffix[1:]
+        self.entries: Dict[str, Dict] = {}
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.format == 'tar':
+            self._tar = tarfile.open(self.path, 'w', format=tarfile.PAX_FORMAT)
+            self._zip = None
+        else:
+            self._tar = None
+            self._zip = zipfile.ZipFile(
+                self.path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+        self._index = open(index_path(self.path), 'w', encoding='utf-8')
+
+    def name_of(self, path) -> str:
+        """结果中的路径（<归档路径>/<条目名>）对应的条目名"""
+        return Path(path).relative_to(self.path).as_posix()
+
+    def exists(self, path) -> bool:
+        return self.name_of(path) in self.entries
+
+    def write(self, path, data: bytes) -> Dict:
+        """写入条目，path 为 <归档路径>/<条目名>，返回条目的索引信息"""
+        return self.add(self.name_of(path), data)
+
+    def add(self, name: str, data: bytes) -> Dict:
+        """追加一个条目"""
+        return self._add(name, len(data), io.BytesIO(data))
+
+    def add_file(self, name: str, source: Path) -> Dict:
+        """把磁盘上的文件流式复制为一个条目（如拼接好的长截图）"""
+        with open(source, 'rb') as f:
+            return self._add(name, source.stat().st_size, f)
+
+    def _add(self, name: str, size: int, fileobj) -> Dict:
+        fileobj = _HashingReader(fileobj)
+        with self._lock:
+            if self._tar is not None:
+                info = tarfile.TarInfo(name)
+                info.size = size
+                info.mtime = int(time.time())
+                self._tar.addfile(info, fileobj)
+                # 数据按 512 字节块对齐，写完后倒推数据起始位置
+                offset = self._tar.offset - (size + 511) // 512 * 512
+            else:
+                info = zipfile.ZipInfo(name, time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                with self._zip.open(info, 'w', force_zip64=True) as dest:
+                    shutil.copyfileobj(fileobj, dest, COPY_CHUNK_SIZE)
+                offset = info.header_offset
+            self.bytes_written += size
+            entry = {'name': name, 'offset': offset, 'size': size,
+                     'sha256': fileobj.digest.hexdigest()}
+            self._record(entry)
+        return entry
+
+    def link(self, original, path) -> bool:
+        """把 path 记为与 original 相同的条目（tar 硬链接，不重复存数据）
+
+        zip 不支持链接，返回 False，由调用方正常写入。
+        """
+        if self._tar is None:
+            return False
+        target = self.name_of(original)
+        name = self.name_of(path)
+        with self._lock:
+            entry = self.entries.get(target)
+            if entry is None or name == target:
+                return False
+            info = tarfile.TarInfo(name)
+            info.type = tarfile.LNKTYPE
+            info.linkname = target
+            info.mtime = int(time.time())
+            self._tar.addfile(info)
+            self._record(dict(entry, name=name, link=target))
+        return True
+
+    def _record(self, entry: Dict):
+        self.entries[entry['name']] = entry
+        self._index.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._index.flush()
+
+    def close(self):
+        """写入归档结尾（tar 结束块 / zip 中央目录）"""
+        with self._lock:
+            if self._tar is not None:
+                self._tar.close()
+            if self._zip is not None:
+                self._zip.close()
+            self._index.close()
+
+
+class ArchiveReader:
+    """按索引随机读取归档中的条目
+
+    有索引文件时直接按偏移读取（tar）；没有索引时扫描归档建立索引。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.format = self.path.suffix.lower()[1:]
+        self.entries: Dict[str, Dict] = {}
+        self._zip = zipfile.ZipFile(self.path) if self.format == 'zip' else None
+        self._file = open(self.path, 'rb') if self.format == 'tar' else None
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        index_file = index_path(self.path)
+        if index_file.exists():
+            with open(index_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 中断时最后一行可能不完整
+                        continue
+                    self.entries[entry['name']] = entry
+            return
+        if self._zip is not None:
+            for info in self._zip.infolist():
+                self.entries[info.filename] = {
+                    'name': info.filename, 'size': info.file_size}
+            return
+        with tarfile.open(self.path, 'r') as tar:
+            for info in tar:
+                if info.isfile():
+                    self.entries[info.name] = {
+                        'name': info.name, 'offset': info.offset_data,
+                        'size': info.size}
+                elif info.islnk() and info.linkname in self.entries:
+                    self.entries[info.name] = dict(
+                        self.entries[info.linkname], name=info.name,
+                        link=info.linkname)
+
+    def names(self) -> List[str]:
+        return list(self.entries)
+
+    def read(self, name: str) -> bytes:
+        """读取条目内容，不存在时抛出 KeyError"""
+        entry = self.entries[name]
+        if self._zip is not None:
+            return self._zip.read(entry.get('link', name))
+        with self._lock:
+            self._file.seek(entry['offset'])
+            return self._file.read(entry['size'])
+
+    def extract(self, names: Optional[List[str]], output_dir: Path) -> Iterator[Path]:
+        """解出指定条目（None 为全部），依次返回写出的路径"""
+        root = output_dir.resolve()
+        for name in names or self.names():
+            target = (output_dir / name).resolve()
+            # 防止条目名中的 .. 写到输出目录之外
+            if root not in target.parents:
+                raise ValueError(f"无效的条目名: {name}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(target, self.read(name))
+            yield target
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,191 @@
+"""原子写入和完整性清单
+
+截图和主图先写到同一目录下的临时文件，写完后用 ``os.replace`` 原子改名为目标
+文件：运行中断时目标路径上要么没有文件，要么是完整的文件，不会留下看起来正常的
+半个文件。
+
+fsync 按批进行（每 ``fsync_every`` 个文件或每 ``fsync_interval`` 秒，在后台线程中
+执行）：一批文件和所在目录 fsync 之后，才把它们的大小、SHA-256 和修改时间追加到
+输出目录下的 ``.manifest.jsonl``。清单中的文件都已落盘；续跑和缓存复用已有文件时
+只需比较文件大小和修改时间（``file_intact``），不必重新读取内容。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MANIFEST_NAME = '.manifest.jsonl'
+
+# 计算已有文件哈希时的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def write_atomic(path, data: bytes) -> Dict:
+    """写入同目录下的临时文件后原子改名，返回完整性信息（size / sha256 / mtime_ns）
+
+    不执行 fsync（由 ``AtomicWriter`` 批量执行），可以在子进程中调用。
+    """
+    path = Path(path)
+    tmp_path = path.with_name(
+        f".{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
+    return {
+        'size': len(data),
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'mtime_ns': os.stat(path).st_mtime_ns,
+    }
+
+
+def file_digest(path) -> Dict:
+    """读取已有文件，返回与 ``write_atomic`` 相同格式的完整性信息"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    stat = os.stat(path)
+    return {
+        'size': stat.st_size,
+        'sha256': digest.hexdigest(),
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+
+def file_intact(path, entry: Optional[Dict]) -> bool:
+    """文件的大小和修改时间与记录一致时可以直接信任（不读取内容）"""
+    if not entry or 'size' not in entry:
+        return False
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if stat.st_size != entry['size']:
+        return False
+    return 'mtime_ns' not in entry or stat.st_mtime_ns == entry['mtime_ns']
+
+
+def _fsync(path: Path, flags: int = os.O_RDONLY):
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class AtomicWriter:
+    """输出目录的原子写入器（线程安全），批量 fsync 并维护完整性清单
+
+    Args:
+        root: 输出目录，清单写在 ``root/.manifest.jsonl``
+        fsync_every: 每多少个文件 fsync 一次
+        fsync_interval: 距离上次 fsync 超过多少秒时 fsync
+    """
+
+    def __init__(self, root, fsync_every: int = 64, fsync_interval: float = 2.0):
+        self.root = Path(root)
+        self.manifest_path = self.root / MANIFEST_NAME
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.entries: Dict[str, Dict] = {}
+        self.files = 0
+        self.bytes_written = 0
+        self.syncs = 0
+        self._pending: List[Tuple[Path, Dict]] = []
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at = time.monotonic()
+        self._flush_scheduled = False
+        self._manifest = None
+        self._flusher = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='cptools-fsync')
+
+    def write(self, path, data: bytes) -> Dict:
+        """原子写入文件，返回完整性信息"""
+        entry = write_atomic(path, data)
+        self.record(path, entry)
+        return entry
+
+    def record(self, path, entry: Optional[Dict] = None) -> Dict:
+        """记录由其他途径写出的文件（子进程转换的图片、拼接的长截图、硬链接）
+
+        entry 为 None 时读取文件计算哈希。
+        """
+        path = Path(path)
+        if entry is None:
+            entry = file_digest(path)
+        with self._lock:
+            self.entries[str(path)] = entry
+            self._pending.append((path, entry))
+            self.files += 1
+            self.bytes_written += entry['size']
+            due = (len(self._pending) >= self.fsync_every
+                   or time.monotonic() - self._synced_at >= self.fsync_interval)
+            if due and not self._flush_scheduled:
+                self._flush_scheduled = True
+                self._flusher.submit(self.flush)
+        return entry
+
+    def flush(self):
+        """fsync 待落盘的文件和目录，然后把它们追加到清单"""
+        with self._sync_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                self._flush_scheduled = False
+                self._synced_at = time.monotonic()
+            if not pending:
+                return
+            directories = set()
+            for path, _ in pending:
+                try:
+                    _fsync(path)
+                except OSError:
+                    # 文件已被删除（如拼接失败后清理），不记入清单
+                    continue
+                directories.add(path.parent)
+            for directory in directories:
+                try:
+                    _fsync(directory, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+                except OSError:
+                    # 部分平台不支持对目录 fsync
+                    pass
+            if self._manifest is None:
+                self.root.mkdir(parents=True, exist_ok=True)
+                self._manifest = open(self.manifest_path, 'a', encoding='utf-8')
+            for path, entry in pending:
+                try:
+                    name = path.relative_to(self.root).as_posix()
+                except ValueError:
+                    name = str(path)
+                self._manifest.write(
+                    json.dumps(dict(entry, path=name), ensure_ascii=False) + '\n')
+            self._manifest.flush()
+            os.fsync(self._manifest.fileno())
+            self.syncs += 1
+
+    def close(self):
+        """等待后台 fsync 结束，落盘剩余文件并关闭清单"""
+        self._flusher.shutdown(wait=True)
+        self.flush()
+        if self._manifest is not None:
+            self._manifest.close()
+            self._manifest = None
+
+    def stats(self) -> Dict[str, int]:
+        """返回写入统计"""
+        return {
+            'files': self.files,
+            'bytes': self.bytes_written,
+            'syncs': self.syncs,
+        }
@@ -6,15 +6,27 @@ import hmac
 import hashlib
 import base64
 from urllib.parse import quote_plus
-from typing import Optional
+from typing import Dict, Optional
+
+# 钉钉机器人限流：每个机器人每分钟最多发送 20 条消息
+RATE_LIMIT_PER_MINUTE = 20
+
+
+class DingTalkError(Exception):
+    """钉钉接口返回错误（errcode 不为 0）"""
+
+    def __init__(self, errcode, errmsg):
+        super().__init__(f"{errcode}: {errmsg}")
+        self.errcode = errcode
+        self.errmsg = errmsg
 
 
 def generate_sign(secret: str) -> tuple:
     """生成钉钉签名
-    
+
     Args:
         secret: 钉钉机器人的密钥
-        
+
     Returns:
         (timestamp, sign) 时间戳和签名
     """
@@ -31,57 +43,95 @@ def generate_sign(secret: str) -> tuple:
     return timestamp, sign
 
 
-async def send_dingding_notification(
+def signed_webhook_url(webhook_url: str, secret: Optional[str] = None) -> str:
+    """提供签名密钥时在 Webhook URL 上附加时间戳和签名（每次发送都要重新生成）"""
+    if not secret:
+        return webhook_url
+    timestamp, sign = generate_sign(secret)
+    separator = '&' if '?' in webhook_url else '?'
+    return f"{webhook_url}{separator}timestamp={timestamp}&sign={sign}"
+
+
+def build_message(title: str, content: str, msg_type: str = "markdown") -> Dict:
+    """构建钉钉消息体"""
+    if msg_type == "markdown":
+        return {
+            "msgtype": "markdown",
+            "markdown": {
+                "title": title,
+                "text": content
+            }
+        }
+    return {
+        "msgtype": "text",
+        "text": {
+            "content": content
+        }
+    }
+
+
+async def post_dingding_message(
+    session: aiohttp.ClientSession,
     webhook_url: str,
     title: str,
     content: str,
     secret: Optional[str] = None,
     msg_type: str = "markdown"
+):
+    """用已有的会话发送一条钉钉消息，失败时抛出异常（由调用方决定是否重试）"""
+    async with session.post(
+            signed_webhook_url(webhook_url, secret),
+            json=build_message(title, content, msg_type)) as resp:
+        if resp.status >= 400:
+            raise DingTalkError(resp.status, f"HTTP {resp.status}")
+        result = await resp.json(content_type=None)
+        if result.get("errcode") != 0:
+            raise DingTalkError(result.get("errcode"), result.get("errmsg"))
+
+
+def dingding_sender(
+    webhook_url: str,
+    secret: Optional[str] = None,
+    msg_type: str = "markdown"
+):
+    """返回通知服务使用的发送函数 ``send(session, title, content)``"""
+    async def send(session: aiohttp.ClientSession, title: str, content: str):
+        await post_dingding_message(
+            session, webhook_url, title, content, secret, msg_type)
+    return send
+
+
+async def send_dingding_notification(
+    webhook_url: str,
+    title: str,
+    content: str,
+    secret: Optional[str] = None,
+    msg_type: str = "markdown",
+    session: Optional[aiohttp.ClientSession] = None
 ):
     """发送钉钉通知
-    
+
     Args:
         webhook_url: 钉钉机器人Webhook URL
         title: 消息标题
         content: 消息内容
         secret: 钉钉机器人签名密钥（可选）
         msg_type: 消息类型（text或markdown）
+        session: 复用的HTTP会话（可选，默认临时创建）
     """
     if not webhook_url:
         return
-    
+
     try:
-        # 如果提供了签名密钥，生成签名并添加到URL
-        if secret:
-            timestamp, sign = generate_sign(secret)
-            if '?' in webhook_url:
-                webhook_url = f"{webhook_url}&timestamp={timestamp}&sign={sign}"
-            else:
-                webhook_url = f"{webhook_url}?timestamp={timestamp}&sign={sign}"
-        
-        if msg_type == "markdown":
-            data = {
-                "msgtype": "markdown",
-                "markdown": {
-                    "title": title,
-                    "text": content
-                }
-            }
+        if session is not None:
+            await post_dingding_message(
+                session, webhook_url, title, content, secret, msg_type)
         else:
-            data = {
-                "msgtype": "text",
-                "text": {
-                    "content": content
-                }
-            }
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(webhook_url, json=data) as resp:
-                result = await resp.json()
-                if result.get("errcode") != 0:
-                    print(f"钉钉通知发送失败: {result.get('errmsg')}")
-                else:
-                    print("钉钉通知发送成功")
+            async with aiohttp.ClientSession() as own_session:
+                await post_dingding_message(
+                    own_session, webhook_url, title, content, secret, msg_type)
+        print("钉钉通知发送成功")
+    except DingTalkError as e:
+        print(f"钉钉通知发送失败: {e.errmsg}")
     except Exception as e:
         print(f"发送钉钉通知时出错: {str(e)}")
-
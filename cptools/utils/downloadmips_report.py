@@ -1,13 +1,20 @@
 """产品主图下载报告生成模块"""
+from html import escape
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict
 
+from cptools.utils.report_writer import (
+    media_src, with_live_refresh, write_report
+)
+from cptools.utils.timing_report import generate_timing_section
+
 
 def generate_downloadmips_html_report(
     results: List[Dict],
     output_path: str,
-    title: str = "产品主图下载报告"
+    title: str = "产品主图下载报告",
+    refresh: int = 0
 ):
     """生成产品主图下载HTML报告
     
@@ -15,6 +22,7 @@ def generate_downloadmips_html_report(
         results: 下载结果列表
         output_path: 输出HTML文件路径
         title: 报告标题
+        refresh: 大于0时为运行中的实时报告，浏览器每隔该秒数自动刷新
     """
     output_file = Path(output_path)
     output_file.parent.mkdir(parents=True, exist_ok=True)
@@ -31,9 +39,88 @@ def generate_downloadmips_html_report(
         results, output_path, title, total, success, failed, total_images, timestamp
     )
     
+    if refresh:
+        html_content = with_live_refresh(html_content, refresh)
+
     # 写入文件
-    output_file.write_text(html_content, encoding='utf-8')
-    print(f"HTML报告已生成: {output_path}")
+    write_report(output_file, html_content)
+    if not refresh:
+        print(f"HTML报告已生成: {output_path}")
+
+
+def summarize_regions(results: List[Dict]) -> Dict[str, Dict[str, int]]:
+    """按地区统计产品数、成功数、图片数和与其他地区共用的图片数"""
+    regions: Dict[str, Dict[str, int]] = {}
+    for r in results:
+        stats = regions.setdefault(r.get('region') or '-', {
+            'total': 0, 'success': 0, 'failed': 0, 'images': 0, 'shared': 0})
+        stats['total'] += 1
+        if r.get('status') == 'success':
+            stats['success'] += 1
+        else:
+            stats['failed'] += 1
+        stats['images'] += r.get('image_count', 0)
+        stats['shared'] += sum(
+            1 for img in r.get('images', []) if img.get('shared_with'))
+    return dict(sorted(regions.items()))
+
+
+def _generate_region_section(results: List[Dict]) -> str:
+    """分地区统计表格（只有一个地区时返回空）"""
+    regions = summarize_regions(results)
+    if len(regions) <= 1:
+        return ''
+
+    rows = ''
+    for region, s in regions.items():
+        rows += f'''
+                <tr>
+                    <td>{escape(region)}</td>
+                    <td>{s['total']}</td>
+                    <td>{s['success']}</td>
+                    <td>{s['failed']}</td>
+                    <td>{s['images']}</td>
+                    <td>{s['shared']}</td>
+                </tr>'''
+    return f'''
+    <section class="region-section container">
+        <style>
+            .region-section {{
+                background: #ffffff;
+                margin: 1.5rem auto;
+                padding: 1.5rem;
+                border-radius: 0.75rem;
+                box-shadow: 0 1px 3px 0 rgb(0 0 0 / 0.1);
+                max-width: 1400px;
+            }}
+            .region-section h2 {{
+                font-size: 1.25rem;
+                margin-bottom: 0.75rem;
+            }}
+            .region-table {{
+                width: 100%;
+                border-collapse: collapse;
+                font-size: 0.875rem;
+            }}
+            .region-table th, .region-table td {{
+                text-align: right;
+                padding: 0.4rem 0.75rem;
+                border-bottom: 1px solid #e2e8f0;
+            }}
+            .region-table th:first-child, .region-table td:first-child {{
+                text-align: left;
+            }}
+            .region-table th {{
+                color: #64748b;
+                font-weight: 600;
+            }}
+        </style>
+        <h2>🌏 分地区统计</h2>
+        <table class="region-table">
+            <tr><th>地区</th><th>产品数</th><th>成功</th><th>失败</th><th>图片数</th><th>与其他地区共用</th></tr>
+            {rows}
+        </table>
+    </section>'''
 
 
 def _generate_html(
@@ -47,8 +134,28 @@ def _generate_html(
     timestamp: str
 ) -> str:
     """生成HTML内容"""
+
+    # 提取方式统计（只在使用 --extract html/auto 时显示）
+    extract_stat_html = ""
+    if any(r.get('extract') == 'html' for r in results):
+        via_html = sum(1 for r in results if r.get('extract') == 'html')
+        via_browser = sum(1 for r in results if r.get('extract') == 'browser')
+        extract_stat_html = f'''
+                    <div class="stat">
+                        <span class="stat-value">{via_html} / {via_browser}</span>
+                        <span class="stat-label">HTML解析 / 浏览器</span>
+                    </div>'''
+    # 索引命中统计（只在使用 --index-max-age 时显示）
+    via_index = sum(1 for r in results if r.get('extract') == 'index')
+    if via_index:
+        extract_stat_html += f'''
+                    <div class="stat">
+                        <span class="stat-value">{via_index}</span>
+                        <span class="stat-label">索引命中</span>
+                    </div>'''
     
     # 生成产品行
+    multi_region = len({r.get('region') for r in results}) > 1
     rows_html = ""
     error_nav_html = ""
     error_count = 0
@@ -60,6 +167,7 @@ def _generate_html(
         error = result.get('error', '')
         image_count = result.get('image_count', 0)
         images = result.get('images', [])
+        region_label = f" ({result.get('region') or '-'})" if multi_region else ''
         
         # 生成缩略图HTML
         thumbnails_html = ""
@@ -69,15 +177,7 @@ def _generate_html(
                 img_filename = img.get('filename', '')
                 
                 # 转换为相对路径
-                if img_path and Path(img_path).exists():
-                    try:
-                        output_dir = Path(output_path).parent
-                        rel_path = Path(img_path).relative_to(output_dir)
-                        img_src = str(rel_path).replace('\\', '/')
-                    except ValueError:
-                        img_src = img_path
-                else:
-                    img_src = ''
+                img_src = media_src(img_path, output_path)
                 
                 if img_src:
                     thumbnails_html += f'''
@@ -91,7 +191,7 @@ def _generate_html(
         
         rows_html += f'''
             <tr class="product-row {status_class}" id="product-{idx}">
-                <td class="product-no">{product_no}</td>
+                <td class="product-no">{product_no}{region_label}</td>
                 <td class="url-cell">
                     <a href="{url}" target="_blank" title="{url}">{url}</a>
                 </td>
@@ -541,7 +641,7 @@ def _generate_html(
                     <div class="stat">
                         <span class="stat-value">{total_images}</span>
                         <span class="stat-label">下载图片数</span>
-                    </div>
+                    </div>{extract_stat_html}
                 </div>
             </div>
         </div>
@@ -549,6 +649,10 @@ def _generate_html(
     
     {_generate_error_nav(error_nav_html, failed)}
     
+    {_generate_region_section(results)}
+
+    {generate_timing_section(results)}
+    
     <main class="content">
         <div class="table-container">
             <table>
@@ -3,12 +3,18 @@ from pathlib import Path
 from datetime import datetime
 from typing import List, Dict
 
+from cptools.utils.report_writer import (
+    media_src, with_live_refresh, write_report
+)
+from cptools.utils.timing_report import generate_timing_section
+
 
 def generate_html_report(
     results: List[Dict],
     output_path: str,
     title: str = "截屏报告",
-    template: str = "default"
+    template: str = "default",
+    refresh: int = 0
 ):
     """生成HTML报告
     
@@ -17,6 +23,7 @@ def generate_html_report(
         output_path: 输出HTML文件路径
         title: 报告标题
         template: 模板名称（已废弃，保留参数兼容性）
+        refresh: 大于0时为运行中的实时报告，浏览器每隔该秒数自动刷新
     """
     output_file = Path(output_path)
     output_file.parent.mkdir(parents=True, exist_ok=True)
@@ -32,9 +39,13 @@ def generate_html_report(
         results, output_path, title, total, success, failed, timestamp
     )
     
+    if refresh:
+        html_content = with_live_refresh(html_content, refresh)
+
     # 写入文件
-    output_file.write_text(html_content, encoding='utf-8')
-    print(f"HTML报告已生成: {output_path}")
+    write_report(output_file, html_content)
+    if not refresh:
+        print(f"HTML报告已生成: {output_path}")
 
 
 def _generate_modern_html(
@@ -61,15 +72,7 @@ def _generate_modern_html(
         error = result.get('error', '')
         
         # 转换为相对路径
-        if screenshot_path and Path(screenshot_path).exists():
-            try:
-                output_dir = Path(output_path).parent
-                rel_path = Path(screenshot_path).relative_to(output_dir)
-                img_src = str(rel_path).replace('\\', '/')
-            except ValueError:
-                img_src = screenshot_path
-        else:
-            img_src = ''
+        img_src = media_src(screenshot_path, output_path)
         
         # 生成卡片
         cards_html += f'''
@@ -508,6 +511,8 @@ def _generate_modern_html(
     
     {_generate_error_nav(error_nav_html, failed)}
     
+    {generate_timing_section(results)}
+    
     <main class="content">
         <div class="grid">
             {cards_html}
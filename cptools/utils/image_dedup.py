@@ -0,0 +1,75 @@
+"""同一次运行中的图片去重
+
+多地区下载时，不同地区的同一产品往往是同一张图片（同一地址，或地址不同但内容
+相同）。第一次保存的文件作为原件，之后相同的图片用硬链接指向原件，磁盘上只存
+一份；文件系统不支持硬链接时退回为普通写入。写入归档（``--archive``）时
+改用归档的链接条目；指定 writer 时硬链接也记入输出目录的完整性清单。
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+class ImageDedup:
+    """按图片地址和内容哈希（SHA-256）记录已保存的图片"""
+
+    def __init__(self, archive=None, writer=None):
+        self.archive = archive
+        self.writer = writer
+        self.by_url: Dict[str, Path] = {}
+        self.by_hash: Dict[str, Path] = {}
+        self.linked = 0
+        self.saved_bytes = 0
+
+    def find_url(self, img_url: str) -> Optional[Path]:
+        """同一地址已保存过时返回原件路径（可以不再下载）"""
+        original = self.by_url.get(img_url)
+        if original is not None and self._exists(original):
+            return original
+        return None
+
+    def find_data(self, data: bytes) -> Tuple[str, Optional[Path]]:
+        """返回内容哈希，以及内容相同的原件路径（没有时为 None）"""
+        digest = hashlib.sha256(data).hexdigest()
+        original = self.by_hash.get(digest)
+        if original is not None and not self._exists(original):
+            original = None
+        return digest, original
+
+    def link(self, original: Path, path: Path) -> bool:
+        """把 path 硬链接到原件，失败时返回 False（调用方改为普通写入）"""
+        if original == path:
+            return False
+        if self.archive is not None:
+            if not self.archive.link(original, path):
+                return False
+            self.linked += 1
+            self.saved_bytes += self.archive.entries[
+                self.archive.name_of(path)]['size']
+            return True
+        try:
+            if path.exists():
+                path.unlink()
+            os.link(original, path)
+        except OSError:
+            return False
+        self.linked += 1
+        self.saved_bytes += path.stat().st_size
+        if self.writer is not None:
+            self.writer.record(path, self.writer.entries.get(str(original)))
+        return True
+
+    def _exists(self, path: Path) -> bool:
+        if self.archive is not None:
+            return self.archive.exists(path)
+        return path.exists()
+
+    def register(self, img_url: str, digest: str, path: Path):
+        """记录新保存的原件"""
+        self.by_hash.setdefault(digest, path)
+        self.by_url.setdefault(img_url, path)
+
+    def stats(self) -> Dict[str, int]:
+        """返回去重统计"""
+        return {'linked': self.linked, 'saved_bytes': self.saved_bytes}
@@ -0,0 +1,209 @@
+"""下载图片的格式识别和后处理
+
+``sniff_format`` 根据文件头（magic bytes）识别图片的真实格式，代替按地址猜测扩展名。
+
+``ImagePipeline`` 是可选的下载后处理阶段：在进程池中把图片转换为 WebP / AVIF，
+并生成固定尺寸的缩略图。下载得到的字节直接传给子进程解码，原图不会先写盘再
+读回。转换和缩略图需要 Pillow（可选依赖：``pip install cptools[images]``），
+AVIF 还需要 Pillow 支持 AVIF 编码（Pillow 11.2+ 或 ``pillow-avif-plugin``）。
+"""
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from cptools.utils.atomic_write import write_atomic
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+
+# 格式名 -> 扩展名
+IMAGE_EXTENSIONS = {
+    'jpeg': '.jpg',
+    'png': '.png',
+    'gif': '.gif',
+    'webp': '.webp',
+    'avif': '.avif',
+}
+
+CONVERT_FORMATS = ['webp', 'avif']
+
+# 格式名 -> Pillow 保存格式
+_PIL_FORMATS = {
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+    'gif': 'GIF',
+    'webp': 'WEBP',
+    'avif': 'AVIF',
+}
+
+
+def sniff_format(data: bytes) -> Optional[str]:
+    """根据文件头识别图片格式，不是支持的图片时返回 None"""
+    if data[:3] == b'\xff\xd8\xff':
+        return 'jpeg'
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    if data[4:8] == b'ftyp' and data[8:12] in (b'avif', b'avis'):
+        return 'avif'
+    return None
+
+
+def pipeline_error(convert: Optional[str]) -> Optional[str]:
+    """检查当前环境能否执行后处理，不能时返回错误说明"""
+    if Image is None:
+        return "图片转换和缩略图需要安装 Pillow: pip install cptools[images]"
+    if convert == 'avif':
+        try:
+            import pillow_avif  # noqa: F401
+        except ImportError:
+            pass
+        if 'AVIF' not in Image.SAVE:
+            return ("当前 Pillow 不支持 AVIF 编码，请升级到 Pillow 11.2+ "
+                    "或安装 pillow-avif-plugin")
+    return None
+
+
+def derivative_path(path: Path, size: int) -> Path:
+    """缩略图路径：{原文件名}_{尺寸}{扩展名}"""
+    return path.with_name(f"{path.stem}_{size}{path.suffix}")
+
+
+def _save(image, target, fmt: str, quality: int):
+    if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    elif fmt in ('webp', 'avif') and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands()
+                              or 'transparency' in image.info else 'RGB')
+    options = {'quality': quality} if fmt in ('jpeg', 'webp', 'avif') else {}
+    image.save(target, _PIL_FORMATS[fmt], **options)
+
+
+def _encode(image, fmt: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    _save(image, buffer, fmt, quality)
+    return buffer.getvalue()
+
+
+def process_image(
+    data: bytes,
+    path: str,
+    source_format: str,
+    convert: Optional[str],
+    quality: int,
+    sizes: List[int],
+    to_memory: bool = False
+) -> Dict:
+    """在子进程中执行：写出（转换后的）图片和各尺寸缩略图
+
+    path 为输出路径（扩展名已按输出格式确定）。不需要转换，或原图已经是
+    目标格式时原样写出字节，不重新编码。文件原子写出，完整性信息放在返回值的
+    entry / derivative_entries 中（由父进程记入清单）。to_memory 为 True 时不写
+    文件，编码结果放在返回值的 data / derivative_data 中（写入归档时使用）。
+    """
+    path = Path(path)
+    target = convert or source_format
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        output = data if target == source_format else _encode(
+            image, target, quality)
+
+        derivatives = []
+        derivative_data = []
+        for size in sizes:
+            thumb = image.copy()
+            thumb.thumbnail((size, size))
+            derivatives.append(str(derivative_path(path, size)))
+            derivative_data.append(_encode(thumb, target, quality))
+
+        info = {
+            'format': target,
+            'width': image.width,
+            'height': image.height,
+            'derivatives': derivatives,
+        }
+    if to_memory:
+        info['data'] = output
+        info['derivative_data'] = derivative_data
+        return info
+    info['entry'] = write_atomic(path, output)
+    info['derivative_entries'] = [
+        write_atomic(thumb_path, thumb_data)
+        for thumb_path, thumb_data in zip(derivatives, derivative_data)]
+    return info
+
+
+class ImagePipeline:
+    """下载后处理阶段（格式转换和缩略图），在进程池中执行
+
+    Args:
+        convert: 转换的目标格式（webp / avif），None 为保持原格式
+        quality: 有损编码质量（1-100）
+        sizes: 缩略图长边尺寸列表
+        workers: 进程数（0 为 CPU 核数）
+    """
+
+    def __init__(
+        self,
+        convert: Optional[str] = None,
+        quality: int = 80,
+        sizes: Optional[List[int]] = None,
+        workers: int = 0
+    ):
+        self.convert = convert
+        self.quality = quality
+        self.sizes = sorted(set(sizes or []))
+        self.workers = workers
+        self.processed = 0
+        self.converted = 0
+        self.derivatives = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.convert or self.sizes)
+
+    def start(self):
+        self._pool = ProcessPoolExecutor(max_workers=self.workers or None)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def output_format(self, source_format: str) -> str:
+        """输出文件的格式"""
+        return self.convert or source_format
+
+    async def process(
+        self,
+        data: bytes,
+        path: Path,
+        source_format: str,
+        to_memory: bool = False
+    ) -> Dict:
+        """在进程池中写出图片和缩略图，返回输出格式、尺寸和缩略图路径"""
+        loop = asyncio.get_running_loop()
+        info = await loop.run_in_executor(
+            self._pool, process_image, data, str(path), source_format,
+            self.convert, self.quality, self.sizes, to_memory)
+        self.processed += 1
+        if info['format'] != source_format:
+            self.converted += 1
+        self.derivatives += len(info['derivatives'])
+        return info
+
+    def stats(self) -> Dict[str, int]:
+        """返回处理统计"""
+        return {
+            'processed': self.processed,
+            'converted': self.converted,
+            'derivatives': self.derivatives,
+        }
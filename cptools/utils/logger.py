@@ -1,46 +1,131 @@
 """日志工具模块"""
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+from datetime import datetime
 from pathlib import Path
 
+LOG_FORMATS = ['text', 'json']
 
-def setup_logger(log_file=None, level=logging.INFO):
+# 当前的后台日志线程（重复调用 setup_logger 时先停止旧的）
+_listener = None
+
+# LogRecord 自带的属性，JSON 日志只额外输出通过 extra= 传入的字段
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {
+    'message', 'asctime', 'taskName'}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志输出一行 JSON，便于程序解析"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(
+                timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        exc_text = record.exc_text
+        if not exc_text and record.exc_info:
+            exc_text = self.formatException(record.exc_info)
+        if exc_text:
+            entry['exception'] = exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ExceptionQueueHandler(logging.handlers.QueueHandler):
+    """入队前只合并消息参数，异常堆栈单独保存在 exc_text
+
+    标准的 QueueHandler 会把堆栈拼进消息，JSON 日志就没有单独的 exception
+    字段；文本格式化器同样会输出 exc_text，终端和文本日志不受影响。
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        # 不在队列中保留 traceback 对象（会持有整个调用栈）
+        record.exc_info = None
+        return record
+
+
+def setup_logger(log_file=None, level=logging.INFO, log_format='text'):
     """设置日志记录器
-    
+
+    协程中的 ``logger.info`` 只把日志放入内存队列，终端和文件的写入由后台线程
+    （QueueListener）完成，事件循环不会因为日志 I/O 阻塞。进程退出时自动
+    停止后台线程并写完剩余日志。
+
     Args:
         log_file: 日志文件路径
         level: 日志级别
-        
+        log_format: 日志文件格式，text 为普通文本，json 为每行一条 JSON
+
     Returns:
         配置好的logger实例
     """
+    global _listener
+
     logger = logging.getLogger("cptools")
     logger.setLevel(level)
-    
+
     # 清除已有的处理器
+    stop_logging()
     logger.handlers.clear()
-    
+
     # 格式化器
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    
+    handlers = []
+
     # 控制台处理器
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
+    handlers.append(console_handler)
+
     # 文件处理器
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
-        
+
         file_handler = logging.FileHandler(log_file, encoding='utf-8')
         file_handler.setLevel(level)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    
+        file_handler.setFormatter(
+            JsonLinesFormatter() if log_format == 'json' else formatter)
+        handlers.append(file_handler)
+
+    # 协程只入队，由后台线程写终端和文件
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(ExceptionQueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
     return logger
 
+
+def stop_logging():
+    """停止后台日志线程，写完队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
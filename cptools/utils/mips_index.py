@@ -0,0 +1,188 @@
+"""产品主图地址索引模块
+
+为 downloadmips 保存跨运行的“产品页面 → 主图地址”索引（主图地址、页面 ETag /
+Last-Modified、提取时间），以及每张图片的验证器和上次保存的位置。之后的运行
+可以跳过页面渲染，直接（按条件请求）下载图片。
+"""
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 需要落盘的验证器响应头
+VALIDATOR_HEADERS = ('etag', 'last-modified')
+
+# 图片条目中记录的完整性信息
+INTEGRITY_KEYS = ('size', 'sha256', 'mtime_ns')
+
+# 图片条目的保留时间（秒）：超过该时间没有再下载或验证过的图片条目在保存时删除
+IMAGE_TTL = 30 * 24 * 3600
+
+# 图片条目数上限，超过时保存前只保留最近验证过的条目
+MAX_IMAGES = 100000
+
+
+def _validators(headers) -> Dict[str, str]:
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    return {k: headers[k] for k in VALIDATOR_HEADERS if headers.get(k)}
+
+
+class MipsIndex:
+    """基于JSON文件的主图地址索引
+
+    页面条目以产品页面URL为键，图片条目以图片URL为键；整个文件在运行开始时
+    读入、结束时原子写回（与 url404 的响应缓存相同）。条目的 ``headers``
+    与 ``ResponseCache`` 的格式一致，可直接用 ``ResponseCache.conditional_headers``
+    构建条件请求头。图片条目记录最近一次下载或验证的时间，保存时按
+    ``image_ttl`` 和 ``max_images`` 清理，索引文件不会无限增长。
+    """
+
+    def __init__(self, path: str, image_ttl: int = IMAGE_TTL,
+                 max_images: int = MAX_IMAGES):
+        self.path = Path(path)
+        self.image_ttl = image_ttl
+        self.max_images = max_images
+        self.pages: Dict[str, Dict] = {}
+        self.images: Dict[str, Dict] = {}
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.image_revalidated = 0
+        self._dirty = False
+
+    def load(self, logger=None):
+        """从磁盘读取索引，文件损坏时按空索引处理"""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.pages = data.get('pages', {})
+            self.images = data.get('images', {})
+        except Exception as e:
+            self.pages = {}
+            self.images = {}
+            if logger:
+                logger.warning(f"读取主图索引失败，忽略旧索引: {str(e)}")
+
+    def save(self):
+        """原子写回索引文件（先写临时文件再重命名），写回前清理过期的图片条目"""
+        self.prune_images()
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'pages': self.pages,
+                       'images': self.images}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def clear(self):
+        """清空页面条目（--refresh-index），图片验证器保留"""
+        if self.pages:
+            self.pages = {}
+            self._dirty = True
+
+    def get(self, page_url: str) -> Optional[Dict]:
+        """获取产品页面的索引条目（不判断是否过期）"""
+        return self.pages.get(page_url)
+
+    @staticmethod
+    def is_fresh(entry: Dict, max_age: int) -> bool:
+        """条目年龄不超过 max_age 秒时可以直接使用"""
+        if max_age <= 0:
+            return False
+        return time.time() - entry.get('extracted_at', 0) <= max_age
+
+    def put(
+        self,
+        page_url: str,
+        product_no: str,
+        images: List[Optional[str]],
+        headers: Optional[Dict[str, str]] = None
+    ):
+        """记录一次页面提取的结果"""
+        self.pages[page_url] = {
+            'product_no': product_no,
+            'images': list(images),
+            'headers': _validators(headers),
+            'extracted_at': time.time(),
+        }
+        self._dirty = True
+
+    def touch(self, page_url: str):
+        """条件请求返回304后刷新条目的提取时间"""
+        entry = self.pages.get(page_url)
+        if entry:
+            entry['extracted_at'] = time.time()
+            self._dirty = True
+
+    def drop(self, page_url: str):
+        """删除失效的条目（如按索引下载的图片全部失败）"""
+        if self.pages.pop(page_url, None) is not None:
+            self._dirty = True
+
+    def image(self, img_url: str) -> Optional[Dict]:
+        """获取图片的验证器和上次保存的位置"""
+        return self.images.get(img_url)
+
+    def put_image(self, img_url: str, headers) -> None:
+        """记录图片响应的验证器（没有验证器时不记录）"""
+        validators = _validators(headers)
+        if validators:
+            self.images[img_url] = dict(
+                self.images.get(img_url, {}), headers=validators,
+                checked_at=time.time())
+            self._dirty = True
+
+    def touch_image(self, img_url: str):
+        """图片条件请求返回304后刷新条目的验证时间"""
+        entry = self.images.get(img_url)
+        if entry:
+            entry['checked_at'] = time.time()
+            self._dirty = True
+
+    def prune_images(self) -> int:
+        """删除超过 image_ttl 没有验证过的图片条目，条目数超过 max_images 时
+        只保留最近验证过的，返回删除的条目数"""
+        before = len(self.images)
+        if self.image_ttl > 0:
+            cutoff = time.time() - self.image_ttl
+            self.images = {
+                url: entry for url, entry in self.images.items()
+                if entry.get('checked_at', 0) >= cutoff
+            }
+        if self.max_images > 0 and len(self.images) > self.max_images:
+            newest = sorted(
+                self.images.items(),
+                key=lambda item: item[1].get('checked_at', 0),
+                reverse=True)[:self.max_images]
+            self.images = dict(newest)
+        removed = before - len(self.images)
+        if removed:
+            self._dirty = True
+        return removed
+
+    def image_saved(self, img_url: str, path: Path, integrity: Dict):
+        """记录图片保存的位置和完整性信息（size / sha256 / mtime_ns）
+
+        之后的条件请求返回304时，文件大小和修改时间仍与记录一致才从这里复用。
+        """
+        entry = self.images.get(img_url)
+        if entry is not None:
+            entry['path'] = str(path)
+            entry.update({k: integrity[k] for k in INTEGRITY_KEYS if k in integrity})
+            self._dirty = True
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中统计"""
+        return {
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'misses': self.misses,
+            'image_revalidated': self.image_revalidated,
+        }
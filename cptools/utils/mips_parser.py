@@ -0,0 +1,65 @@
+"""从产品页面HTML中提取主图地址
+
+不渲染页面，边下载边解析：只跟踪 ``class`` 包含 ``stackable-image-container``
+的元素，收集其中 ``<img>`` 的 ``src``（没有 src 时取 ``data-src``）。
+"""
+from html.parser import HTMLParser
+from typing import List, Optional
+
+CONTAINER_CLASS = 'stackable-image-container'
+
+# 没有结束标签的元素，不计入嵌套深度
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr',
+}
+
+
+class MipsImageParser(HTMLParser):
+    """增量解析HTML，收集主图容器中的图片地址
+
+    用 ``feed()`` 分块输入，``images`` 为按出现顺序排列的地址
+    （没有地址的图片为 None，与浏览器方式的编号保持一致）。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.images: List[Optional[str]] = []
+        self.containers = 0
+        # 当前所在容器内的嵌套深度，0 表示不在容器中
+        self._depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._depth:
+            if tag == 'img':
+                self._add_image(attrs)
+            elif tag not in VOID_TAGS:
+                self._depth += 1
+            return
+        if tag in VOID_TAGS:
+            return
+        classes = (dict(attrs).get('class') or '').split()
+        if CONTAINER_CLASS in classes:
+            self.containers += 1
+            self._depth = 1
+
+    def handle_startendtag(self, tag, attrs):
+        if self._depth and tag == 'img':
+            self._add_image(attrs)
+
+    def handle_endtag(self, tag):
+        if self._depth and tag not in VOID_TAGS:
+            self._depth -= 1
+
+    def _add_image(self, attrs):
+        values = dict(attrs)
+        self.images.append(values.get('src') or values.get('data-src') or None)
+
+
+def normalize_image_url(img_url: str, host: str) -> str:
+    """把协议相对地址和站内相对路径转为绝对地址"""
+    if img_url.startswith('//'):
+        return 'https:' + img_url
+    if img_url.startswith('/'):
+        return host.rstrip('/') + img_url
+    return img_url
@@ -0,0 +1,68 @@
+"""通知后端
+
+通知服务只依赖发送函数 ``send(session, title, content)``（失败时抛出异常），
+不同的后端提供不同的发送函数：
+
+- ``dingtalk``: 钉钉机器人（目标为 Webhook URL，可附带签名密钥）
+- ``webhook``: 通用 JSON Webhook，POST ``{"title", "content", "sent_at"}``，
+  HTTP 状态码 >= 400 视为失败
+- ``jsonl``: 追加写入本地 JSONL 文件（目标为文件路径），不访问网络，
+  用于离线测试和检查通知内容
+"""
+import asyncio
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import aiohttp
+
+from cptools.utils.dingding import dingding_sender
+
+BACKEND_DINGTALK = 'dingtalk'
+BACKEND_WEBHOOK = 'webhook'
+BACKEND_JSONL = 'jsonl'
+NOTIFY_BACKENDS = [BACKEND_DINGTALK, BACKEND_WEBHOOK, BACKEND_JSONL]
+
+
+def webhook_sender(url: str):
+    """通用 JSON Webhook 的发送函数"""
+    async def send(session: aiohttp.ClientSession, title: str, content: str):
+        payload = {
+            'title': title,
+            'content': content,
+            'sent_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        async with session.post(url, json=payload) as resp:
+            resp.raise_for_status()
+    return send
+
+
+def jsonl_sender(path):
+    """追加写入 JSONL 文件的发送函数（每条消息一行，在线程中写入）"""
+    path = Path(path)
+
+    def append(line: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    async def send(session: aiohttp.ClientSession, title: str, content: str):
+        line = json.dumps({
+            'title': title,
+            'content': content,
+            'sent_at': datetime.now().isoformat(timespec='seconds'),
+        }, ensure_ascii=False) + '\n'
+        await asyncio.get_running_loop().run_in_executor(None, append, line)
+    return send
+
+
+def build_sender(backend: str, target: str, secret: Optional[str] = None):
+    """按后端名称创建发送函数，target 为 Webhook URL 或 JSONL 文件路径"""
+    if backend == BACKEND_DINGTALK:
+        return dingding_sender(target, secret)
+    if backend == BACKEND_WEBHOOK:
+        return webhook_sender(target)
+    if backend == BACKEND_JSONL:
+        return jsonl_sender(target)
+    raise ValueError(f"未知的通知后端: {backend}")
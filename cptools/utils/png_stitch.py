@@ -0,0 +1,128 @@
+"""分块截图的增量拼接
+
+把逐屏截取的 PNG 分块按顺序拼成一张 PNG：每个分块解码后逐行压缩写入文件，
+内存中最多只保留一个分块的像素数据，不需要先在内存中构造整页位图。
+分块解码需要 Pillow（可选依赖：``pip install Pillow``）。
+"""
+import io
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Optional
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# 压缩数据累积到这个大小后写出一个 IDAT 块
+IDAT_SIZE = 256 * 1024
+
+# RGB 8位，无隔行
+_COLOR_TYPE_RGB = 2
+_IHDR_OFFSET = len(PNG_SIGNATURE)
+
+
+def stitch_available() -> bool:
+    """是否可以拼接分块（已安装 Pillow）"""
+    return Image is not None
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(kind + data) & 0xffffffff
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', crc)
+
+
+def _ihdr(width: int, height: int) -> bytes:
+    return _chunk(b'IHDR', struct.pack(
+        '>IIBBBBB', width, height, 8, _COLOR_TYPE_RGB, 0, 0, 0))
+
+
+class PngStitcher:
+    """把同宽的分块按从上到下的顺序拼接成一张 PNG
+
+    先写入临时文件，``close`` 时回填实际高度并改名为目标文件；
+    ``abort`` 删除临时文件。
+
+    Args:
+        path: 输出文件路径
+        level: zlib 压缩级别
+    """
+
+    def __init__(self, path, level: int = 6):
+        self.path = Path(path)
+        self.width: Optional[int] = None
+        self.height = 0
+        self._tmp_path = self.path.with_name(self.path.name + '.part')
+        self._file = None
+        self._compressor = zlib.compressobj(level)
+        self._pending = []
+        self._pending_size = 0
+
+    def add(self, png: bytes):
+        """追加一个 PNG 分块（需要 Pillow）"""
+        if Image is None:
+            raise RuntimeError("拼接分块截图需要安装 Pillow: pip install Pillow")
+        with Image.open(io.BytesIO(png)) as image:
+            rgb = image.convert('RGB')
+            self.add_rows(rgb.tobytes(), rgb.width, rgb.height)
+
+    def add_rows(self, pixels: bytes, width: int, height: int):
+        """追加原始 RGB 像素行（每行 width * 3 字节）"""
+        if self._file is None:
+            self.width = width
+            self._file = open(self._tmp_path, 'wb')
+            # 高度先写 0，close 时回填
+            self._file.write(PNG_SIGNATURE + _ihdr(width, 0))
+        elif width != self.width:
+            raise ValueError(f"分块宽度不一致: {width} != {self.width}")
+
+        stride = width * 3
+        view = memoryview(pixels)
+        for row in range(height):
+            # 每行前加过滤类型 0（不过滤）
+            self._push(self._compressor.compress(b'\0'))
+            self._push(self._compressor.compress(
+                view[row * stride:(row + 1) * stride]))
+        self.height += height
+
+    def _push(self, data: bytes):
+        if not data:
+            return
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= IDAT_SIZE:
+            self._write_idat()
+
+    def _write_idat(self):
+        if self._pending:
+            self._file.write(_chunk(b'IDAT', b''.join(self._pending)))
+            self._pending = []
+            self._pending_size = 0
+
+    def close(self) -> Path:
+        """写完文件并回填高度，返回输出路径"""
+        if self._file is None:
+            raise ValueError("没有任何分块")
+        self._pending.append(self._compressor.flush())
+        self._write_idat()
+        self._file.write(_chunk(b'IEND', b''))
+        self._file.seek(_IHDR_OFFSET)
+        self._file.write(_ihdr(self.width, self.height))
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        """放弃拼接，删除临时文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            self._tmp_path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,40 @@
+"""三个HTML报告共用的写入工具"""
+import os
+from pathlib import Path
+
+from cptools.utils.archive import archive_member
+
+
+def write_report(output_file: Path, html_content: str):
+    """先写临时文件再改名，浏览器刷新时不会读到写了一半的报告"""
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+    tmp_file.write_text(html_content, encoding='utf-8')
+    os.replace(tmp_file, output_file)
+
+
+def with_live_refresh(html_content: str, refresh: int) -> str:
+    """为运行中的报告加上自动刷新和"运行中"提示"""
+    meta = f'<meta http-equiv="refresh" content="{refresh}">'
+    banner = (
+        '<div style="position:sticky;top:0;z-index:999;padding:0.5rem 1rem;'
+        'background:#fef3c7;color:#92400e;text-align:center;font-size:0.9rem;">'
+        f'⏳ 任务运行中，报告每 {refresh} 秒自动刷新，当前只包含已完成的结果</div>'
+    )
+    html_content = html_content.replace(
+        '<meta charset="UTF-8">', f'<meta charset="UTF-8">\n    {meta}', 1)
+    return html_content.replace('<body>', f'<body>\n    {banner}', 1)
+
+
+def media_src(path: str, output_path: str) -> str:
+    """报告中引用截图/图片的地址（相对报告所在目录）
+
+    文件不存在时为空；归档中的条目（``<归档>/<条目名>``）保留该路径，
+    由 ``cptools archive serve`` 按同样的相对路径提供。
+    """
+    if not path or not (Path(path).exists() or archive_member(path)):
+        return ''
+    try:
+        rel_path = Path(path).relative_to(Path(output_path).parent)
+        return str(rel_path).replace('\\', '/')
+    except ValueError:
+        return path
@@ -0,0 +1,156 @@
+"""HTTP响应元数据缓存模块
+
+为 url404 保存跨运行的响应元数据（状态码、响应头、正文哈希、抓取时间），
+按状态码分类设置不同的有效期。
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# 各状态码分类的默认有效期（秒）：稳定的200长期有效，5xx很快过期
+DEFAULT_TTLS = {
+    '2xx': 24 * 3600,
+    '3xx': 6 * 3600,
+    '4xx': 3600,
+    '5xx': 300,
+}
+
+# 需要落盘的响应头（其余响应头对判定和条件请求没有帮助）
+CACHED_HEADERS = (
+    'etag',
+    'last-modified',
+    'content-type',
+    'content-length',
+    'cache-control',
+    'location',
+)
+
+
+def status_class(status_code: Optional[int]) -> str:
+    """返回状态码分类（2xx/3xx/4xx/5xx），无状态码时返回 error"""
+    if not status_code:
+        return 'error'
+    return f'{status_code // 100}xx'
+
+
+def hash_body(body: Optional[bytes]) -> str:
+    """计算响应正文的 sha256，正文不可用时返回空字符串"""
+    if body is None:
+        return ''
+    return hashlib.sha256(body).hexdigest()
+
+
+class ResponseCache:
+    """基于JSON文件的响应元数据缓存
+
+    缓存以完整URL为键，整个文件在运行开始时读入、结束时原子写回。
+    """
+
+    def __init__(self, path: str, ttls: Optional[Dict[str, int]] = None):
+        self.path = Path(path)
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._dirty = False
+
+    def load(self, logger=None):
+        """从磁盘读取缓存，文件损坏时按空缓存处理"""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.entries = data.get('entries', {})
+        except Exception as e:
+            self.entries = {}
+            if logger:
+                logger.warning(f"读取响应缓存失败，忽略旧缓存: {str(e)}")
+
+    def save(self):
+        """原子写回缓存文件（先写临时文件再重命名）"""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'entries': self.entries}, f,
+                      ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def get(self, url: str) -> Optional[Dict]:
+        """获取URL的缓存条目（不判断是否过期）"""
+        return self.entries.get(url)
+
+    def ttl_for(self, status_code: Optional[int]) -> int:
+        """返回状态码对应的有效期（秒）"""
+        return self.ttls.get(status_class(status_code), 0)
+
+    def is_fresh(self, entry: Dict, max_age: int) -> bool:
+        """判断条目是否可以直接使用
+
+        条目年龄必须同时小于 --max-age 和其状态码分类的有效期。
+        """
+        if max_age <= 0:
+            return False
+        age = time.time() - entry.get('fetched_at', 0)
+        return age <= min(max_age, self.ttl_for(entry.get('status_code')))
+
+    def put(
+        self,
+        url: str,
+        status_code: Optional[int],
+        status_text: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[bytes] = None
+    ):
+        """记录一次真实请求的响应元数据，无状态码的失败结果不缓存"""
+        if not status_code:
+            return
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        self.entries[url] = {
+            'status_code': status_code,
+            'status_text': status_text,
+            'headers': {
+                k: headers[k] for k in CACHED_HEADERS if k in headers
+            },
+            'body_hash': hash_body(body),
+            'fetched_at': time.time(),
+        }
+        self._dirty = True
+
+    def touch(self, url: str):
+        """条件请求返回304后刷新条目的抓取时间"""
+        entry = self.entries.get(url)
+        if entry:
+            entry['fetched_at'] = time.time()
+            self._dirty = True
+
+    @staticmethod
+    def conditional_headers(entry: Dict) -> Dict[str, str]:
+        """根据缓存的验证器构建条件请求头"""
+        headers = {}
+        cached = entry.get('headers', {})
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last-modified'):
+            headers['If-Modified-Since'] = cached['last-modified']
+        return headers
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中统计"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+        }
@@ -0,0 +1,180 @@
+"""按运行划分的输出目录
+
+每次运行写入 ``<输出目录>/<运行ID>/``（运行ID为开始时间 YYYYMMDD_HHMMSS），
+运行结束后把 ``<输出目录>/latest`` 符号链接原子地指向本次运行；开始时不再删除
+整个输出目录，之前运行的文件可以继续被缓存复用。
+
+旧运行按保留策略（保留最近 N 次、总大小上限）在后台线程中清理，不占用运行时间：
+先把目录改名为 ``.trash-<运行ID>``（同一文件系统内改名不需要遍历目录），再逐步
+删除；中途退出留下的 ``.trash-*`` 会在下次清理时继续删除。运行的大小优先按完整性
+清单（``.manifest.jsonl``）汇总，避免在 NFS 上逐个 stat 文件。
+"""
+import json
+import os
+import re
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from cptools.utils.atomic_write import MANIFEST_NAME
+
+RUN_ID_FORMAT = '%Y%m%d_%H%M%S'
+LATEST_NAME = 'latest'
+TRASH_PREFIX = '.trash-'
+
+# 运行ID：时间戳，同一秒内多次运行时加 _2、_3 ...
+_RUN_ID_PATTERN = re.compile(r'^\d{8}_\d{6}(_\d+)?$')
+
+
+def create_run_dir(base: Path) -> Path:
+    """在 base 下创建本次运行的目录"""
+    base.mkdir(parents=True, exist_ok=True)
+    run_id = datetime.now().strftime(RUN_ID_FORMAT)
+    path = base / run_id
+    suffix = 1
+    while True:
+        try:
+            path.mkdir()
+            return path
+        except FileExistsError:
+            suffix += 1
+            path = base / f"{run_id}_{suffix}"
+
+
+def update_latest(base: Path, run_dir: Path) -> bool:
+    """把 base/latest 原子地指向 run_dir（相对链接），不支持符号链接时返回 False"""
+    link = base / LATEST_NAME
+    tmp_link = base / f".{LATEST_NAME}.{os.getpid()}"
+    try:
+        if tmp_link.is_symlink():
+            tmp_link.unlink()
+        os.symlink(run_dir.name, tmp_link, target_is_directory=True)
+        os.replace(tmp_link, link)
+    except OSError:
+        try:
+            tmp_link.unlink()
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def list_runs(base: Path) -> List[Path]:
+    """base 下的运行目录，按从旧到新排列"""
+    if not base.is_dir():
+        return []
+    runs = [p for p in base.iterdir()
+            if _RUN_ID_PATTERN.match(p.name) and p.is_dir() and not p.is_symlink()]
+    return sorted(runs, key=lambda p: p.name)
+
+
+def run_size(run_dir: Path) -> int:
+    """运行目录的大小（字节）：有完整性清单时按清单汇总，否则遍历目录"""
+    manifest = run_dir / MANIFEST_NAME
+    if manifest.is_file():
+        sizes: Dict[str, int] = {}
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                sizes[entry.get('path', '')] = entry.get('size', 0)
+        return sum(sizes.values())
+
+    total = 0
+    seen = set()
+    for root, _, files in os.walk(run_dir):
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            # 硬链接只计一次
+            if (stat.st_dev, stat.st_ino) in seen:
+                continue
+            seen.add((stat.st_dev, stat.st_ino))
+            total += stat.st_size
+    return total
+
+
+def select_runs_to_prune(
+    runs: List[Path],
+    keep: int,
+    max_bytes: int = 0,
+    size_of=run_size
+) -> List[Path]:
+    """按保留策略选出要清理的旧运行
+
+    runs 为从旧到新排列的旧运行（不含本次）。keep 为包含本次在内保留的运行数
+    （0 为不按次数清理）；max_bytes 为保留的旧运行总大小上限（0 为不限制），
+    超过时从最旧的开始清理。
+    """
+    if keep > 0:
+        cutoff = max(len(runs) - (keep - 1), 0)
+        victims, kept = runs[:cutoff], runs[cutoff:]
+    else:
+        victims, kept = [], list(runs)
+    if max_bytes > 0:
+        sizes = [size_of(run) for run in kept]
+        total = sum(sizes)
+        while kept and total > max_bytes:
+            victims.append(kept.pop(0))
+            total -= sizes.pop(0)
+    return victims
+
+
+class RunPruner:
+    """在后台线程中清理旧运行（守护线程，进程退出时不等待）
+
+    Args:
+        base: 输出目录
+        current: 本次运行的目录（不会被清理）
+        keep: 包含本次在内保留的运行数（0 为不按次数清理）
+        max_bytes: 保留的旧运行总大小上限（0 为不限制）
+        logger: 日志记录器
+    """
+
+    def __init__(
+        self,
+        base: Path,
+        current: Path,
+        keep: int = 5,
+        max_bytes: int = 0,
+        logger=None
+    ):
+        self.base = base
+        self.current = current
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self.pruned: List[str] = []
+        self.removed = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name='cptools-prune', daemon=True)
+        self._thread.start()
+
+    def done(self) -> bool:
+        return self._thread is None or not self._thread.is_alive()
+
+    def _run(self):
+        try:
+            trash = [p for p in self.base.iterdir()
+                     if p.name.startswith(TRASH_PREFIX) and p.is_dir()]
+            runs = [p for p in list_runs(self.base) if p != self.current]
+            for run in select_runs_to_prune(runs, self.keep, self.max_bytes):
+                target = self.base / f"{TRASH_PREFIX}{run.name}"
+                os.rename(run, target)
+                self.pruned.append(run.name)
+                trash.append(target)
+            for path in trash:
+                shutil.rmtree(path, ignore_errors=True)
+                self.removed += 1
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"清理旧运行失败: {str(e)}")
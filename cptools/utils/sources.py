@@ -0,0 +1,293 @@
+"""URL输入源模块
+
+CSV文件和 sitemap.xml 都以异步迭代器的形式逐条产出URL信息
+（``{'url', 'name', 'index'}``），任务队列边读边消费，不需要先构建完整列表。
+"""
+import asyncio
+import csv
+import zlib
+from pathlib import PurePosixPath
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urljoin, urlparse
+from xml.etree.ElementTree import XMLPullParser
+
+import aiohttp
+
+
+# 每次读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+# sitemap 索引允许的最大嵌套层数
+MAX_SITEMAP_DEPTH = 3
+
+# gzip 魔数
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def iter_csv_urls(
+    csv_file: str,
+    logger,
+    name_prefix: str = 'url'
+) -> Iterator[Dict]:
+    """逐行读取CSV文件中的URL
+
+    支持的列名（不区分大小写）：
+    - url/URL: URL地址（必需）
+    - name/PRODUCT_ID/title: URL名称（可选，缺省时生成 {name_prefix}-{行号}）
+    """
+    try:
+        with open(csv_file, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+
+            if not reader.fieldnames:
+                logger.error("CSV文件为空或格式错误")
+                return
+
+            # 创建列名映射（不区分大小写）
+            fieldnames_lower = {
+                name.lower(): name for name in reader.fieldnames
+            }
+
+            # 查找URL列
+            url_column = fieldnames_lower.get('url')
+            if not url_column:
+                logger.error(
+                    f"CSV文件必须包含'url'或'URL'列，"
+                    f"当前列: {', '.join(reader.fieldnames)}"
+                )
+                return
+
+            # 查找名称列（优先级：name > PRODUCT_ID > title）
+            name_column = None
+            for possible_name in ['name', 'product_id', 'title']:
+                if possible_name in fieldnames_lower:
+                    name_column = fieldnames_lower[possible_name]
+                    break
+
+            logger.info(
+                f"使用列: URL='{url_column}', "
+                f"NAME='{name_column or '(自动生成)'}'")
+
+            for idx, row in enumerate(reader, 1):
+                url = (row.get(url_column) or '').strip()
+                if not url:
+                    logger.warning(f"第{idx}行: URL为空，跳过")
+                    continue
+
+                # 获取名称
+                name = ''
+                if name_column:
+                    name = (row.get(name_column) or '').strip()
+
+                yield {
+                    'url': url,
+                    'name': name or f'{name_prefix}-{idx}',
+                    'index': idx
+                }
+
+    except Exception as e:
+        logger.error(f"读取CSV文件失败: {str(e)}")
+
+
+def read_csv_urls(
+    csv_file: str,
+    logger,
+    name_prefix: str = 'url'
+) -> List[Dict]:
+    """读取CSV文件中的全部URL"""
+    return list(iter_csv_urls(csv_file, logger, name_prefix))
+
+
+def build_full_url(url: str, host: str) -> str:
+    """构建完整URL
+
+    如果URL已经包含域名，直接使用；否则使用提供的host
+    """
+    url = url.strip()
+
+    # 检查是否已经是完整URL
+    parsed = urlparse(url)
+    if parsed.scheme and parsed.netloc:
+        return url
+
+    # 如果是相对路径，与host组合
+    if not url.startswith('/'):
+        url = '/' + url
+
+    return urljoin(host, url)
+
+
+def is_remote(source: str) -> bool:
+    """判断输入源是否为 http(s) 地址"""
+    return urlparse(source).scheme in ('http', 'https')
+
+
+async def _iter_raw_chunks(
+    source: str,
+    session: Optional[aiohttp.ClientSession]
+) -> AsyncIterator[bytes]:
+    """逐块读取远程或本地文件的原始字节"""
+    if is_remote(source):
+        async with session.get(source) as resp:
+            resp.raise_for_status()
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    with open(source, 'rb') as f:
+        while True:
+            chunk = await loop.run_in_executor(None, f.read, CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def _iter_xml_chunks(
+    source: str,
+    session: Optional[aiohttp.ClientSession]
+) -> AsyncIterator[bytes]:
+    """逐块读取sitemap，自动识别并流式解压 gzip 内容"""
+    decompressor = None
+    first = True
+    async for chunk in _iter_raw_chunks(source, session):
+        if first:
+            first = False
+            if chunk[:2] == GZIP_MAGIC:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        if chunk:
+            yield chunk
+    if decompressor is not None:
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+
+def _local_name(tag: str) -> str:
+    """去掉XML命名空间前缀"""
+    return tag.rsplit('}', 1)[-1]
+
+
+async def _iter_sitemap_locs(
+    source: str,
+    session: Optional[aiohttp.ClientSession]
+) -> AsyncIterator[tuple]:
+    """增量解析sitemap，逐条产出 (类型, loc)
+
+    类型为 ``url``（普通页面）或 ``sitemap``（索引中的子sitemap）。
+    已处理的元素会立即从树中清除，内存占用与文件大小无关。
+    """
+    parser = XMLPullParser(events=('start', 'end'))
+    root = None
+    async for chunk in _iter_xml_chunks(source, session):
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            tag = _local_name(elem.tag)
+            if tag not in ('url', 'sitemap'):
+                continue
+            for child in elem:
+                if _local_name(child.tag) == 'loc' and child.text:
+                    yield tag, child.text.strip()
+                    break
+            root.clear()
+    parser.close()
+
+
+def _name_from_url(url: str) -> str:
+    """从URL路径中取最后一段作为名称"""
+    path = urlparse(url).path.rstrip('/')
+    return PurePosixPath(path).name if path else ''
+
+
+async def iter_sitemap_urls(
+    source: str,
+    logger,
+    name_prefix: str = 'url',
+    session: Optional[aiohttp.ClientSession] = None,
+    timeout: Optional[int] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> AsyncIterator[Dict]:
+    """流式读取 sitemap.xml（支持sitemap索引和 .gz 子sitemap）
+
+    Args:
+        source: sitemap 的URL或本地文件路径
+        logger: 日志记录器
+        name_prefix: 自动生成名称时使用的前缀
+        session: 复用的HTTP会话（可选）
+        timeout: 未传入 session 时，建立连接和每次读取的超时时间（毫秒）；
+            sitemap 边下载边解析，不限制总时间
+        headers: 未传入 session 时，请求附带的请求头（如 User-Agent）
+    """
+    own_session = session is None
+    if own_session:
+        session = aiohttp.ClientSession(
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(
+                total=None,
+                sock_connect=timeout / 1000 if timeout else None,
+                sock_read=timeout / 1000 if timeout else None))
+
+    index = 0
+    try:
+        pending = [(source, 0)]
+        while pending:
+            current, depth = pending.pop(0)
+            logger.info(f"读取sitemap: {current}")
+            children = []
+            try:
+                async for kind, loc in _iter_sitemap_locs(current, session):
+                    if kind == 'sitemap':
+                        children.append(loc)
+                        continue
+                    index += 1
+                    yield {
+                        'url': loc,
+                        'name': _name_from_url(loc) or f'{name_prefix}-{index}',
+                        'index': index
+                    }
+            except Exception as e:
+                logger.error(f"读取sitemap失败: {current} - {str(e)}")
+                continue
+
+            if children:
+                if depth + 1 > MAX_SITEMAP_DEPTH:
+                    logger.warning(
+                        f"sitemap索引嵌套超过 {MAX_SITEMAP_DEPTH} 层，"
+                        f"忽略 {len(children)} 个子sitemap")
+                    continue
+                logger.info(f"sitemap索引包含 {len(children)} 个子sitemap")
+                pending.extend((child, depth + 1) for child in children)
+    finally:
+        if own_session:
+            await session.close()
+
+
+async def aiter_items(items: Iterable[Dict]) -> AsyncIterator[Dict]:
+    """把列表或同步生成器包装成异步迭代器"""
+    for item in items:
+        yield item
+
+
+def open_url_source(
+    csv_file: Optional[str],
+    sitemap: Optional[str],
+    logger,
+    name_prefix: str = 'url',
+    timeout: Optional[int] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> AsyncIterator[Dict]:
+    """根据命令行参数选择输入源
+
+    CSV和sitemap只是不同的输入源，返回值统一为URL信息的异步迭代器。
+    timeout（毫秒）和 headers 用于下载远程 sitemap。
+    """
+    if sitemap:
+        return iter_sitemap_urls(sitemap, logger, name_prefix,
+                                 timeout=timeout, headers=headers)
+    return aiter_items(iter_csv_urls(csv_file, logger, name_prefix))
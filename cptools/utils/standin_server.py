@@ -0,0 +1,258 @@
+"""本地替身HTTP服务
+
+用于基准测试和本地调试，模拟 cafepress.com 的页面而不访问线上站点：
+
+- ``/page/<n>``: 普通页面（screenshot / url404）
+- ``/+,<product_no>``: 产品页面，包含 ``.stackable-image-container img`` 主图
+- ``/img/<name>``: 图片（JPEG 文件头 + 填充数据）
+- ``/sitemap.xml?count=N``: 列出 N 个普通页面
+- ``POST /robot/send``（及其他任意 POST 路径）: 通知 Webhook 替身，按钉钉的格式
+  返回 ``{"errcode": 0}``，用于不联网地测试通知；``/robot/messages`` 列出最近
+  收到的消息
+
+每个请求按配置的延迟返回，状态码按 URL 的哈希在 ``status_mix`` 中确定性地
+选取，同一URL每次返回相同的状态码。
+"""
+import asyncio
+import multiprocessing
+import random
+import socket
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from aiohttp import web
+
+DEFAULT_STATUS_MIX = {200: 100}
+
+JPEG_HEADER = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00'
+
+WEBHOOK_PATH = '/robot/send'
+
+# /robot/messages 保留的最近消息数
+WEBHOOK_HISTORY = 1000
+
+
+def parse_status_mix(text: str) -> Dict[int, int]:
+    """解析 "200:90,404:5,500:5" 形式的状态码权重"""
+    mix = {}
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        code, _, weight = part.partition(':')
+        mix[int(code)] = int(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError(f"无效的状态码分布: {text}")
+    return mix
+
+
+class StandinConfig:
+    """替身服务配置
+
+    Args:
+        latency: 每个页面请求的平均延迟（秒）
+        jitter: 延迟的随机浮动比例（0.2 表示 ±20%）
+        status_mix: 状态码 -> 权重
+        page_kb: 页面大小（KB，用填充文本补足）
+        images: 每个产品页面的主图数量
+        image_kb: 每张图片的大小（KB）
+        container: 是否输出 ``.stackable-image-container`` 标记
+        page_height: 普通页面的最小高度（CSS像素，0为自然高度），
+            用于测试超高页面的截图
+        webhook_latency: 通知 Webhook 每次请求的延迟（秒）
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.2,
+        status_mix: Optional[Dict[int, int]] = None,
+        page_kb: int = 50,
+        images: int = 3,
+        image_kb: int = 30,
+        container: bool = True,
+        page_height: int = 0,
+        webhook_latency: float = 0.0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.status_mix = status_mix or dict(DEFAULT_STATUS_MIX)
+        self.page_kb = page_kb
+        self.images = images
+        self.image_kb = image_kb
+        self.container = container
+        self.page_height = page_height
+        self.webhook_latency = webhook_latency
+
+    def to_dict(self) -> Dict:
+        return {
+            'latency': self.latency,
+            'jitter': self.jitter,
+            'status_mix': {str(k): v for k, v in self.status_mix.items()},
+            'page_kb': self.page_kb,
+            'images': self.images,
+            'image_kb': self.image_kb,
+            'container': self.container,
+            'page_height': self.page_height,
+            'webhook_latency': self.webhook_latency,
+        }
+
+    def status_for(self, path: str) -> int:
+        """按路径哈希确定性地选取状态码"""
+        total = sum(self.status_mix.values())
+        point = zlib.crc32(path.encode('utf-8')) % total
+        for code, weight in sorted(self.status_mix.items()):
+            if point < weight:
+                return code
+            point -= weight
+        return 200
+
+
+def _page_html(config: StandinConfig, title: str, images_html: str) -> bytes:
+    tall = ''
+    if config.page_height > 0:
+        # 条纹背景，便于检查分块截图是否错位
+        tall = (f'<div style="height:{config.page_height}px;background:'
+                f'repeating-linear-gradient(#fff 0 200px,#ddd 200px 400px)">'
+                f'</div>')
+    head = (f'<!DOCTYPE html><html><head><meta charset="utf-8">'
+            f'<title>{title}</title></head><body><h1>{title}</h1>'
+            f'{images_html}{tall}<div class="filler">')
+    tail = '</div></body></html>'
+    padding = max(0, config.page_kb * 1024 - len(head) - len(tail))
+    filler = ('<p>lorem ipsum dolor sit amet</p>' * (padding // 32 + 1))[:padding]
+    return (head + filler + tail).encode('utf-8')
+
+
+def build_app(config: StandinConfig) -> web.Application:
+    """创建替身服务的 aiohttp 应用"""
+    image_body = JPEG_HEADER + b'\0' * max(0, config.image_kb * 1024 - len(JPEG_HEADER))
+
+    async def delay():
+        if config.latency > 0:
+            spread = config.latency * config.jitter
+            await asyncio.sleep(
+                max(0.0, config.latency + random.uniform(-spread, spread)))
+
+    async def handle(request: web.Request) -> web.StreamResponse:
+        path = request.path
+
+        if path.startswith('/img/'):
+            return web.Response(body=image_body, content_type='image/jpeg')
+
+        if path == '/sitemap.xml':
+            count = int(request.query.get('count', 100))
+            base = f'{request.scheme}://{request.host}'
+            locs = ''.join(
+                f'<url><loc>{base}/page/{n}</loc></url>'
+                for n in range(1, count + 1))
+            return web.Response(
+                text=('<?xml version="1.0" encoding="UTF-8"?><urlset '
+                      'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                      f'{locs}</urlset>'),
+                content_type='application/xml')
+
+        await delay()
+        status = config.status_for(path)
+        if status >= 400:
+            return web.Response(
+                status=status, text=f'{status}', content_type='text/html')
+
+        images_html = ''
+        if path.startswith('/+,'):
+            product_no = path[3:]
+            imgs = ''.join(
+                f'<img src="/img/{product_no}_{k}.jpg" alt="{product_no}">'
+                for k in range(1, config.images + 1))
+            if config.container:
+                images_html = f'<div class="stackable-image-container">{imgs}</div>'
+            else:
+                images_html = f'<div class="product-images">{imgs}</div>'
+        return web.Response(
+            status=status,
+            body=_page_html(config, path, images_html),
+            content_type='text/html')
+
+    messages = deque(maxlen=WEBHOOK_HISTORY)
+
+    async def webhook(request: web.Request) -> web.Response:
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = {}
+        if config.webhook_latency > 0:
+            await asyncio.sleep(config.webhook_latency)
+        # 钉钉格式的标题在 markdown.title 中，通用 Webhook 在 title 中
+        title = (payload.get('markdown') or {}).get('title') or payload.get('title')
+        messages.append({'path': request.path, 'title': title, 'at': time.time()})
+        return web.json_response({'errcode': 0, 'errmsg': 'ok'})
+
+    async def list_messages(request: web.Request) -> web.Response:
+        return web.json_response(list(messages))
+
+    app = web.Application()
+    app.router.add_get('/robot/messages', list_messages)
+    app.router.add_get('/{tail:.*}', handle)
+    app.router.add_post('/{tail:.*}', webhook)
+    return app
+
+
+def _serve(config: StandinConfig, host: str, port: int):
+    web.run_app(build_app(config), host=host, port=port,
+                print=None, access_log=None, handle_signals=True)
+
+
+def free_port(host: str = '127.0.0.1') -> int:
+    """向系统申请一个空闲端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(host: str, port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"替身服务未能在 {timeout:.0f} 秒内启动")
+
+
+class StandinServer:
+    """运行中的替身服务：url 为服务地址，pid 为服务进程号"""
+
+    def __init__(self, url: str, pid: int):
+        self.url = url
+        self.pid = pid
+
+    @property
+    def webhook_url(self) -> str:
+        """钉钉机器人 Webhook 替身的地址"""
+        return f'{self.url}{WEBHOOK_PATH}?access_token=standin'
+
+
+@contextmanager
+def standin_server(
+    config: StandinConfig,
+    host: str = '127.0.0.1',
+    port: Optional[int] = None
+):
+    """在独立进程中运行替身服务（with 块内可用），返回 StandinServer
+
+    独立进程避免服务本身的CPU开销计入被测命令。
+    """
+    port = port or free_port(host)
+    process = multiprocessing.Process(
+        target=_serve, args=(config, host, port), daemon=True)
+    process.start()
+    try:
+        _wait_until_ready(host, port)
+        yield StandinServer(f'http://{host}:{port}', process.pid)
+    finally:
+        process.terminate()
+        process.join(timeout=5)
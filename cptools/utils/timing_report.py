@@ -0,0 +1,84 @@
+"""HTML报告中的分阶段耗时区域（三个报告共用）"""
+from html import escape
+from typing import Dict, List
+
+from cptools.engine.timings import PHASE_LABELS, summarize_timings
+
+
+def generate_timing_section(results: List[Dict]) -> str:
+    """根据结果中的 timings 字段生成分阶段耗时表格（没有耗时数据时返回空）"""
+    summary = summarize_timings(results)
+    if not summary['phases']:
+        return ''
+
+    tables = _timing_table('全部主机', summary['phases'])
+    hosts = summary['hosts']
+    if len(hosts) > 1:
+        for host, stats in hosts.items():
+            tables += _timing_table(f'主机 {host}', stats)
+
+    return f'''
+    <section class="timing-section container">
+        <style>
+            .timing-section {{
+                background: #ffffff;
+                margin: 1.5rem auto;
+                padding: 1.5rem;
+                border-radius: 0.75rem;
+                box-shadow: 0 1px 3px 0 rgb(0 0 0 / 0.1);
+                max-width: 1400px;
+            }}
+            .timing-section details summary {{
+                font-size: 1.25rem;
+                font-weight: 600;
+                cursor: pointer;
+            }}
+            .timing-section h3 {{
+                font-size: 1rem;
+                margin: 1.25rem 0 0.5rem;
+                color: #64748b;
+            }}
+            .timing-table {{
+                width: 100%;
+                border-collapse: collapse;
+                font-size: 0.875rem;
+            }}
+            .timing-table th, .timing-table td {{
+                text-align: right;
+                padding: 0.4rem 0.75rem;
+                border-bottom: 1px solid #e2e8f0;
+            }}
+            .timing-table th:first-child, .timing-table td:first-child {{
+                text-align: left;
+            }}
+            .timing-table th {{
+                color: #64748b;
+                font-weight: 600;
+            }}
+        </style>
+        <details>
+            <summary>⏱️ 分阶段耗时 (秒)</summary>
+            {tables}
+        </details>
+    </section>'''
+
+
+def _timing_table(title: str, stats: Dict[str, Dict]) -> str:
+    rows = ''
+    for phase, s in stats.items():
+        label = PHASE_LABELS.get(phase, phase)
+        rows += f'''
+                <tr>
+                    <td>{escape(label)} <code>{escape(phase)}</code></td>
+                    <td>{s['count']}</td>
+                    <td>{s['p50']:.3f}</td>
+                    <td>{s['p90']:.3f}</td>
+                    <td>{s['p99']:.3f}</td>
+                    <td>{s['max']:.3f}</td>
+                </tr>'''
+    return f'''
+            <h3>{escape(title)}</h3>
+            <table class="timing-table">
+                <tr><th>阶段</th><th>次数</th><th>p50</th><th>p90</th><th>p99</th><th>最大</th></tr>
+                {rows}
+            </table>'''
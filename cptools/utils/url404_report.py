@@ -3,11 +3,15 @@ from pathlib import Path
 from datetime import datetime
 from typing import List, Dict
 
+from cptools.utils.report_writer import with_live_refresh, write_report
+from cptools.utils.timing_report import generate_timing_section
+
 
 def generate_url404_html_report(
     results: List[Dict],
     output_path: str,
-    title: str = "URL 404检测报告"
+    title: str = "URL 404检测报告",
+    refresh: int = 0
 ):
     """生成URL 404检测HTML报告
     
@@ -15,6 +19,7 @@ def generate_url404_html_report(
         results: 检测结果列表
         output_path: 输出HTML文件路径
         title: 报告标题
+        refresh: 大于0时为运行中的实时报告，浏览器每隔该秒数自动刷新
     """
     output_file = Path(output_path)
     output_file.parent.mkdir(parents=True, exist_ok=True)
@@ -32,9 +37,13 @@ def generate_url404_html_report(
         results, title, total, success, error_404, error_500, other_errors, timestamp
     )
     
+    if refresh:
+        html_content = with_live_refresh(html_content, refresh)
+
     # 写入文件
-    output_file.write_text(html_content, encoding='utf-8')
-    print(f"HTML报告已生成: {output_path}")
+    write_report(output_file, html_content)
+    if not refresh:
+        print(f"HTML报告已生成: {output_path}")
 
 
 def _get_status_category(status_code):
@@ -549,6 +558,8 @@ def _generate_list_html(
         </div>
     </header>
     
+    {generate_timing_section(results)}
+    
     <main class="content">
         <div class="filter-bar">
             <button class="filter-btn active" onclick="filterStatus('all')">全部 ({total})</button>
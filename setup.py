@@ -25,6 +25,10 @@ setup(
         "aiohttp>=3.9.0",
         "pandas>=2.0.0",
     ],
+    extras_require={
+        # screenshot --capture stitch 拼接分块截图
+        "images": ["Pillow>=9.0.0"],
+    },
     entry_points={
         "console_scripts": [
             "cptools=cptools.cli:cli",